@@ -0,0 +1,158 @@
+"""Curva de escalado del renderizador con pueblos generados de N x N manzanas.
+
+Uso:
+    python benchmark_escalado.py                        # N = 2, 4, 8, 16
+    python benchmark_escalado.py --tamanos 4 8 16 32 --modo immediate
+    python benchmark_escalado.py --csv escalado.csv --grafica escalado.png
+
+Para cada N genera el pueblo con proyectofinal3.generate_town, arma el grafo de escena
+y lo dibuja fuera de pantalla (EGL, como benchmark_render) desde dos cámaras: una que ve
+todo el pueblo y otra a la altura de la calle, donde el recorte y el nivel de detalle
+importan. Reporta tiempo por frame, llamadas de dibujo, vértices y memoria contra el
+número de objetos. La gráfica necesita matplotlib; sin él sólo se escribe el CSV.
+"""
+import benchmark_render as render  # Primero: configura EGL antes de que se importe OpenGL
+
+import argparse
+import csv
+import time
+
+import numpy as np
+from OpenGL.GL import *
+from OpenGL.GLU import gluPerspective
+
+town = render.town
+WIDTH, HEIGHT = 800, 600
+
+def resident_memory_mb():
+    """Memoria residente del proceso (Linux), o None"""
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def buffer_memory_mb():
+    """Memoria de los VBOs del grafo (modelos y partes fusionadas)"""
+    buffers = {vbo: count for levels in town.model_buffers.values() for level in levels
+               for vbo, count in level.values()}
+    buffers.update(town.merged_buffers.values())
+    return sum(buffers.values()) * town.VERTEX_STRIDE / 2 ** 20
+
+def cameras(n):
+    """(nombre, ojo, objetivo, z_far) de las dos cámaras para un pueblo de n x n manzanas"""
+    half = n * town.BLOCK_SIZE / 2
+    overview = ("general", (half * 1.1, half * 0.9 + 10, half * 1.1), (0, 0, 0), 4 * half + 100)
+    street = ("calle", (town.BLOCK_SIZE / 2, 2.5, town.BLOCK_SIZE / 2), (half, 2.5, town.BLOCK_SIZE / 2), 100.0)
+    return [overview, street]
+
+def set_projection(far):
+    town.z_far = far
+    glMatrixMode(GL_PROJECTION)
+    glLoadIdentity()
+    gluPerspective(town.fov_y, town.aspect_ratio, town.z_near, town.z_far)
+    glMatrixMode(GL_MODELVIEW)
+
+def build(steps, mode):
+    """Prepara el pueblo para el modo de dibujo; devuelve los segundos que tardó"""
+    glClearColor(0.5, 0.8, 1.0, 1.0)  # Mismo estado que town.init(), que siempre arma el pueblo original
+    glEnable(GL_DEPTH_TEST)
+    start = time.perf_counter()
+    town.TOWN, town.render_mode, town.window = steps, mode, None
+    town.clear_scene_graph()
+    if town.town_list:
+        glDeleteLists(town.town_list, 1)
+        town.town_list = 0
+    if mode == "scene_graph":
+        town.build_scene_graph(steps)
+    elif mode == "display_list":
+        town.compile_town()
+    glFinish()
+    return time.perf_counter() - start
+
+def measure(n, mode, frames):
+    """Filas de resultados (una por cámara) para un pueblo de n x n manzanas"""
+    steps = town.generate_town(n)
+    objects = sum(1 for step in steps if step[0] == "model")
+    render.reset_gl_state(WIDTH, HEIGHT)
+    build_seconds = build(steps, mode)
+    rows = []
+    for name, eye, target, far in cameras(n):
+        town.camera_eye, town.camera_target = eye, target
+        set_projection(far)
+        town.draw_scene()  # Calentamiento: niveles de detalle y cachés de lotes
+        times = []
+        for _ in range(frames):
+            start = time.perf_counter()
+            town.draw_scene()
+            glFinish()
+            times.append((time.perf_counter() - start) * 1000)
+        calls, vertices = render.count_calls([town], town.draw_scene)
+        rows.append({
+            "n": n, "objetos": objects, "camara": name, "construccion_s": round(build_seconds, 3),
+            "p50_ms": round(float(np.percentile(times, 50)), 2), "p95_ms": round(float(np.percentile(times, 95)), 2),
+            "dibujos": sum(calls.get(call, 0) for call in render.DRAW_CALLS), "llamadas": sum(calls.values()),
+            "vertices": vertices, "nodos_dibujados": town.drawn_nodes if mode == "scene_graph" else objects,
+            "rss_mb": round(resident_memory_mb() or 0.0, 1), "vbo_mb": round(buffer_memory_mb(), 1),
+        })
+    return rows
+
+def plot(rows, path):
+    """Tiempo por frame, llamadas de dibujo y memoria contra el número de objetos"""
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("matplotlib no está instalado: no se genera la gráfica")
+        return
+    figure, axes = plt.subplots(1, 3, figsize=(15, 4))
+    for camera in dict.fromkeys(row["camara"] for row in rows):
+        selected = [row for row in rows if row["camara"] == camera]
+        objects = [row["objetos"] for row in selected]
+        axes[0].plot(objects, [row["p50_ms"] for row in selected], "o-", label=f"{camera} p50")
+        axes[0].plot(objects, [row["p95_ms"] for row in selected], "o--", label=f"{camera} p95")
+        axes[1].plot(objects, [row["dibujos"] for row in selected], "o-", label=camera)
+    cameras_rows = [row for row in rows if row["camara"] == rows[0]["camara"]]
+    objects = [row["objetos"] for row in cameras_rows]
+    axes[2].plot(objects, [row["rss_mb"] for row in cameras_rows], "o-", label="RSS")
+    axes[2].plot(objects, [row["vbo_mb"] for row in cameras_rows], "o-", label="VBOs")
+    for axis, title in zip(axes, ("ms por frame", "llamadas de dibujo", "memoria (MB)")):
+        axis.set_xscale("log")
+        axis.set_xlabel("objetos")
+        axis.set_title(title)
+        axis.legend()
+    figure.tight_layout()
+    figure.savefig(path)
+    print(f"Gráfica en {path}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Curva de escalado con pueblos de N x N manzanas")
+    parser.add_argument("--tamanos", nargs="+", type=int, default=[2, 4, 8, 16], help="valores de N")
+    parser.add_argument("--modo", default="scene_graph", choices=["immediate", "display_list", "scene_graph"])
+    parser.add_argument("--frames", type=int, default=10, help="frames medidos por cámara")
+    parser.add_argument("--csv", default="escalado.csv")
+    parser.add_argument("--grafica", default="escalado.png")
+    args = parser.parse_args()
+
+    render.create_context(WIDTH, HEIGHT)
+    rows = []
+    columns = ["n", "objetos", "camara", "construccion_s", "p50_ms", "p95_ms", "dibujos", "llamadas",
+               "vertices", "nodos_dibujados", "rss_mb", "vbo_mb"]
+    print("".join(f"{column:>16}" for column in columns))
+    for n in args.tamanos:
+        for row in measure(n, args.modo, args.frames):
+            print("".join(f"{row[column]:>16}" for column in columns))
+            rows.append(row)
+    with open(args.csv, "w", newline="", encoding="utf-8") as file:
+        writer = csv.DictWriter(file, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"Resultados en {args.csv}")
+    plot(rows, args.grafica)
+
+if __name__ == "__main__":
+    main()
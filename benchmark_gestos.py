@@ -0,0 +1,178 @@
+"""Compara los motores de flujo óptico de proyectofinal3 sobre clips grabados.
+
+Uso:
+    python benchmark_gestos.py clip1.avi [clip2.avi ...]
+    python benchmark_gestos.py --grabar clip.avi 300   # graba 300 frames de la cámara
+    python benchmark_gestos.py                         # sin clips usa uno sintético
+
+Para cada zona (rotación y traslación) y cada motor reporta la latencia media y p95,
+y cuánto se parece su flujo medio al de Farneback: diferencia media del vector y
+fracción de frames en que la decisión de control (umbral flow_threshold) coincide.
+Para dis y lucas_kanade también sugiere la ganancia (DIS_GAIN, LK_GAIN) que mejor los ajusta a
+Farneback en cada zona.
+Para la zona de escala compara los localizadores de la mano (HAND_LOCATORS) contra el
+contorno: latencia, diferencia media de la posición normalizada y coincidencia de la
+decisión de escala.
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+import proyectofinal3 as town
+
+# Zonas de la cámara, en fracciones del alto y ancho (igual que analyze_frame)
+ROIS = {
+    "rotacion": lambda h, w: (slice(None, int(h * 0.3)), slice(None, int(w * 0.3))),
+    "traslacion": lambda h, w: (slice(None, int(h * 0.3)), slice(int(w * 0.7), None)),
+}
+SCALE_ROI = lambda h, w: (slice(int(h * 0.7), None), slice(None, int(w * 0.3)))
+ENGINE_GAINS = {"dis": "DIS_GAIN", "lucas_kanade": "LK_GAIN"}  # Motor -> ganancia calibrada contra Farneback
+
+def record_clip(path, frames):
+    """Graba frames de la cámara 0 en path"""
+    cap = cv2.VideoCapture(0)
+    ret, frame = cap.read()
+    if not ret:
+        cap.release()
+        raise SystemExit("Error: No se pudo acceder a la cámara.")
+    height, width = frame.shape[:2]
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 30, (width, height))
+    for _ in range(frames):
+        writer.write(frame)
+        cv2.imshow("Grabando", frame)
+        cv2.waitKey(1)
+        ret, frame = cap.read()
+        if not ret:
+            break
+    writer.release()
+    cap.release()
+    cv2.destroyAllWindows()
+
+def load_clip(path, limit=None):
+    """Frames (BGR) de un video"""
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while limit is None or len(frames) < limit:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+def synthetic_clip(count=120, width=640, height=480):
+    """Fondo con textura y una "mano" que se mueve dentro de cada zona"""
+    rng = np.random.default_rng(0)
+    noise = cv2.GaussianBlur(rng.integers(0, 255, (height, width), dtype=np.uint8), (7, 7), 0)
+    background = (80 + noise * 0.6).astype(np.uint8)  # Más claro que el umbral de la mano
+    frames = []
+    for i in range(count):
+        frame = background.copy()
+        phase = np.sin(i / 10)
+        cv2.circle(frame, (int(width * 0.15 + 50 * phase), int(height * 0.15)), 25, 255, -1)
+        cv2.circle(frame, (int(width * 0.85 + 40 * phase), int(height * 0.15 + 30 * np.cos(i / 10))), 25, 0, -1)
+        cv2.ellipse(frame, (int(width * 0.15 + 70 * np.sin(i / 15)), int(height * 0.88)), (22, 40), 0, 0, 360, 20, -1)
+        frames.append(cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR))
+    return frames
+
+def decision(value):
+    """-1, 0 o 1 según si el flujo supera el umbral de control"""
+    return 0 if abs(value) <= town.flow_threshold else int(np.sign(value))
+
+def scale_decision(position):
+    """-1, 0 o 1: el mismo cambio de escala que analyze_frame"""
+    if position is None:
+        return 0
+    return 1 if position > 0.6 else -1 if position < 0.4 else 0
+
+def benchmark(frames, engines):
+    """Latencias (ms) y flujos medios por (zona, motor)"""
+    times = {(roi, name): [] for roi in ROIS for name in engines}
+    flows = {(roi, name): [] for roi in ROIS for name in engines}
+    frames = [cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) for frame in frames]
+    height, width = frames[0].shape[:2]
+    for prev, curr in zip(frames, frames[1:]):
+        for roi, region in ROIS.items():
+            area = region(height, width)
+            for name in engines:
+                start = time.perf_counter()
+                flow = town.FLOW_ENGINES[name](prev[area], curr[area])
+                times[roi, name].append((time.perf_counter() - start) * 1000)
+                flows[roi, name].append(flow)
+    return times, flows
+
+def report(times, flows, engines, reference="farneback"):
+    print(f"{'zona':<11}{'motor':<14}{'media ms':>9}{'p95 ms':>9}{'|d flujo|':>10}{'decisión':>10}")
+    for roi in ROIS:
+        base = np.array(flows[roi, reference])
+        for name in engines:
+            latency = np.array(times[roi, name])
+            flow = np.array(flows[roi, name])
+            difference = np.linalg.norm(flow - base, axis=1).mean()
+            same = np.mean([decision(a) == decision(b) for a, b in zip(flow.ravel(), base.ravel())])
+            print(f"{roi:<11}{name:<14}{latency.mean():>9.3f}{np.percentile(latency, 95):>9.3f}"
+                  f"{difference:>10.3f}{same:>10.0%}")
+    for name, gain in ENGINE_GAINS.items():
+        if ("rotacion", name) in flows and name != reference:
+            current = getattr(town, gain)
+            print(f"{gain} sugerida (mínimos cuadrados contra {reference}):", ", ".join(
+                f"{roi} {suggested_gain(flows[roi, name], flows[roi, reference], current):.3f}" for roi in ROIS),
+                f"(actual {current:g})")
+
+def suggested_gain(flow, base, current):
+    """Ganancia con la que el flujo de un motor (medido con current) queda más cerca del de referencia"""
+    flow, base = np.asarray(flow), np.asarray(base)
+    power = np.sum(flow * flow)
+    return current * np.sum(flow * base) / power if power > 0 else current
+
+def benchmark_locators(frames, locators):
+    """Latencias (ms) y posiciones normalizadas de la mano por localizador"""
+    times = {name: [] for name in locators}
+    positions = {name: [] for name in locators}
+    area = SCALE_ROI(*frames[0].shape[:2])
+    for name in locators:
+        town.profile_position = None  # Sin suavizado heredado de otro clip
+        for frame in frames:
+            roi = np.ascontiguousarray(frame[area])
+            start = time.perf_counter()
+            position = town.HAND_LOCATORS[name](roi)
+            times[name].append((time.perf_counter() - start) * 1000)
+            positions[name].append(position)
+    return times, positions
+
+def report_locators(times, positions, locators, reference="contorno"):
+    print(f"{'localizador':<14}{'media ms':>9}{'p95 ms':>9}{'|d pos|':>9}{'decisión':>10}")
+    for name in locators:
+        latency = np.array(times[name])
+        pairs = [(a, b) for a, b in zip(positions[name], positions[reference]) if a is not None and b is not None]
+        difference = np.mean([abs(a - b) for a, b in pairs]) if pairs else float("nan")
+        same = np.mean([scale_decision(a) == scale_decision(b) for a, b in zip(positions[name], positions[reference])])
+        print(f"{name:<14}{latency.mean():>9.3f}{np.percentile(latency, 95):>9.3f}{difference:>9.3f}{same:>10.0%}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara los motores de flujo óptico de los gestos")
+    parser.add_argument("clips", nargs="*", help="videos grabados (por defecto, un clip sintético)")
+    parser.add_argument("--motores", nargs="+", default=list(town.FLOW_ENGINES), choices=list(town.FLOW_ENGINES))
+    parser.add_argument("--frames", type=int, default=None, help="máximo de frames por clip")
+    parser.add_argument("--grabar", nargs=2, metavar=("CLIP", "FRAMES"), help="graba un clip de la cámara y sale")
+    args = parser.parse_args()
+
+    if args.grabar:
+        record_clip(args.grabar[0], int(args.grabar[1]))
+        return
+    engines = ["farneback"] + [name for name in args.motores if name != "farneback"]
+    clips = {path: load_clip(path, args.frames) for path in args.clips} or {"sintético": synthetic_clip()}
+    for path, frames in clips.items():
+        if len(frames) < 2:
+            print(f"{path}: no tiene frames suficientes")
+            continue
+        print(f"\n{path}: {len(frames)} frames de {frames[0].shape[1]}x{frames[0].shape[0]}")
+        report(*benchmark(frames, engines), engines)
+        locators = ["contorno"] + [name for name in town.HAND_LOCATORS if name != "contorno"]
+        print()
+        report_locators(*benchmark_locators(frames, locators), locators)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Retraso y suavidad de las transformaciones interpoladas de proyectofinal3, sin cámara ni OpenGL.
+
+Uso:
+    python benchmark_interpolacion.py                          # cámara a 30 FPS, pantalla a 60
+    python benchmark_interpolacion.py --fps-camara 15 --latencia 40
+    python benchmark_interpolacion.py --retrasos -20 0 50 100 --sin-extrapolar
+
+Simula una mano con un movimiento conocido (rotación, traslación y escala), la muestrea a
+la tasa de la cámara con variación en los instantes de captura y una latencia de análisis,
+y pasa cada muestra por add_transform_target como lo hace el hilo de la cámara. A la tasa
+de la pantalla toma el estado que se dibujaría: el último objetivo (sin interpolar) o
+interpolated_transform con cada INTERPOLATION_DELAY. Para cada configuración reporta:
+
+    retraso      desplazamiento en el tiempo (ms) que mejor alinea lo mostrado con el movimiento real
+    registrado   promedio de "retraso_transformacion" (ahora menos el instante mostrado), lo que mide el módulo
+    error        diferencia con el movimiento real en el mismo instante, en % de su desviación
+    residuo      la misma diferencia después de descontar el retraso
+    aspereza     aceleración por frame de lo mostrado sobre la del movimiento real (1 = igual de suave)
+"""
+import argparse
+
+import numpy as np
+
+import proyectofinal3 as town
+
+SHIFTS_MS = np.arange(-150, 301)  # Desplazamientos probados para estimar el retraso
+
+def hand_motion(t):
+    """Estados reales (rotación, tx, ty, escala) en los instantes t: barridos de distinta frecuencia"""
+    t = np.asarray(t, dtype=float)[:, None]
+    return np.hstack([
+        30 * np.sin(2 * np.pi * 0.4 * t) + 10 * np.sin(2 * np.pi * 1.1 * t),
+        5 * np.sin(2 * np.pi * 0.25 * t + 1.0),
+        3 * np.sin(2 * np.pi * 0.6 * t + 2.0),
+        1 + 0.3 * np.sin(2 * np.pi * 0.3 * t),
+    ])
+
+def camera_samples(seconds, fps, latency_ms, jitter_ms, rng):
+    """(instantes de captura, instantes en que llega el análisis) de cada frame de la cámara"""
+    captured = np.arange(0, seconds, 1 / fps) + rng.normal(0, jitter_ms / 1000 / 4, int(np.ceil(seconds * fps)))
+    captured = np.maximum.accumulate(captured)  # La variación no cambia el orden
+    arrived = captured + (latency_ms + rng.uniform(-jitter_ms, jitter_ms, len(captured))) / 1000
+    return captured, np.maximum.accumulate(arrived)  # El hilo entrega los frames en orden
+
+def displayed(captured, arrived, display_times, delay):
+    """Estados mostrados en cada frame de pantalla y el instante que muestra cada uno (delay None: sin interpolar)"""
+    states = hand_motion(captured)
+    town.transform_targets.clear()
+    town.transform_targets.append((captured[0] - 1.0, tuple(hand_motion([captured[0] - 1.0])[0])))
+    town.use_transform_interpolation = delay is not None
+    town.INTERPOLATION_DELAY = delay or 0.0
+    shown_states, shown_times, next_sample = [], [], 0
+    for now in display_times:
+        while next_sample < len(captured) and arrived[next_sample] <= now:
+            previous = np.array(town.transform_targets[-1][1])
+            deltas = dict(zip(("rotation", "translation_x", "translation_y", "scale"),
+                              states[next_sample] - previous))
+            town.add_transform_target(captured[next_sample], deltas)
+            next_sample += 1
+        if town.use_transform_interpolation:
+            state, shown = town.interpolated_transform(now)
+        else:
+            shown, state = town.transform_targets[-1]
+        shown_states.append(state)
+        shown_times.append(shown)
+    return np.array(shown_states), np.array(shown_times)
+
+def evaluate(display_times, shown_states, shown_times):
+    """Métricas de una configuración (ver el docstring del módulo)"""
+    spread = hand_motion(display_times).std(axis=0)
+    errors = [np.sqrt(np.mean(((shown_states - hand_motion(display_times - shift / 1000)) / spread) ** 2))
+              for shift in SHIFTS_MS]
+    best = int(np.argmin(errors))
+    roughness = (np.sqrt(np.mean((np.diff(shown_states, 2, axis=0) / spread) ** 2))
+                 / np.sqrt(np.mean((np.diff(hand_motion(display_times), 2, axis=0) / spread) ** 2)))
+    return {
+        "retraso": f"{SHIFTS_MS[best]:.0f} ms", "registrado": f"{np.mean(display_times - shown_times) * 1000:.0f} ms",
+        "error": f"{errors[SHIFTS_MS.tolist().index(0)]:.1%}", "residuo": f"{errors[best]:.1%}",
+        "aspereza": f"{roughness:.1f}",
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Retraso y suavidad de las transformaciones interpoladas")
+    parser.add_argument("--fps-camara", type=float, default=30.0)
+    parser.add_argument("--fps-pantalla", type=float, default=60.0)
+    parser.add_argument("--latencia", type=float, default=15.0, help="latencia media del análisis (ms)")
+    parser.add_argument("--variacion", type=float, default=8.0, help="variación de la latencia (ms)")
+    parser.add_argument("--retrasos", nargs="+", type=float, default=[0.0, 25.0, 50.0, 80.0],
+                        help="valores de INTERPOLATION_DELAY a probar (ms)")
+    parser.add_argument("--sin-extrapolar", action="store_true", help="use_extrapolation = False")
+    parser.add_argument("--segundos", type=float, default=20.0)
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args()
+
+    town.use_extrapolation = not args.sin_extrapolar
+    captured, arrived = camera_samples(args.segundos, args.fps_camara, args.latencia, args.variacion,
+                                       np.random.default_rng(args.semilla))
+    display_times = np.arange(1.0, args.segundos, 1 / args.fps_pantalla)  # El primer segundo llena el historial
+    configurations = {"sin interpolar": None}
+    configurations.update({f"retraso {delay:g} ms": delay / 1000 for delay in args.retrasos})
+    print(f"cámara {args.fps_camara:g} FPS, pantalla {args.fps_pantalla:g} FPS, análisis {args.latencia:g}"
+          f" ± {args.variacion:g} ms, extrapolación {'no' if args.sin_extrapolar else 'sí'}"
+          f" (hasta {town.EXTRAPOLATION_LIMIT * 1000:g} ms)")
+    columns = ["retraso", "registrado", "error", "residuo", "aspereza"]
+    print(f"{'configuración':<18}" + "".join(f"{column:>12}" for column in columns))
+    for name, delay in configurations.items():
+        row = evaluate(display_times, *displayed(captured, arrived, display_times, delay))
+        print(f"{name:<18}" + "".join(f"{row[column]:>12}" for column in columns))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Costo del minimapa de proyectofinal3 en pueblos generados.
+
+Uso:
+    python benchmark_minimapa.py                    # pueblos de 8, 16 y 26 x 26 manzanas
+    python benchmark_minimapa.py --tamanos 26 --frames 120
+
+Para cada N arma el grafo de escena del pueblo de generate_town fuera de pantalla (EGL,
+como benchmark_render) y recorre la misma trayectoria de cámara (rotación y traslación
+globales que avanzan cada frame) con cuatro configuraciones del minimapa:
+
+    sin       minimapa apagado
+    completo  redibujado en cada frame con el nivel de detalle más fino y todos los objetos
+    grueso    redibujado en cada frame con MINIMAP_LEVEL y sin los objetos de menos de un píxel
+    umbral    la configuración del módulo: sólo se redibuja al alejarse el punto mirado y
+              dentro de MINIMAP_BUDGET_MS por periodo de frame (1 / TARGET_FPS)
+
+Reporta el tiempo por frame (con glFinish), cuánto agrega cada configuración sobre "sin"
+y cuántos frames redibujaron la imagen del minimapa.
+"""
+import benchmark_render as render  # Primero: configura EGL antes de que se importe OpenGL
+
+import argparse
+import time
+
+import numpy as np
+from OpenGL.GL import glFinish
+
+import benchmark_escalado as scaling
+
+town = render.town
+MODES = {
+    "sin": None,
+    "completo": {"MINIMAP_LEVEL": 0, "MINIMAP_MIN_PIXELS": 0.0, "MINIMAP_REFRESH": 0.0, "MINIMAP_BUDGET_MS": np.inf},
+    "grueso": {"MINIMAP_REFRESH": 0.0, "MINIMAP_BUDGET_MS": np.inf},
+    "umbral": {},
+}
+DEFAULTS = {name: getattr(town, name) for name in
+            ("MINIMAP_LEVEL", "MINIMAP_MIN_PIXELS", "MINIMAP_REFRESH", "MINIMAP_BUDGET_MS")}
+
+def run_path(frames, settings):
+    """Tiempos por frame (ms) y redibujados del minimapa a lo largo de la trayectoria"""
+    for name, value in {**DEFAULTS, **(settings or {})}.items():
+        setattr(town, name, value)
+    town.show_minimap = settings is not None
+    town.minimap_center, town.minimap_credit, town.minimap_refreshes = None, 0.0, 0
+    town.minimap_credit_time, town.minimap_pending = None, False
+    town.minimap_cache.clear()
+    times = []
+    for frame in range(-1, frames):  # El frame -1 es de calentamiento
+        town.rotation_angle, town.translation_x = 0.5 * frame, 0.4 * frame
+        start = time.perf_counter()
+        town.draw_scene()
+        glFinish()
+        times.append((time.perf_counter() - start) * 1000)
+    return times[1:], town.minimap_refreshes - 1
+
+def measure(n, frames):
+    """Filas de resultados (una por configuración) para un pueblo de n x n manzanas"""
+    steps = town.generate_town(n)
+    render.reset_gl_state(scaling.WIDTH, scaling.HEIGHT)
+    scaling.build(steps, "scene_graph")
+    name, town.camera_eye, town.camera_target, far = scaling.cameras(n)[0]
+    scaling.set_projection(far)
+    town.scale_factor = 1.0
+    rows, base = [], None
+    for mode, settings in MODES.items():
+        times, refreshes = run_path(frames, settings)
+        p50, p95 = np.percentile(times, [50, 95])
+        base = p50 if base is None else base
+        rows.append({"n": n, "objetos": len(town.scene_keys), "modo": mode, "p50_ms": round(float(p50), 2),
+                     "p95_ms": round(float(p95), 2), "extra_ms": round(float(p50 - base), 2),
+                     "redibujados": f"{max(refreshes, 0)}/{frames}" if settings is not None else "-"})
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Costo del minimapa con y sin redibujado por umbral")
+    parser.add_argument("--tamanos", nargs="+", type=int, default=[8, 16, 26], help="valores de N (26 da ~10k objetos)")
+    parser.add_argument("--frames", type=int, default=120, help="frames de la trayectoria")
+    args = parser.parse_args()
+
+    render.create_context(scaling.WIDTH, scaling.HEIGHT)
+    town.window = None
+    columns = ["n", "objetos", "modo", "p50_ms", "p95_ms", "extra_ms", "redibujados"]
+    print("".join(f"{column:>14}" for column in columns))
+    for n in args.tamanos:
+        for row in measure(n, args.frames):
+            print("".join(f"{row[column]:>14}" for column in columns))
+
+if __name__ == "__main__":
+    main()
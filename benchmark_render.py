@@ -0,0 +1,223 @@
+"""Render fuera de pantalla de proyectofinal3 y proyectofinal3(2) con imágenes de referencia.
+
+No necesita ventana, GPU ni cámara: crea un contexto OpenGL con EGL sin superficie
+(Mesa llvmpipe en Linux), dibuja cada escena desde poses fijas y reporta los
+percentiles del tiempo por frame, las llamadas a OpenGL y los vértices enviados.
+Cada pose se guarda como PNG y se compara con golden/<escena>_<modo>_<pose>.png: cada modo
+tiene sus referencias, porque el camino inmediato de la ciudad ilumina con otras normales.
+Con el grafo de escena y la luz horneada (use_baked_lighting) la referencia es
+<escena>_scene_graph_<pose>_horneada.png.
+
+Uso:
+    python benchmark_render.py                       # todas las escenas, modo scene_graph
+    python benchmark_render.py --modo immediate      # mismo recorrido por el camino inmediato
+    python benchmark_render.py --actualizar          # regenera las imágenes de referencia del modo elegido
+    python benchmark_render.py --sin-horneado        # grafo de escena con la luz de antes (GL_LIGHTING)
+
+Sale con código 1 si alguna imagen se aleja de su referencia más que --tolerancia.
+"""
+import os
+
+os.environ.setdefault("PYOPENGL_PLATFORM", "egl")  # Antes de importar OpenGL
+os.environ.setdefault("EGL_PLATFORM", "surfaceless")
+
+import argparse
+import ctypes
+import importlib.util
+import sys
+import time
+
+import cv2
+import numpy as np
+from OpenGL import EGL
+from OpenGL.GL import *
+
+import proyectofinal3 as town
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+GOLDEN_DIR = os.path.join(HERE, "golden")
+OUTPUT_DIR = os.path.join(HERE, "render_salida")
+
+# Poses fijas: (rotation_angle, scale_factor, translation_x, translation_y) del pueblo
+TOWN_POSES = [(0, 1.0, 0, 0), (45, 1.0, 0, 0), (120, 1.5, 5, -3), (200, 0.6, -8, 4), (300, 2.0, 0, 0)]
+# (camera_angle_x, camera_angle_y, camera_distance, t) de la ciudad
+CITY_POSES = [(0.5, 0.5, 80, 0.0), (2.0, 1.0, 120, 5.0), (4.0, 0.3, 40, 10.0), (1.0, 1.4, 150, 20.0)]
+
+# Funciones de OpenGL que se cuentan; las de dibujo además suman vértices
+DRAW_VERTICES = {
+    "glDrawArrays": lambda mode, first, count: count,
+    "glDrawElements": lambda mode, count, *args: count,
+    "glMultiDrawArrays": lambda mode, firsts, counts, n: int(np.sum(counts)),
+    "glDrawArraysInstanced": lambda mode, first, count, instances: count * instances,
+    "glVertex3f": lambda *args: 1,
+    "glVertex3fv": lambda *args: 1,
+    "glVertex2f": lambda *args: 1,
+}
+DRAW_CALLS = ("glDrawArrays", "glDrawElements", "glMultiDrawArrays", "glDrawArraysInstanced", "glCallList",
+              "glBegin", "gluSphere", "gluCylinder")
+COUNTED = list(DRAW_VERTICES) + ["glCallList", "gluSphere", "gluCylinder", "glBegin", "glLoadMatrixf",
+                                 "glMultMatrixf", "glPushMatrix", "glPopMatrix", "glTranslatef", "glRotatef",
+                                 "glScalef", "glColor3f", "glNormal3f", "glBindBuffer", "glBufferData",
+                                 "glUseProgram", "glVertexPointer", "glColorPointer", "glNormalPointer",
+                                 "glVertexAttribPointer"]
+
+def create_context(width, height):
+    """Contexto OpenGL de compatibilidad sobre un pbuffer EGL"""
+    display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+    if not EGL.eglInitialize(display, None, None):
+        raise SystemExit("Error: No se pudo inicializar EGL.")
+    attributes = (EGL.EGLint * 9)(EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+                                  EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+                                  EGL.EGL_DEPTH_SIZE, 24, EGL.EGL_NONE, 0, 0)
+    config, count = EGL.EGLConfig(), EGL.EGLint()
+    EGL.eglChooseConfig(display, attributes, ctypes.pointer(config), 1, ctypes.pointer(count))
+    if count.value == 0:
+        raise SystemExit("Error: EGL no ofrece una configuración con pbuffer y OpenGL.")
+    size = (EGL.EGLint * 5)(EGL.EGL_WIDTH, width, EGL.EGL_HEIGHT, height, EGL.EGL_NONE)
+    surface = EGL.eglCreatePbufferSurface(display, config, size)
+    EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+    context = EGL.eglCreateContext(display, config, EGL.EGL_NO_CONTEXT, None)
+    if not EGL.eglMakeCurrent(display, surface, surface, context):
+        raise SystemExit("Error: No se pudo activar el contexto EGL.")
+
+def reset_gl_state(width, height):
+    """Deja el contexto como recién creado antes de pasar a otra escena"""
+    glViewport(0, 0, width, height)
+    glMatrixMode(GL_PROJECTION)
+    glLoadIdentity()
+    glMatrixMode(GL_MODELVIEW)
+    glLoadIdentity()
+    for capability in (GL_LIGHTING, GL_LIGHT0, GL_COLOR_MATERIAL):
+        glDisable(capability)
+    town.viewport_height = height
+
+def read_pixels(width, height):
+    glFinish()
+    pixels = glReadPixels(0, 0, width, height, GL_BGR, GL_UNSIGNED_BYTE)
+    return np.frombuffer(pixels, np.uint8).reshape(height, width, 3)[::-1]
+
+def count_calls(modules, render):
+    """Llamadas (por función) y vértices de un frame, envolviendo las funciones GL de los módulos"""
+    calls, vertices = {}, [0]
+    saved = []
+    for module in modules:
+        for name in COUNTED:
+            if name not in vars(module):
+                continue
+            original = vars(module)[name]
+
+            def counter(*args, _name=name, _original=original):
+                calls[_name] = calls.get(_name, 0) + 1
+                if _name in DRAW_VERTICES:
+                    vertices[0] += DRAW_VERTICES[_name](*args)
+                return _original(*args)
+            saved.append((module, name, original))
+            setattr(module, name, counter)
+    try:
+        render()
+    finally:
+        for module, name, original in saved:
+            setattr(module, name, original)
+    return calls, vertices[0]
+
+def town_scene(mode):
+    """Pueblo de proyectofinal3: (módulos con llamadas GL, poses, función que dibuja una pose)"""
+    town.render_mode = mode
+    town.window = None
+    town.use_background_build = False  # Las imágenes de referencia necesitan la escena completa
+    town.show_minimap = False  # Su redibujado depende del presupuesto de tiempo: ver benchmark_minimapa
+    town.init()
+
+    def render(pose):
+        town.rotation_angle, town.scale_factor, town.translation_x, town.translation_y = pose
+        town.draw_scene()
+    return [town], TOWN_POSES, render
+
+def city_scene(mode):
+    """Ciudad de proyectofinal3(2)"""
+    spec = importlib.util.spec_from_file_location("ciudad", os.path.join(HERE, "proyectofinal3(2).py"))
+    city = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(city)
+    city.use_scene_graph = mode == "scene_graph"
+    city.window = None
+    city.init()
+
+    def render(pose):
+        city.camera_angle_x, city.camera_angle_y, city.camera_distance, t = pose
+        city.draw_scene(t)
+    return [city, town], CITY_POSES, render
+
+SCENES = {"pueblo": town_scene, "ciudad": city_scene}
+SCENE_SIZES = {"pueblo": (800, 600), "ciudad": (1024, 768)}  # Tamaños de las ventanas originales
+
+def compare(image, golden_path, threshold):
+    """Fracción de píxeles que difieren más que threshold en algún canal, o None sin referencia"""
+    golden = cv2.imread(golden_path)
+    if golden is None:
+        return None
+    if golden.shape != image.shape:
+        return 1.0
+    return float((np.abs(image.astype(int) - golden).max(axis=2) > threshold).mean())
+
+def run_scene(name, args):
+    width, height = SCENE_SIZES[name]
+    reset_gl_state(width, height)
+    modules, poses, render = SCENES[name](args.modo)
+    failures = 0
+    suffix = "_horneada" if args.modo == "scene_graph" and town.use_baked_lighting else ""
+    print(f"\n{name} ({args.modo}, {width}x{height})")
+    print(f"{'pose':<6}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'llamadas':>10}{'dibujos':>9}{'vértices':>10}  referencia")
+    for index, pose in enumerate(poses):
+        render(pose)  # Calentamiento: niveles de detalle y cachés de lotes
+        times = []
+        for _ in range(args.frames):
+            start = time.perf_counter()
+            render(pose)
+            glFinish()
+            times.append((time.perf_counter() - start) * 1000)
+        calls, vertices = count_calls(modules, lambda: render(pose))
+        draws = sum(calls.get(call, 0) for call in DRAW_CALLS)
+        image = read_pixels(width, height)
+        filename = f"{name}_{args.modo}_{index}{suffix}.png"
+        cv2.imwrite(os.path.join(OUTPUT_DIR, filename), image)
+        golden_path = os.path.join(GOLDEN_DIR, filename)
+        if args.actualizar:
+            cv2.imwrite(golden_path, image)
+            status = "actualizada"
+        else:
+            difference = compare(image, golden_path, args.umbral)
+            if difference is None:
+                status = "sin referencia"
+            elif difference <= args.tolerancia:
+                status = f"ok ({difference:.3%})"
+            else:
+                status = f"DIFIERE ({difference:.3%})"
+                failures += 1
+        p50, p95, p99 = np.percentile(times, [50, 95, 99])
+        print(f"{index:<6}{p50:>9.2f}{p95:>9.2f}{p99:>9.2f}{sum(calls.values()):>10}{draws:>9}{vertices:>10}  {status}")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Render fuera de pantalla con imágenes de referencia")
+    parser.add_argument("--escenas", nargs="+", default=list(SCENES), choices=list(SCENES))
+    parser.add_argument("--modo", default="scene_graph", choices=["immediate", "display_list", "scene_graph"],
+                        help="render_mode del pueblo; la ciudad usa el grafo sólo con scene_graph")
+    parser.add_argument("--frames", type=int, default=20, help="frames medidos por pose")
+    parser.add_argument("--tolerancia", type=float, default=0.005, help="fracción de píxeles distintos permitida")
+    parser.add_argument("--umbral", type=int, default=10, help="diferencia por canal para contar un píxel")
+    parser.add_argument("--actualizar", action="store_true", help="sobrescribe las imágenes de referencia")
+    parser.add_argument("--sin-horneado", action="store_true", help="grafo de escena sin luz ni oclusión horneadas")
+    args = parser.parse_args()
+
+    if args.sin_horneado:
+        town.use_baked_lighting = town.use_baked_ao = False
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    os.makedirs(GOLDEN_DIR, exist_ok=True)
+    create_context(*map(max, zip(*SCENE_SIZES.values())))
+    failures = sum(run_scene(name, args) for name in args.escenas)
+    if failures:
+        print(f"\n{failures} imagen(es) fuera de tolerancia; ver {OUTPUT_DIR}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
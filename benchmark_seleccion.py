@@ -0,0 +1,91 @@
+"""Tiempo de selección con rayo (BVH) de proyectofinal3 en pueblos generados grandes.
+
+Uso:
+    python benchmark_seleccion.py                   # pueblo de 26 x 26 manzanas (~10k objetos)
+    python benchmark_seleccion.py --tamanos 8 16 26 --consultas 2000
+
+Para cada N arma el grafo de escena del pueblo de generate_town fuera de pantalla (EGL,
+como benchmark_render), construye la BVH y lanza rayos desde puntos aleatorios de la
+pantalla con la cámara que ve todo el pueblo. Reporta el tiempo de construcción, los
+percentiles por consulta y los compara con una búsqueda por fuerza bruta (todas las
+cajas con NumPy y luego los triángulos), que además sirve para comprobar el resultado.
+"""
+import benchmark_render as render  # Primero: configura EGL antes de que se importe OpenGL
+
+import argparse
+import time
+
+import numpy as np
+
+import benchmark_escalado as scaling
+
+town = render.town
+
+def brute_force(origin, direction):
+    """Mismo resultado que town.ray_cast probando todas las cajas a la vez"""
+    inverse = np.divide(1.0, direction, out=np.full(3, np.inf), where=direction != 0)
+    t1 = (town.scene_box_low - origin) * inverse
+    t2 = (town.scene_box_high - origin) * inverse
+    near = np.maximum(np.minimum(t1, t2).max(axis=1), 0.0)
+    far = np.maximum(t1, t2).min(axis=1)
+    candidates = np.flatnonzero(near <= far)
+    best, best_node = np.inf, None
+    for item in candidates[np.argsort(near[candidates], kind="stable")]:
+        if near[item] >= best:
+            break
+        t = town.node_hit(item, origin, direction)
+        if t is not None and max(t, near[item]) < best:
+            best, best_node = max(t, near[item]), int(item)
+    return best_node
+
+def measure(n, queries, seed):
+    """Fila de resultados para un pueblo de n x n manzanas"""
+    steps = town.generate_town(n)
+    render.reset_gl_state(scaling.WIDTH, scaling.HEIGHT)
+    scaling.build(steps, "scene_graph")
+    name, town.camera_eye, town.camera_target, far = scaling.cameras(n)[0]
+    town.z_far = far
+    view = town.view_matrix()
+
+    start = time.perf_counter()
+    town.build_picking()
+    build_ms = (time.perf_counter() - start) * 1000
+
+    rng = np.random.default_rng(seed)
+    rays = [town.screen_ray(u, v, 1.0, 1.0, view) for u, v in rng.random((queries, 2))]
+    for origin, direction in rays[:20]:  # Calentamiento: triángulos de cada modelo
+        town.ray_cast(origin, direction)
+    bvh_times, brute_times, hits, mismatches = [], [], 0, 0
+    for origin, direction in rays:
+        start = time.perf_counter()
+        node = town.ray_cast(origin, direction)
+        bvh_times.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        expected = brute_force(origin, direction)
+        brute_times.append((time.perf_counter() - start) * 1000)
+        hits += node is not None
+        mismatches += node != expected
+    return {
+        "n": n, "objetos": len(town.scene_keys), "nodos_bvh": len(town.scene_bvh["low"]),
+        "construccion_ms": round(build_ms, 1), "aciertos": hits, "distintos": mismatches,
+        "p50_ms": round(float(np.percentile(bvh_times, 50)), 3), "p95_ms": round(float(np.percentile(bvh_times, 95)), 3),
+        "max_ms": round(max(bvh_times), 3), "bruta_p50_ms": round(float(np.percentile(brute_times, 50)), 3),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo de selección con la BVH del grafo de escena")
+    parser.add_argument("--tamanos", nargs="+", type=int, default=[26], help="valores de N (26 da ~10k objetos)")
+    parser.add_argument("--consultas", type=int, default=1000, help="rayos por pueblo")
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args()
+
+    render.create_context(scaling.WIDTH, scaling.HEIGHT)
+    columns = ["n", "objetos", "nodos_bvh", "construccion_ms", "aciertos", "distintos",
+               "p50_ms", "p95_ms", "max_ms", "bruta_p50_ms"]
+    print("".join(f"{column:>16}" for column in columns))
+    for n in args.tamanos:
+        row = measure(n, args.consultas, args.semilla)
+        print("".join(f"{row[column]:>16}" for column in columns))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""Exporta el pueblo de proyectofinal3 o la ciudad de proyectofinal3(2) a glTF binario (.glb) y OBJ.
+
+Uso:
+    python exportar_escena.py pueblo --glb pueblo.glb --obj pueblo.obj
+    python exportar_escena.py ciudad --glb ciudad.glb
+    python exportar_escena.py pueblo --tamano 26 --glb pueblo26.glb   # pueblo generado de 26 x 26 manzanas
+
+La geometría se obtiene capturando los draw_* (capture_geometry, sin contexto OpenGL)
+con el mayor nivel de detalle. Los modelos repetidos y los que producen exactamente
+la misma malla se guardan una sola vez, indexados, y cada objeto es un nodo con su
+matriz de mundo. En OBJ no hay instancias: cada nodo se escribe ya transformado, por
+bloques, igual que el binario del .glb, para no armar el archivo entero en memoria.
+"""
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import struct
+import time
+
+import numpy as np
+
+import proyectofinal3 as town
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+GLTF_MODES = {"triangles": 4, "lines": 1}  # TRIANGLES y LINES de glTF
+OBJ_BLOCK = 256  # Nodos por escritura en el OBJ
+
+def town_nodes(size):
+    """(claves, matrices de mundo, modelos) del pueblo original o de uno generado de size x size manzanas"""
+    keys, worlds = town.evaluate_steps(town.generate_town(size) if size else town.TOWN)
+    return keys, worlds, town.MODELS
+
+def city_nodes(size):
+    """La ciudad de proyectofinal3(2) en t = 0, con las partes que draw_scene dibuja aparte
+    (suelo, muñeco de nieve, aro que gira y nubes)"""
+    spec = importlib.util.spec_from_file_location("ciudad", os.path.join(HERE, "proyectofinal3(2).py"))
+    city = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(city)
+    keys, worlds = town.evaluate_steps(city.CITY)
+    clouds = city.cloud_matrices(0.0)
+    extra_keys = [city.GROUND, city.SNOWMAN, city.HOOP] + [city.CLOUD] * len(clouds)
+    extra_worlds = [np.identity(4), city.snowman_matrix(0.0), city.hoop_matrix(0.0), *clouds]
+    return keys + extra_keys, np.concatenate([worlds, extra_worlds]), city.CITY_MODELS
+
+SCENES = {"pueblo": town_nodes, "ciudad": city_nodes}
+
+def indexed(data):
+    """Vértices únicos (float32, 9 por vértice) e índices uint32 de una primitiva capturada"""
+    vertices, indices = np.unique(np.ascontiguousarray(data, dtype=np.float32), axis=0, return_inverse=True)
+    normals = vertices[:, 6:]
+    length = np.linalg.norm(normals, axis=1, keepdims=True)
+    vertices[:, 6:] = np.where(length > 1e-6, normals / np.maximum(length, 1e-6), (0.0, 1.0, 0.0))
+    return vertices, indices.astype(np.uint32).ravel()
+
+def unique_meshes(keys, models):
+    """Captura cada modelo distinto y junta los que dan la misma malla.
+
+    Devuelve (mallas, malla de cada nodo); cada malla es (nombre, {tipo: (vértices, índices)}).
+    """
+    meshes, by_digest, mesh_of_key = [], {}, {}
+    for key in dict.fromkeys(keys):
+        baked = town.capture_geometry(models[key[0]], *key[1], level=0)
+        primitives = {kind: indexed(data) for kind, data in baked.items()}
+        digest = hashlib.sha1()
+        for kind, (vertices, indices) in sorted(primitives.items()):
+            digest.update(kind.encode() + vertices.tobytes() + indices.tobytes())
+        if digest.digest() not in by_digest:
+            by_digest[digest.digest()] = len(meshes)
+            meshes.append((key[0], primitives))
+        mesh_of_key[key] = by_digest[digest.digest()]
+    return meshes, [mesh_of_key[key] for key in keys]
+
+def write_glb(path, meshes, mesh_ids, worlds):
+    """glTF 2.0 binario: una malla por modelo único y un nodo (malla + matriz) por objeto"""
+    views, accessors, gltf_meshes, chunks, offset = [], [], [], [], 0
+
+    def add_view(data, target, stride=None):
+        nonlocal offset
+        views.append({"buffer": 0, "byteOffset": offset, "byteLength": data.nbytes, "target": target})
+        if stride:
+            views[-1]["byteStride"] = stride
+        chunks.append(data)
+        offset += data.nbytes  # Vértices e índices ocupan múltiplos de 4 bytes: no hace falta relleno
+        return len(views) - 1
+
+    for name, primitives in meshes:
+        gltf_primitives = []
+        for kind, (vertices, indices) in primitives.items():
+            view = add_view(vertices, 34962, town.VERTEX_STRIDE)  # ARRAY_BUFFER intercalado
+            attributes = {}
+            for attribute, column in (("POSITION", 0), ("COLOR_0", 3), ("NORMAL", 6)):
+                accessors.append({"bufferView": view, "byteOffset": column * 4, "componentType": 5126,
+                                  "count": len(vertices), "type": "VEC3"})
+                attributes[attribute] = len(accessors) - 1
+            accessors[attributes["POSITION"]].update(min=vertices[:, :3].min(axis=0).tolist(),
+                                                     max=vertices[:, :3].max(axis=0).tolist())
+            accessors.append({"bufferView": add_view(indices, 34963), "componentType": 5125,
+                              "count": len(indices), "type": "SCALAR"})
+            gltf_primitives.append({"attributes": attributes, "indices": len(accessors) - 1,
+                                    "mode": GLTF_MODES[kind], "material": 0})
+        gltf_meshes.append({"name": name, "primitives": gltf_primitives})
+
+    nodes = [{"mesh": mesh, "matrix": world.T.ravel().tolist()} for mesh, world in zip(mesh_ids, worlds)]
+    document = {
+        "asset": {"version": "2.0", "generator": "exportar_escena.py"},
+        "scene": 0, "scenes": [{"nodes": list(range(len(nodes)))}], "nodes": nodes, "meshes": gltf_meshes,
+        "materials": [{"pbrMetallicRoughness": {"metallicFactor": 0.0, "roughnessFactor": 1.0}, "doubleSided": True}],
+        "accessors": accessors, "bufferViews": views, "buffers": [{"byteLength": offset}],
+    }
+    header = json.dumps(document, separators=(",", ":")).encode()
+    header += b" " * (-len(header) % 4)  # El bloque JSON se rellena con espacios hasta múltiplo de 4
+    with open(path, "wb") as file:
+        file.write(struct.pack("<4sII", b"glTF", 2, 12 + 8 + len(header) + 8 + offset))
+        file.write(struct.pack("<I4s", len(header), b"JSON") + header)
+        file.write(struct.pack("<I4s", offset, b"BIN\0"))
+        for data in chunks:
+            file.write(data.tobytes())
+
+def obj_lines(primitives, world, first):
+    """Texto OBJ de un nodo: vértices (con color), normales y caras/líneas a partir del índice first"""
+    text = []
+    for kind, (vertices, indices) in primitives.items():
+        positions = vertices[:, :3] @ world[:3, :3].T + world[:3, 3]
+        normals = vertices[:, 6:] @ np.linalg.inv(world[:3, :3])  # Inversa transpuesta
+        normals /= np.maximum(np.linalg.norm(normals, axis=1, keepdims=True), 1e-12)
+        text.append(("v %.5f %.5f %.5f %.3f %.3f %.3f\n" * len(vertices))
+                    % tuple(np.hstack([positions, vertices[:, 3:6]]).ravel()))
+        text.append(("vn %.4f %.4f %.4f\n" * len(vertices)) % tuple(normals.ravel()))
+        if kind == "triangles":  # Las caras llevan su normal (v//vn); las líneas de OBJ no admiten normales
+            element, references = "f" + " %d//%d" * 3 + "\n", np.repeat(indices + first, 2)
+        else:
+            element, references = "l %d %d\n", indices + first
+        corners = 3 if kind == "triangles" else 2
+        text.append((element * (len(indices) // corners)) % tuple(references))
+        first += len(vertices)
+    return "".join(text), first
+
+def write_obj(path, meshes, mesh_ids, worlds):
+    """OBJ con colores por vértice (v x y z r g b), un objeto por nodo, escrito por bloques"""
+    first = 1
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("# exportar_escena.py: %d objetos, %d mallas distintas\n" % (len(mesh_ids), len(meshes)))
+        block = []
+        for node, (mesh, world) in enumerate(zip(mesh_ids, worlds)):
+            name, primitives = meshes[mesh]
+            text, first = obj_lines(primitives, world, first)
+            block.append("o %s_%d\n%s" % (name, node, text))
+            if len(block) == OBJ_BLOCK:
+                file.write("".join(block))
+                block = []
+        file.write("".join(block))
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta el pueblo o la ciudad a glTF binario y OBJ")
+    parser.add_argument("escena", choices=list(SCENES))
+    parser.add_argument("--tamano", type=int, default=0, help="N del pueblo generado (0: el pueblo original)")
+    parser.add_argument("--glb", help="archivo .glb de salida")
+    parser.add_argument("--obj", help="archivo .obj de salida")
+    args = parser.parse_args()
+    if not args.glb and not args.obj:
+        parser.error("indicar --glb y/o --obj")
+
+    start = time.perf_counter()
+    keys, worlds, models = SCENES[args.escena](args.tamano)
+    meshes, mesh_ids = unique_meshes(keys, models)
+    vertices = sum(len(v) for _, primitives in meshes for v, _ in primitives.values())
+    print(f"{len(keys)} objetos, {len(set(keys))} modelos, {len(meshes)} mallas distintas "
+          f"({vertices} vértices compartidos) en {time.perf_counter() - start:.2f} s")
+    for path, writer in ((args.glb, write_glb), (args.obj, write_obj)):
+        if path:
+            start = time.perf_counter()
+            writer(path, meshes, mesh_ids, worlds)
+            print(f"{path}: {os.path.getsize(path) / 2 ** 20:.1f} MB en {time.perf_counter() - start:.2f} s")
+
+if __name__ == "__main__":
+    main()
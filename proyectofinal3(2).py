@@ -4,35 +4,56 @@ import glfw
 import cv2
 import numpy as np
 import sys
+import os
 import math
-import mediapipe as mp
 import random
+import threading
+import proyectofinal3 as town  # Caché de mallas y nivel de detalle compartidos
 
 # --- CONFIGURACIÓN MEDIAPIPE ---
-mp_hands = mp.solutions.hands
-hands = mp_hands.Hands(
-    static_image_mode=False,
-    max_num_hands=1,
-    min_detection_confidence=0.7,
-    min_tracking_confidence=0.5
-)
-mp_drawing = mp.solutions.drawing_utils
+# Se carga al abrir la cámara, así la escena se puede dibujar sin mediapipe (por ejemplo, fuera de pantalla)
+mp_hands = None
+hands = None
+mp_drawing = None
+
+def init_hands():
+    global mp_hands, hands, mp_drawing
+    import mediapipe as mp
+    mp_hands = mp.solutions.hands
+    hands = mp_hands.Hands(
+        static_image_mode=False,
+        max_num_hands=1,
+        min_detection_confidence=0.7,
+        min_tracking_confidence=0.5
+    )
+    mp_drawing = mp.solutions.drawing_utils
 
 # Variables de Cámara
 camera_angle_x = 0.5
 camera_angle_y = 0.5 
 camera_distance = 80.0 
 window = None
+use_scene_graph = True # Casas, árboles y nubes instanciados; False = modo inmediato
+scene_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ciudad_escena.json")  # Mallas guardadas
+camera_lock = threading.Lock() # Protege latest_frame
+camera_stop = threading.Event()
+latest_frame = None # Último frame leído por el hilo de la cámara, sin procesar
 
 # --- GEOMETRÍA---
 def init():
     glClearColor(0.53, 0.81, 0.92, 1.0) # Azul Cielo
     glEnable(GL_DEPTH_TEST)
-    glEnable(GL_LIGHTING); glEnable(GL_LIGHT0); glEnable(GL_COLOR_MATERIAL)
-    glColorMaterial(GL_FRONT_AND_BACK, GL_AMBIENT_AND_DIFFUSE)
+    if not (use_scene_graph and town.use_baked_lighting): # Con luz horneada no hace falta GL_LIGHTING
+        glEnable(GL_LIGHTING); glEnable(GL_LIGHT0); glEnable(GL_COLOR_MATERIAL)
+        glColorMaterial(GL_FRONT_AND_BACK, GL_AMBIENT_AND_DIFFUSE)
     glMatrixMode(GL_PROJECTION)
     gluPerspective(60, 1.33, 0.1, 500.0)
     glMatrixMode(GL_MODELVIEW)
+    # Misma proyección para el recorte y el nivel de detalle del grafo
+    town.fov_y, town.aspect_ratio, town.z_near, town.z_far = 60, 1.33, 0.1, 500.0
+    town.viewport_height = 768
+    if use_scene_graph:
+        town.open_scene(scene_file, CITY, CITY_MODELS, extra_keys=[CLOUD, GROUND, SNOWMAN, HOOP])
 
 def draw_cylinder():
     glPushMatrix(); glColor3f(0.6, 0.0, 0.0); glTranslatef(0.0, -1.0, 0.0); glRotatef(-90, 1, 0, 0)
@@ -49,15 +70,17 @@ def draw_hoop(): # Aro simple
     gluCylinder(gluNewQuadric(), 0.5, 0.5, 0.1, 32, 32); glPopMatrix()
 
 def draw_light_pole():
+    level = town.object_lod(4.0)
     glPushMatrix(); glColor3f(0.2, 0.2, 0.2); glRotatef(-90, 1, 0, 0)
-    gluCylinder(gluNewQuadric(), 0.15, 0.1, 8.0, 16, 16); glPopMatrix()
+    town.solid_cylinder(0.15, 0.1, 8.0, 16, 16, level); glPopMatrix()
     glPushMatrix(); glColor3f(1.0, 1.0, 0.0); glTranslatef(0, 8.0, 0)
-    gluSphere(gluNewQuadric(), 0.5, 16, 16); glPopMatrix()
+    town.solid_sphere(0.5, 16, 16, level); glPopMatrix()
 
 def draw_cloud():
-    glPushMatrix(); glColor3f(1.0, 1.0, 1.0); q = gluNewQuadric()
+    level = town.object_lod(2.0)
+    glPushMatrix(); glColor3f(1.0, 1.0, 1.0)
     for p in [(0,0.5,0),(-0.8,0,0),(0.8,0,0),(0,0,-0.8),(0,0,0.8)]:
-        glPushMatrix(); glTranslatef(*p); gluSphere(q, 1.0, 32, 32); glPopMatrix()
+        glPushMatrix(); glTranslatef(*p); town.solid_sphere(1.0, 32, 32, level); glPopMatrix()
     glPopMatrix()
 
 def draw_snowman():
@@ -71,21 +94,23 @@ def draw_snowman():
 
 # --- ARBOLES (Estandarizados para que no sean gigantes) ---
 def draw_tree_simple():
+    level = town.object_lod(3.0)
     glPushMatrix()
     # Tronco
     glColor3f(0.55, 0.27, 0.07); glRotatef(-90, 1, 0, 0)
-    gluCylinder(gluNewQuadric(), 0.5, 0.5, 2.0, 16, 16)
+    town.solid_cylinder(0.5, 0.5, 2.0, 16, 16, level)
     # Hojas
     glTranslatef(0, 0, 2.0); glColor3f(0.13, 0.55, 0.13)
-    gluCylinder(gluNewQuadric(), 2.0, 0.0, 4.0, 16, 16) # Pino
+    town.solid_cylinder(2.0, 0.0, 4.0, 16, 16, level) # Pino
     glPopMatrix()
 
 def draw_tree_round():
+    level = town.object_lod(2.5)
     glPushMatrix()
     glColor3f(0.55, 0.27, 0.07); glRotatef(-90, 1, 0, 0)
-    gluCylinder(gluNewQuadric(), 0.4, 0.4, 2.5, 16, 16)
+    town.solid_cylinder(0.4, 0.4, 2.5, 16, 16, level)
     glTranslatef(0, 0, 2.5); glColor3f(0.2, 0.8, 0.2)
-    gluSphere(gluNewQuadric(), 1.8, 16, 16)
+    town.solid_sphere(1.8, 16, 16, level)
     glPopMatrix()
 
 # --- CASAS (Estandarizadas) ---
@@ -135,25 +160,21 @@ def draw_ground():
 
 
 # -------------------------------------------------------------------------
-# DIBUJO DE ESCENA 
+# CIUDAD ESTÁTICA (pasos para el grafo de escena de proyectofinal3)
 # -------------------------------------------------------------------------
-def draw_scene():
-    global camera_angle_x, camera_angle_y, camera_distance
-    
-    glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-    glLoadIdentity()
-    
-    # Cámara
-    cam_x = camera_distance * math.sin(camera_angle_y) * math.cos(camera_angle_x)
-    cam_y = camera_distance * math.cos(camera_angle_y)
-    cam_z = camera_distance * math.sin(camera_angle_y) * math.sin(camera_angle_x)
-    if cam_y < 2.0: cam_y = 2.0
-    gluLookAt(cam_x, cam_y, cam_z, 0, 0, 0, 0, 1, 0)
-    
-    t = glfw.get_time()
+CITY_MODELS = {
+    "draw_house_type1": draw_house_type1, "draw_house_type2": draw_house_type2,
+    "draw_tree_simple": draw_tree_simple, "draw_tree_round": draw_tree_round,
+    "draw_light_pole": draw_light_pole, "draw_cylinder": draw_cylinder,
+    "draw_board": draw_board, "draw_hoop": draw_hoop, "draw_cloud": draw_cloud,
+    "draw_ground": draw_ground, "draw_snowman": draw_snowman,
+}
+CLOUD = ("draw_cloud", ())
+# Partes que se dibujan aparte cada frame; con el grafo salen de la caché (con la luz horneada)
+GROUND, SNOWMAN, HOOP = ("draw_ground", ()), ("draw_snowman", ()), ("draw_hoop", ())
 
-    draw_ground()
-    
+def city_steps():
+    steps = []
     # --- 1. GENERACIÓN PROCEDURAL DE CIUDAD (GRID) ---
     # Esto crea muchas casas ordenadas sin tener que escribirlas una por una
     block_size = 15 # Tamaño de cada "cuadra"
@@ -166,117 +187,190 @@ def draw_scene():
             if -1 <= x <= 1 and -1 <= z <= 1:
                 continue
 
-            glPushMatrix()
-            glTranslatef(x * block_size, 0, z * block_size)
+            steps += [("push",), ("translate", x * block_size, 0, z * block_size)]
             
             # Decidir qué dibujar basado en la posición para variedad
             if (x + z) % 3 == 0:
-                draw_house_type1()
+                steps.append(("model", "draw_house_type1"))
                 # Arbolito al lado de la casa
-                glPushMatrix(); glTranslatef(3.5, 0, 2); glScalef(0.6, 0.6, 0.6); draw_tree_simple(); glPopMatrix()
+                steps += [("push",), ("translate", 3.5, 0, 2), ("scale", 0.6, 0.6, 0.6), ("model", "draw_tree_simple"), ("pop",)]
             elif (x + z) % 3 == 1:
-                glRotatef(90, 0, 1, 0)
-                draw_house_type2()
+                steps += [("rotate", 90, 0, 1, 0), ("model", "draw_house_type2")]
                 # Poste de luz en la esquina
-                glPushMatrix(); glTranslatef(4, 0, 4); glScalef(0.5, 0.5, 0.5); draw_light_pole(); glPopMatrix()
+                steps += [("push",), ("translate", 4, 0, 4), ("scale", 0.5, 0.5, 0.5), ("model", "draw_light_pole"), ("pop",)]
             else:
                 # Bosquecillo (Lote baldío con árboles)
-                glPushMatrix(); glTranslatef(-2, 0, -2); draw_tree_round(); glPopMatrix()
-                glPushMatrix(); glTranslatef(2, 0, 1); glScalef(1.2,1.2,1.2); draw_tree_simple(); glPopMatrix()
-                glPushMatrix(); glTranslatef(0, 0, -3); glScalef(0.8,0.8,0.8); draw_tree_round(); glPopMatrix()
+                steps += [("push",), ("translate", -2, 0, -2), ("model", "draw_tree_round"), ("pop",)]
+                steps += [("push",), ("translate", 2, 0, 1), ("scale", 1.2, 1.2, 1.2), ("model", "draw_tree_simple"), ("pop",)]
+                steps += [("push",), ("translate", 0, 0, -3), ("scale", 0.8, 0.8, 0.8), ("model", "draw_tree_round"), ("pop",)]
 
-            glPopMatrix()
+            steps.append(("pop",))
 
-    # --- 2. EL PARQUE CENTRAL ---
-    
-    # Muñeco de Nieve (Animado saltando)
-    glPushMatrix()
-    glTranslatef(0, 0, 0) # En el puro centro
-    jump = abs(math.sin(t*3)) * 1.5
-    glTranslatef(0, jump, 0)
-    glScalef(0.8, 0.8, 0.8)
-    draw_snowman()
-    glPopMatrix()
-    
-    # Cancha de Basquet (Izquierda)
-    glPushMatrix()
-    glTranslatef(-8, 0, 0)
-    draw_cylinder(); draw_board(); 
-    # Aro animado girando
-    glPushMatrix(); glRotatef(t*100, 0, 1, 0); draw_hoop(); glPopMatrix()
-    glPopMatrix()
-    
+    # --- 2. EL PARQUE CENTRAL (partes fijas) ---
+    # Cancha de Basquet (Izquierda); el aro gira y se dibuja aparte
+    steps += [("push",), ("translate", -8, 0, 0), ("model", "draw_cylinder"), ("model", "draw_board"), ("pop",)]
     # Cancha de Basquet (Derecha)
-    glPushMatrix()
-    glTranslatef(8, 0, 0); glRotatef(180, 0, 1, 0)
-    draw_cylinder(); draw_board(); draw_hoop()
-    glPopMatrix()
-    
+    steps += [("push",), ("translate", 8, 0, 0), ("rotate", 180, 0, 1, 0),
+              ("model", "draw_cylinder"), ("model", "draw_board"), ("model", "draw_hoop"), ("pop",)]
     # Arboles grandes en el parque
-    glPushMatrix(); glTranslatef(0, 0, -8); glScalef(1.5, 1.5, 1.5); draw_tree_round(); glPopMatrix()
-    glPushMatrix(); glTranslatef(0, 0, 8); glScalef(1.5, 1.5, 1.5); draw_tree_round(); glPopMatrix()
-    
-    # --- 3. OBJETOS MÓVILES ---
-    # Nubes orbitando toda la ciudad
+    steps += [("push",), ("translate", 0, 0, -8), ("scale", 1.5, 1.5, 1.5), ("model", "draw_tree_round"), ("pop",)]
+    steps += [("push",), ("translate", 0, 0, 8), ("scale", 1.5, 1.5, 1.5), ("model", "draw_tree_round"), ("pop",)]
+    return steps
+
+CITY = city_steps()
+
+def cloud_matrices(t):
+    """Matrices de mundo de las 20 nubes que orbitan la ciudad"""
+    matrices = []
     for i in range(20):
-        glPushMatrix()
         angle = t * 0.05 + (i * 0.314)
         r = 50.0 + (i % 3) * 15.0 # Distintos radios
         h = 25.0 + math.sin(t + i) * 2.0
-        
-        glTranslatef(math.cos(angle)*r, h, math.sin(angle)*r)
-        
         # Orientar la nube hacia el centro (opcional, visualmente mejor)
-        glRotatef(-math.degrees(angle), 0, 1, 0)
-        
-        glScalef(3, 3, 3)
-        draw_cloud()
+        matrices.append(town.translation_matrix(math.cos(angle)*r, h, math.sin(angle)*r)
+                        @ town.rotation_matrix(-math.degrees(angle), 0, 1, 0) @ town.scale_matrix(3, 3, 3))
+    return np.array(matrices)
+
+def snowman_matrix(t):
+    """Matriz de mundo del muñeco de nieve, que salta en el centro"""
+    jump = abs(math.sin(t*3)) * 1.5
+    return town.translation_matrix(0, jump, 0) @ town.scale_matrix(0.8, 0.8, 0.8)
+
+def hoop_matrix(t):
+    """Matriz de mundo del aro que gira en la cancha izquierda"""
+    return town.translation_matrix(-8, 0, 0) @ town.rotation_matrix(t*100, 0, 1, 0)
+
+# -------------------------------------------------------------------------
+# DIBUJO DE ESCENA 
+# -------------------------------------------------------------------------
+def draw_scene(t=None):
+    """Dibuja la ciudad en el instante t (por defecto, el reloj monótono de proyectofinal3)"""
+    global camera_angle_x, camera_angle_y, camera_distance
+    
+    glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+    glLoadIdentity()
+    
+    # Cámara
+    cam_x = camera_distance * math.sin(camera_angle_y) * math.cos(camera_angle_x)
+    cam_y = camera_distance * math.cos(camera_angle_y)
+    cam_z = camera_distance * math.sin(camera_angle_y) * math.sin(camera_angle_x)
+    if cam_y < 2.0: cam_y = 2.0
+    gluLookAt(cam_x, cam_y, cam_z, 0, 0, 0, 0, 1, 0)
+    view = town.look_at_matrix((cam_x, cam_y, cam_z), (0, 0, 0), (0, 1, 0))
+    
+    if t is None:
+        t = town.steady_time()
+    town.begin_lod_frame()
+
+    if use_scene_graph:
+        town.draw_instances(view, GROUND, [np.identity(4)])
+    else:
+        draw_ground()
+    
+    # --- 1 y 2. CIUDAD Y PARTES FIJAS DEL PARQUE ---
+    if use_scene_graph:
+        town.draw_scene_graph(view)
+    else:
+        for step in CITY: town.apply_step(step, CITY_MODELS)
+    
+    # Muñeco de Nieve (Animado saltando)
+    jump = abs(math.sin(t*3)) * 1.5
+    if use_scene_graph:
+        town.draw_instances(view, SNOWMAN, [snowman_matrix(t)])
+    else:
+        glPushMatrix()
+        glTranslatef(0, 0, 0) # En el puro centro
+        glTranslatef(0, jump, 0)
+        glScalef(0.8, 0.8, 0.8)
+        draw_snowman()
         glPopMatrix()
+    
+    # Aro animado girando (Cancha izquierda)
+    if use_scene_graph:
+        town.draw_instances(view, HOOP, [hoop_matrix(t)])
+    else:
+        glPushMatrix(); glTranslatef(-8, 0, 0); glRotatef(t*100, 0, 1, 0); draw_hoop(); glPopMatrix()
+    
+    # --- 3. OBJETOS MÓVILES ---
+    # Nubes orbitando toda la ciudad
+    if use_scene_graph:
+        town.draw_instances(view, CLOUD, cloud_matrices(t))
+    else:
+        for matrix in cloud_matrices(t):
+            glPushMatrix(); glMultMatrixf(matrix.T.astype(np.float32)); draw_cloud(); glPopMatrix()
 
-    glfw.swap_buffers(window)
+    if window is not None:
+        glfw.swap_buffers(window)
 
 # --- LOOP PRINCIPAL ---
+def read_camera(cap):
+    """Hilo que lee la cámara: el render sigue su propio ritmo sin esperar a cap.read()"""
+    global latest_frame
+    while not camera_stop.is_set():
+        ret, frame = cap.read()
+        if not ret:
+            camera_stop.set()
+            break
+        with camera_lock:
+            latest_frame = frame
+
+def track_hand(frame):
+    """Mueve la cámara con la mano de un frame nuevo y lo muestra"""
+    global camera_angle_x, camera_angle_y, camera_distance
+    frame = cv2.flip(frame, 1)
+    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    results = hands.process(rgb_frame)
+
+    if results.multi_hand_landmarks:
+        hand = results.multi_hand_landmarks[0]
+        mp_drawing.draw_landmarks(frame, hand, mp_hands.HAND_CONNECTIONS)
+
+        index_tip = hand.landmark[8]
+        thumb_tip = hand.landmark[4]
+
+        # Rotación (Índice)
+        camera_angle_x = index_tip.x * 2 * math.pi
+        camera_angle_y = max(0.01, min(math.pi - 0.01, index_tip.y * math.pi))
+
+        # Zoom (Pinza)
+        pinch = math.sqrt((thumb_tip.x - index_tip.x)**2 + (thumb_tip.y - index_tip.y)**2)
+        # Mapeo: 0.05 (cerca) -> Zoom 20, 0.3 (lejos) -> Zoom 150
+        # Invertimos la lógica: Pellizco cerrado = Lejos, Abierto = Cerca
+        target_zoom = 150 - (pinch * 400)
+        camera_distance = max(20, min(150, camera_distance * 0.9 + target_zoom * 0.1))
+
+        cv2.putText(frame, f"Zoom: {int(camera_distance)}", (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0,255,0), 2)
+    if town.use_lod:
+        cv2.putText(frame, f"LOD: -{town.lod_triangles_saved} triangulos", (10, 80), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0,255,255), 2)
+    if town.TARGET_FPS > 0:
+        cv2.putText(frame, town.pacing_summary(), (10, 110), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0,255,255), 2)
+
+    cv2.imshow("Control MediaPipe", frame)
+
 def main_loop():
-    global camera_angle_x, camera_angle_y, camera_distance, window
+    global camera_angle_x, camera_angle_y, camera_distance, window, latest_frame
+    init_hands()
     cap = cv2.VideoCapture(0)
+    camera_stop.clear()
+    reader = threading.Thread(target=read_camera, args=(cap,), daemon=True)
+    reader.start()
     
-    while not glfw.window_should_close(window):
-        ret, frame = cap.read()
-        if not ret: break
-        
-        frame = cv2.flip(frame, 1)
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = hands.process(rgb_frame)
-        
-        if results.multi_hand_landmarks:
-            hand = results.multi_hand_landmarks[0]
-            mp_drawing.draw_landmarks(frame, hand, mp_hands.HAND_CONNECTIONS)
-            
-            index_tip = hand.landmark[8]
-            thumb_tip = hand.landmark[4]
-            
-            # Rotación (Índice)
-            camera_angle_x = index_tip.x * 2 * math.pi
-            camera_angle_y = max(0.01, min(math.pi - 0.01, index_tip.y * math.pi))
-            
-            # Zoom (Pinza)
-            pinch = math.sqrt((thumb_tip.x - index_tip.x)**2 + (thumb_tip.y - index_tip.y)**2)
-            # Mapeo: 0.05 (cerca) -> Zoom 20, 0.3 (lejos) -> Zoom 150
-            # Invertimos la lógica: Pellizco cerrado = Lejos, Abierto = Cerca
-            target_zoom = 150 - (pinch * 400)
-            camera_distance = max(20, min(150, camera_distance * 0.9 + target_zoom * 0.1))
-            
-            cv2.putText(frame, f"Zoom: {int(camera_distance)}", (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0,255,0), 2)
+    while not glfw.window_should_close(window) and not camera_stop.is_set():
+        with camera_lock:
+            frame, latest_frame = latest_frame, None
+        if frame is not None:
+            track_hand(frame)
         
         # Teclas WASD para mover si la mano cansa
         if glfw.get_key(window, glfw.KEY_W) == glfw.PRESS: camera_distance -= 1
         if glfw.get_key(window, glfw.KEY_S) == glfw.PRESS: camera_distance += 1
 
-        cv2.imshow("Control MediaPipe", frame)
         draw_scene()
         glfw.poll_events()
         if cv2.waitKey(1) & 0xFF == ord('q'): break
+        town.pace_frame()
             
+    camera_stop.set(); reader.join()
     cap.release(); cv2.destroyAllWindows(); glfw.terminate()
 
 def main():
@@ -285,6 +379,7 @@ def main():
     window = glfw.create_window(1024, 768, "Ciudad 3D Generada", None, None)
     if not window: glfw.terminate(); sys.exit()
     glfw.make_context_current(window)
+    town.set_swap_interval()
     glViewport(0, 0, 1024, 768)
     init()
     main_loop()
@@ -1,10 +1,21 @@
 from OpenGL.GL import *
+from OpenGL.GL import shaders
 from OpenGL.GLU import gluPerspective, gluLookAt, gluNewQuadric, gluCylinder, gluSphere
 import glfw
 import cv2
 import numpy as np
 import sys
 import math
+import csv
+import ctypes
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+import types
+from collections import deque
 # Variables globales para transformaciones
 rotation_angle = 0.0
 translation_x = 0.0
@@ -12,9 +23,166 @@ translation_y = 0.0
 scale_factor = 1.0
 prev_gray = None
 flow_threshold = 0.5
+camera_lock = threading.Lock()   # Protege camera_updates y camera_frame
+camera_stop = threading.Event()  # Detiene el hilo de la cámara
+camera_updates = []    # (instante de captura, cambios) de cada frame analizado, pendientes de aplicar
+camera_frame = None    # Último frame analizado, pendiente de mostrar
+camera_ready = threading.Event()  # Avisa al bucle de render que hay un frame nuevo
+use_transform_interpolation = True  # Entre frames analizados las transformaciones se interpolan en vez de saltar
+INTERPOLATION_DELAY = 0.05  # Retraso (s) con que se muestran; 0 o negativo necesita extrapolar (menos retraso)
+use_extrapolation = True  # Pasado el último objetivo se sigue con su velocidad, hasta EXTRAPOLATION_LIMIT
+EXTRAPOLATION_LIMIT = 0.05  # Máximo (s) que se extrapola; después se mantiene el último objetivo
+transform_targets = deque(maxlen=8)  # (instante de captura, (rotación, tx, ty, escala)) con los cambios aplicados
+transform_lag_ms = None  # Último retraso medido entre la captura y el estado mostrado
+use_render_on_demand = True  # Sólo se redibuja cuando cambia el estado de la escena
+scene_dirty = True     # Forzar el próximo redibujado (ventana redimensionada o expuesta)
+drawn_state = None     # Estado de transformación del último frame dibujado
+IDLE_WAIT = 0.05       # Espera máxima (s) por un frame de cámara con la escena sin cambios
+TARGET_FPS = 60        # Frames por segundo de los bucles de render (0: sin límite)
+use_vsync = False      # glfw.swap_interval(1): swap_buffers espera el refresco del monitor
+FRAME_SPIN = 0.001     # Último tramo (s) antes del plazo que se espera activamente: sleep es impreciso
+frame_deadline = None  # Instante (time.perf_counter) en que termina el frame en curso
+frame_pacing = {"frames": 0, "perdidos": 0, "peor_ms": 0.0}  # Plazos de frame cumplidos y perdidos
+clock_start = time.perf_counter()  # Origen de steady_time()
+use_frame_stats = False  # Mide cada etapa del frame y cuenta las llamadas de dibujo
+show_hud = False       # Muestra las estadísticas sobre la escena (tecla h en la ventana de la cámara; activa use_frame_stats)
+STATS_WINDOW = 240     # Muestras recientes con las que se calculan los percentiles del HUD
+STATS_HISTORY = 10000  # Muestras guardadas por etapa para el CSV
+STATS_CSV = "estadisticas_frames.csv"  # Se escribe al salir si use_frame_stats está activo
+stats_lock = threading.Lock()  # Las etapas de la cámara se miden en su propio hilo
+stage_samples = {}     # Etapa -> deque de milisegundos (o de cuentas, para los contadores)
+gl_counts = {"dibujos": 0, "glVertex": 0, "cuadricas": 0}  # Llamadas del frame en curso
+gl_originals = {}      # Funciones GL reemplazadas por contadores
+flow_engine = "farneback"  # Flujo óptico de las zonas de rotación y traslación: ver FLOW_ENGINES
+dis_engine = None      # Instancia de cv2.DISOpticalFlow, creada al usarla
+DIS_GAIN = 0.55        # Flujo medio de Farneback por px del flujo medio de DIS (benchmark_gestos.py la sugiere)
+LK_MAX_CORNERS = 50    # Esquinas seguidas por Lucas-Kanade en cada zona
+LK_MIN_MOTION = 0.1    # Desplazamiento (px) a partir del cual una esquina cuenta como movida
+LK_GAIN = 0.1          # Flujo medio denso por px de la mediana de las esquinas movidas (benchmark_gestos.py la sugiere)
+use_adaptive_resolution = True  # Reduce el gris antes del flujo óptico para no pasar del presupuesto
+ANALYSIS_BUDGET_MS = 8.0  # Tiempo máximo de flujo óptico por frame
+ANALYSIS_SCALES = (1.0, 0.75, 0.5, 0.35, 0.25)  # Escalas posibles del gris analizado
+ANALYSIS_SMOOTHING = 0.2  # Peso de cada medición en el promedio móvil del tiempo
+ANALYSIS_HYSTERESIS = 0.25  # Margen bajo el presupuesto para volver a una escala mayor
+analysis_level = 0     # Índice en ANALYSIS_SCALES
+analysis_ms = None     # Promedio móvil del tiempo de flujo óptico en la escala actual
+use_motion_gate = True # Sin cambios en una zona no se calcula su flujo ni su contorno
+MOTION_GATE_STEP = 8   # Reducción del recorte antes de comparar con el frame anterior
+MOTION_GATE_THRESHOLD = 1.0  # Diferencia media (niveles de gris) a partir de la cual hay movimiento
+skipped_frames = {"rotacion": 0, "traslacion": 0, "escala": 0, "seleccion": 0}  # Frames en que cada zona estaba quieta
+analyzed_frames = 0    # Frames analizados en total
+last_hand_position = None  # Última posición normalizada de la mano en la zona de escala
+hand_locator = "contorno"  # Cómo se ubica la mano en la zona de escala: ver HAND_LOCATORS
+use_finger_selection = True  # La punta del dedo en la zona de abajo a la derecha selecciona el objeto que señala
+PROFILE_STEP = 4       # Reducción de la zona antes de sumar columnas en el modo "perfil"
+PROFILE_MIN_FRACTION = 0.02  # Fracción mínima de píxeles oscuros para considerar que hay mano
+PROFILE_SMOOTHING = 0.5  # Peso de la nueva posición en el promedio móvil del modo "perfil"
+profile_position = None  # Posición suavizada del modo "perfil"
 
 # Configuración global
 window = None  # Ventana global
+# Modo de dibujo: "immediate", "display_list" (pueblo grabado una vez en init())
+# o "scene_graph" (nodos con matriz de mundo precalculada y modelos en VBOs)
+render_mode = "scene_graph"
+town_list = 0         # Display list con el pueblo estático
+camera_eye = (50, 25, 50)
+camera_target = (0, 5, 0)
+camera_up = (0, 1, 0)
+fov_y, aspect_ratio, z_near, z_far = 60, 1.0, 0.1, 100.0  # Proyección de gluPerspective
+use_mesh_cache = True  # Esferas y cilindros desde mallas NumPy precalculadas
+mesh_cache = {}        # (primitiva, parámetros...) -> malla
+shared_quadric = None  # Única cuádrica GLU, para cuando no se usa el caché
+scene_keys = []        # Modelo de cada nodo del grafo: (nombre de draw_*, argumentos)
+scene_worlds = np.zeros((0, 4, 4))  # Matriz de mundo de cada nodo
+model_geometry = {}    # Modelo -> geometría capturada en cada nivel de detalle
+model_buffers = {}     # Modelo -> VBOs
+model_spheres = {}     # Modelo -> esfera envolvente (centro, radio) en coordenadas del modelo
+scene_centers = np.zeros((0, 3))  # Esfera envolvente de cada nodo en coordenadas de mundo
+scene_radii = np.zeros(0)
+use_frustum_culling = True  # Sólo se dibujan los nodos dentro del volumen de visión
+drawn_nodes = 0        # Nodos dibujados en el último frame
+use_lod = True         # Esferas y cilindros con menos divisiones cuando se ven pequeños
+LOD_FACTORS = (1.0, 0.5, 0.25)  # Fracción de slices/stacks de cada nivel
+LOD_PIXELS = (40, 12)  # Radio en pantalla (px) bajo el cual se pasa al siguiente nivel
+LOD_HYSTERESIS = 0.15  # Margen relativo para cambiar de nivel
+forced_lod = None      # Nivel fijo mientras se graba una display list (las capturas usan capture_local)
+lod_triangles_saved = 0  # Triángulos ahorrados por el LOD en el último frame (sólo lo que se dibujó en él)
+lod_call = 0           # Objetos en modo inmediato dibujados en este frame
+immediate_lod_levels = []  # Nivel anterior de cada objeto en modo inmediato
+lod_pixel_scale = 300 / math.tan(math.radians(30))  # Píxeles por unidad a distancia 1
+scene_levels = np.zeros(0, dtype=int)  # Nivel actual de cada nodo del grafo
+model_triangles = {}   # Modelo -> triángulos en cada nivel
+scene_key_list = []    # Modelos distintos del grafo
+scene_key_ids = np.zeros(0, dtype=int)  # Índice en scene_key_list de cada nodo
+scene_tints = np.zeros((0, 3), dtype=np.float32)  # Color que multiplica a cada nodo
+use_instancing = True  # Copias de un mismo modelo en una sola llamada (o un lote si no hay soporte)
+instancing_supported = None  # Se decide al primer dibujo: shader + glDrawArraysInstanced
+instance_program = 0
+instance_attributes = {}
+instance_buffer = 0
+batch_cache = {}       # Último lote de vertex arrays del grafo (sin instancing)
+instance_levels = {}   # Modelo -> nivel de cada copia dibujada con draw_instances
+BVH_LEAF_SIZE = 4      # Objetos por hoja de la jerarquía de selección
+scene_bvh = None       # Jerarquía de cajas del grafo para seleccionar con un rayo
+scene_box_low = np.zeros((0, 3))  # Caja de mundo de cada nodo
+scene_box_high = np.zeros((0, 3))
+scene_box_list = []    # Las mismas cajas como listas, para recorrer la BVH
+scene_inverse_worlds = np.zeros((0, 4, 4))  # Para llevar el rayo a coordenadas del modelo
+model_boxes = {}       # Modelo -> caja (mínimo, máximo) en sus coordenadas
+pick_triangles = {}    # Modelo -> triángulos preparados para la prueba del rayo
+selected_node = None   # Nodo seleccionado (se resalta con una caja amarilla)
+scene_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pueblo_escena.json")  # Escena y mallas guardadas (None = capturar siempre los draw_*)
+use_merged_parts = True  # Casas y demás partes sin LOD horneadas en VBOs de mundo
+use_baked_lighting = True  # Luz del sol con la normal de mundo en el grafo: se dibuja sin GL_LIGHTING
+LIGHT_DIRECTION = (0.3, 1.0, 0.5)  # Hacia el sol, en coordenadas de mundo
+LIGHT_AMBIENT = 0.4    # Fracción del color que recibe una cara de espaldas al sol
+LIGHT_DIFFUSE = 0.6    # Fracción que se suma según el coseno con el sol
+use_baked_ao = True    # Oclusión ambiental por vértice, horneada al capturar cada modelo
+AO_STRENGTH = 0.5      # Oscurecimiento de un vértice completamente ocluido
+AO_MAX_OCCLUDERS = 2048  # Discos por modelo; si hay más se toma uno de cada k con k veces el área
+use_background_build = True  # El grafo se arma en un hilo mientras la ventana ya dibuja
+UPLOAD_BUDGET_MS = 4.0  # Tiempo por frame para subir a VBOs lo que terminó el hilo de armado
+GROUND_WAIT = 0.1      # Espera máxima (s) por el suelo antes del primer frame
+FIRST_FRAME_BUDGET_MS = 500.0  # Presupuesto de tiempo hasta el primer frame, desde que se cargó el módulo
+bake_queue = queue.Queue()  # Hilo de armado -> hilo de OpenGL: nodos, modelos y partes fusionadas
+scene_loading = False  # Hay un armado en curso: se dibujan los nodos cuyos modelos ya llegaron
+loading_keys = []      # Nodos de la escena en armado
+loading_worlds = np.zeros((0, 4, 4))
+loading_key_list = []  # Modelos distintos de la escena en armado
+loading_key_ids = np.zeros(0, dtype=int)  # Índice en loading_key_list de cada nodo
+loading_cache = {}     # Lotes del armado (sin instancing), como batch_cache
+loading_ready = np.zeros(0, dtype=bool)  # Nodos cuyo modelo ya está en VBOs
+loading_centers = np.zeros((0, 3))
+loading_radii = np.zeros(0)
+loading_levels = np.zeros(0, dtype=int)
+first_frame_ms = None  # Tiempo hasta el primer frame
+scene_ready_ms = None  # Tiempo hasta tener la escena completa
+MERGE_CELL_SIZE = 30.0 # Lado de las celdas en que se agrupan las partes fusionadas
+scene_merged = np.zeros(0, dtype=bool)  # Nodos que se dibujan desde los VBOs fusionados
+merged_buffers = {}    # Tipo de primitiva -> (vbo, vértices)
+merged_firsts = {}     # Tipo -> primer vértice de cada celda
+merged_counts = {}     # Tipo -> vértices de cada celda
+merged_centers = np.zeros((0, 3))  # Esfera envolvente de cada celda
+merged_radii = np.zeros(0)
+merged_node_counts = np.zeros(0, dtype=int)  # Nodos fusionados en cada celda
+show_minimap = True    # Vista cenital en una esquina (tecla m; grafo de escena o display list, no modo inmediato)
+MINIMAP_FRACTION = 0.3  # Lado del minimapa respecto al alto de la ventana
+MINIMAP_RANGE = 80.0   # Media anchura (unidades de mundo) del área que cubre, centrada en el punto mirado
+MINIMAP_HEIGHT = 500.0  # Altura de la cámara cenital
+MINIMAP_REFRESH = 0.1  # Desplazamiento del punto mirado (fracción de MINIMAP_RANGE) a partir del cual se redibuja
+MINIMAP_LEVEL = len(LOD_FACTORS) - 1  # Nivel de detalle de los modelos en el minimapa
+MINIMAP_MIN_PIXELS = 1.0  # Radio (px del minimapa) bajo el cual un objeto no se dibuja
+MINIMAP_BUDGET_MS = 1.0  # Tiempo medio para redibujar el minimapa por periodo de frame (1 / TARGET_FPS)
+MINIMAP_BURST_MS = 16.0  # Crédito máximo que se acumula con la cámara quieta
+minimap_texture = 0    # Textura con la última imagen del minimapa
+minimap_center = None  # Punto (x, z) en el centro de esa imagen (None: hay que dibujarla)
+minimap_size = 0       # Lado en píxeles de esa imagen
+minimap_credit = 0.0   # ms disponibles para redibujar: crece MINIMAP_BUDGET_MS por periodo de frame
+minimap_credit_time = None  # Instante (time.perf_counter) en que se actualizó el crédito
+minimap_pending = False  # La imagen quedó vieja y espera crédito: pide un redibujado aunque la escena no cambie
+minimap_refreshes = 0  # Veces que se redibujó la imagen
+minimap_cache = {}     # Lotes del minimapa (sin instancing), como batch_cache
+viewport_height = 600
 
 # Funciones de inicialización
 
@@ -25,31 +193,186 @@ def init():
 
     # Configuración de la perspectiva
     glMatrixMode(GL_PROJECTION)
-    gluPerspective(60, 1.0, 0.1, 100.0)  # Campo de visión más amplio
+    gluPerspective(fov_y, aspect_ratio, z_near, z_far)  # Campo de visión más amplio
     glMatrixMode(GL_MODELVIEW)
 
-
+    if render_mode == "display_list":
+        compile_town()
+    elif render_mode == "scene_graph":
+        if use_background_build:
+            start_scene_build(scene_file)
+            deadline = time.perf_counter() + GROUND_WAIT
+            while scene_loading and not loading_ready.any() and time.perf_counter() < deadline:
+                receive_baked(wait=deadline - time.perf_counter())  # El primer frame ya muestra el suelo
+        elif scene_file:
+            open_scene(scene_file)
+        else:
+            build_scene_graph()
+
+# Caché de primitivas (esferas, cilindros y conos)
+
+def get_quadric():
+    """Devuelve la cuádrica compartida; se crea una sola vez"""
+    global shared_quadric
+    if shared_quadric is None:
+        shared_quadric = gluNewQuadric()
+    return shared_quadric
+
+def grid_indices(rows, cols):
+    """Índices de triángulos para una malla de (rows + 1) x (cols + 1) vértices"""
+    r, c = np.meshgrid(np.arange(rows), np.arange(cols), indexing="ij")
+    a = (r * (cols + 1) + c).ravel()
+    b = a + cols + 1
+    return np.stack([a, b, a + 1, a + 1, b, b + 1], axis=1).astype(np.uint32).ravel()
+
+def sphere_mesh(radius, slices, stacks):
+    """Malla de esfera con la misma orientación que gluSphere (polos sobre el eje z)"""
+    key = ("sphere", radius, slices, stacks)
+    mesh = mesh_cache.get(key)
+    if mesh is None:
+        theta = np.linspace(0.0, 2.0 * np.pi, slices + 1)
+        rho = np.linspace(0.0, np.pi, stacks + 1)
+        t, r = np.meshgrid(theta, rho)
+        normals = np.stack([np.sin(t) * np.sin(r), np.cos(t) * np.sin(r), np.cos(r)], axis=-1)
+        mesh = {
+            "vertices": (normals * radius).reshape(-1, 3).astype(np.float32),
+            "normals": normals.reshape(-1, 3).astype(np.float32),
+            "indices": grid_indices(stacks, slices),
+        }
+        mesh_cache[key] = mesh
+    return mesh
+
+def cylinder_mesh(base, top, height, slices, stacks):
+    """Malla de cilindro (o cono si top = 0) igual a gluCylinder: de z = 0 a z = height"""
+    key = ("cylinder", base, top, height, slices, stacks)
+    mesh = mesh_cache.get(key)
+    if mesh is None:
+        theta = np.linspace(0.0, 2.0 * np.pi, slices + 1)
+        z = np.linspace(0.0, height, stacks + 1)
+        t, zz = np.meshgrid(theta, z)
+        radius = base + (top - base) * zz / height
+        vertices = np.stack([radius * np.sin(t), radius * np.cos(t), zz], axis=-1)
+        normals = np.stack([np.sin(t), np.cos(t), np.full_like(t, (base - top) / height)], axis=-1)
+        normals /= np.linalg.norm(normals, axis=-1, keepdims=True)
+        mesh = {
+            "vertices": vertices.reshape(-1, 3).astype(np.float32),
+            "normals": normals.reshape(-1, 3).astype(np.float32),
+            "indices": grid_indices(stacks, slices),
+        }
+        mesh_cache[key] = mesh
+    return mesh
+
+def draw_mesh(mesh):
+    """Dibuja una malla del caché con vertex arrays"""
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glEnableClientState(GL_NORMAL_ARRAY)
+    glVertexPointer(3, GL_FLOAT, 0, mesh["vertices"])
+    glNormalPointer(GL_FLOAT, 0, mesh["normals"])
+    glDrawElements(GL_TRIANGLES, len(mesh["indices"]), GL_UNSIGNED_INT, mesh["indices"])
+    glDisableClientState(GL_NORMAL_ARRAY)
+    glDisableClientState(GL_VERTEX_ARRAY)
+
+def count_quadric_savings(divisions, lod_divisions):
+    """Suma al conteo del frame los triángulos que ahorra una cuádrica en modo inmediato (no al capturar ni grabar la lista)"""
+    global lod_triangles_saved
+    if forced_lod is None and getattr(capture_local, "state", None) is None:
+        lod_triangles_saved += 2 * (divisions - lod_divisions)
+
+def solid_sphere(radius, slices, stacks, level=0):
+    """Reemplazo de gluSphere(gluNewQuadric(), ...) con nivel de detalle"""
+    lod_slices, lod_stacks = lod_divisions(slices, level, 6), lod_divisions(stacks, level, 4)
+    count_quadric_savings(slices * stacks, lod_slices * lod_stacks)
+    if use_mesh_cache:
+        draw_mesh(sphere_mesh(radius, lod_slices, lod_stacks))
+    else:
+        gluSphere(get_quadric(), radius, lod_slices, lod_stacks)
+
+def solid_cylinder(base, top, height, slices, stacks, level=0):
+    """Reemplazo de gluCylinder(gluNewQuadric(), ...) con nivel de detalle"""
+    lod_slices, lod_stacks = lod_divisions(slices, level, 6), lod_divisions(stacks, level, 1)
+    count_quadric_savings(slices * stacks, lod_slices * lod_stacks)
+    if use_mesh_cache:
+        draw_mesh(cylinder_mesh(base, top, height, lod_slices, lod_stacks))
+    else:
+        gluCylinder(get_quadric(), base, top, height, lod_slices, lod_stacks)
+
+# Nivel de detalle (LOD): 0 es la teselación original, cada nivel reduce las divisiones
+
+def lod_divisions(divisions, level, minimum):
+    return max(minimum, int(round(divisions * LOD_FACTORS[level])))
+
+def lod_from_size(pixels, current):
+    """Nivel según el radio proyectado en píxeles, con histéresis para que no parpadee.
+
+    Sólo se baja de detalle si el objeto es pequeño incluso agrandándolo un
+    LOD_HYSTERESIS, y sólo se sube si es grande incluso achicándolo lo mismo.
+    """
+    pixels = np.asarray(pixels, dtype=float)[..., None]
+    finer = (pixels * (1 + LOD_HYSTERESIS) < LOD_PIXELS).sum(axis=-1)
+    coarser = (pixels * (1 - LOD_HYSTERESIS) < LOD_PIXELS).sum(axis=-1)
+    return np.clip(current, finer, coarser)
+
+def begin_lod_frame():
+    """Reinicia el conteo por frame de los objetos dibujados en modo inmediato"""
+    global lod_call, lod_triangles_saved, lod_pixel_scale
+    lod_call = 0
+    lod_triangles_saved = 0
+    projection = glGetFloatv(GL_PROJECTION_MATRIX)
+    lod_pixel_scale = projection[1][1] * glGetIntegerv(GL_VIEWPORT)[3] / 2
+
+def object_lod(radius):
+    """Nivel de detalle del objeto de radio dado que se va a dibujar con la matriz actual.
+
+    En modo inmediato el nivel anterior de cada objeto se guarda según el orden
+    de dibujo dentro del frame (ver begin_lod_frame).
+    """
+    global lod_call
+    if getattr(capture_local, "state", None) is not None:
+        return capture_local.level
+    if forced_lod is not None:
+        return forced_lod
+    if not use_lod:
+        return 0
+    modelview = np.array(glGetFloatv(GL_MODELVIEW_MATRIX))
+    distance = max(-modelview[3][2], z_near)
+    scale = np.linalg.norm(modelview[:3, :3], axis=1).max()
+    pixels = radius * scale / distance * lod_pixel_scale
+    if lod_call == len(immediate_lod_levels):
+        immediate_lod_levels.append(0)
+    level = int(lod_from_size(pixels, immediate_lod_levels[lod_call]))
+    immediate_lod_levels[lod_call] = level
+    lod_call += 1
+    return level
+
+def toroid_mesh(inner_radius, outer_radius, slices, stacks):
+    """Malla del toroide calculada de una vez con NumPy (anillo sobre el plano xy)"""
+    key = ("toroid", inner_radius, outer_radius, slices, stacks)
+    mesh = mesh_cache.get(key)
+    if mesh is None:
+        angle = np.linspace(0.0, 2.0 * np.pi, slices + 1)
+        next_angle = np.linspace(0.0, 2.0 * np.pi, stacks + 1)
+        u, v = np.meshgrid(angle, next_angle, indexing="ij")
+        normals = np.stack([np.cos(v) * np.cos(u), np.cos(v) * np.sin(u), np.sin(v)], axis=-1)
+        ring = np.stack([np.cos(u), np.sin(u), np.zeros_like(u)], axis=-1)
+        vertices = outer_radius * ring + inner_radius * normals
+        mesh = {
+            "vertices": vertices.reshape(-1, 3).astype(np.float32),
+            "normals": normals.reshape(-1, 3).astype(np.float32),
+            "indices": grid_indices(slices, stacks),
+        }
+        mesh_cache[key] = mesh
+    return mesh
 
 def draw_toroid(inner_radius, outer_radius, slices, stacks):
-    for i in range(slices):
-        glBegin(GL_QUAD_STRIP)
-        for j in range(stacks + 1):
-            for k in [i, i + 1]:
-                angle = 2.0 * math.pi * k / slices
-                next_angle = 2.0 * math.pi * j / stacks
-                x = (outer_radius + inner_radius * math.cos(next_angle)) * math.cos(angle)
-                y = (outer_radius + inner_radius * math.cos(next_angle)) * math.sin(angle)
-                z = inner_radius * math.sin(next_angle)
-                glVertex3f(x, y, z)
-        glEnd()
+    draw_mesh(toroid_mesh(inner_radius, outer_radius, slices, stacks))
 
 def draw_cylinder():
+    level = object_lod(3.0)
     glPushMatrix()
     glColor3f(0.6, 0.0, 0.0)  # Color marrón claro
     glTranslatef(0.0, -1.0, 0.0)  # Ajusta la posición
     glRotatef(-90, 1, 0, 0)  # Rota para orientar el cilindro verticalmente
-    quadric = gluNewQuadric()
-    gluCylinder(quadric, 0.2, 0.2, 5.0, 32, 32)  # Poste de la canasta más alto
+    solid_cylinder(0.2, 0.2, 5.0, 32, 32, level)  # Poste de la canasta más alto
     glPopMatrix()
 
 def draw_board():
@@ -75,22 +398,22 @@ def draw_hoop():
     glPopMatrix()
 
 def draw_light_pole():
+    level = object_lod(3.5)
     glPushMatrix()
     glColor3f(0.4, 0.4, 0.4)  # Gris para el poste
     glTranslatef(3.0, 0.0, 0.0)  # Posicionar el poste a un lado
     glRotatef(-90, 1, 0, 0)  # Rota para orientar el cilindro verticalmente
-    quadric = gluNewQuadric()
-    gluCylinder(quadric, 0.1, 0.1, 6.0, 32, 32) 
+    solid_cylinder(0.1, 0.1, 6.0, 32, 32, level) 
     glPopMatrix()
 
     glPushMatrix()
     glColor3f(1.0, 1.0, 0.0)  # Amarillo para la luz
     glTranslatef(3.0, 6.0, 0.0)  # Posicionar la esfera encima del poste
-    quadric = gluNewQuadric()
-    gluSphere(quadric, 0.3, 32, 32)  # Luz esférica
+    solid_sphere(0.3, 32, 32, level)  # Luz esférica
     glPopMatrix()
 
 def draw_cloud():
+    level = object_lod(2.0)
     glPushMatrix()
     positions = [
         (0.0, 3.5, 0.0),  
@@ -101,12 +424,11 @@ def draw_cloud():
     ]
     
     glColor3f(1.0, 1.0, 1.0)  # Color blanco para la nube
-    quadric = gluNewQuadric()
 
     for pos in positions:
         glPushMatrix()
         glTranslatef(*pos)
-        gluSphere(quadric, 1.0, 32, 32)  
+        solid_sphere(1.0, 32, 32, level)  
         glPopMatrix()
     
     glPopMatrix()
@@ -117,8 +439,7 @@ def draw_hollow_cylinder():
     glTranslatef(3.0, .5, 0.0)  
     glRotatef(90, 1, 0, 0)  # Rota para que esté vertical
 
-    quadric = gluNewQuadric()
-    gluCylinder(quadric, 0.15, 0.15, .5, 32, 32)  # Cilindro hueco
+    solid_cylinder(0.15, 0.15, .5, 32, 32)  # Cilindro hueco
     glPopMatrix()
 
 def draw_snowman():
@@ -130,46 +451,47 @@ def draw_snowman():
     glColor3f(1.0, 1.0, 1.0)  # Blanco para el muñeco de nieve
     
     # Esfera inferior
-    gluSphere(gluNewQuadric(), 1.5, 32, 32)  # Radio más grande
+    solid_sphere(1.5, 32, 32)  # Radio más grande
     glTranslatef(0.0, 2.0, 0.0)  
     
     # Esfera del medio
-    gluSphere(gluNewQuadric(), 1.2, 32, 32)
+    solid_sphere(1.2, 32, 32)
     glTranslatef(0.0, 1.5, 0.0)  
     
     # Cabeza
-    gluSphere(gluNewQuadric(), 1.0, 32, 32)
+    solid_sphere(1.0, 32, 32)
 
    
     glPushMatrix()
     glColor3f(0.0, 0.0, 0.0)  # Negro para los ojos
     glTranslatef(-0.4, 0.5, 0.8)  # Ojo izquierdo
-    gluSphere(gluNewQuadric(), 0.1, 16, 16)
+    solid_sphere(0.1, 16, 16)
     
     glTranslatef(0.8, 0.0, 0.0)  # Ojo derecho
-    gluSphere(gluNewQuadric(), 0.1, 16, 16)
+    solid_sphere(0.1, 16, 16)
     glPopMatrix()
 
     glPushMatrix()
     glColor3f(1.0, 0.5, 0.0)  # Naranja para la nariz
     glTranslatef(0.0, 0.5, 1.1)  # Posición de la nariz
-    gluSphere(gluNewQuadric(), 0.2, 16, 16)  # Nariz
+    solid_sphere(0.2, 16, 16)  # Nariz
     glPopMatrix()
     
     glPopMatrix()
     
 #Arboles
 def draw_trunk1():
+    level = object_lod(1.5)
     
     glPushMatrix()
     glColor3f(0.5, 0.25, 0.1)  
     glTranslatef(0.0, 0.0, 0.0)  
     glRotatef(-90, 1, 0, 0)  
-    quadric = gluNewQuadric()
-    gluCylinder(quadric, 0.5, 0.3, 3.0, 32, 32)  
+    solid_cylinder(0.5, 0.3, 3.0, 32, 32, level)  
     glPopMatrix()
 
 def draw_foliage1():
+    level = object_lod(2.0)
     
     positions = [
         (0.0, 3.5, 0.0),  
@@ -180,26 +502,26 @@ def draw_foliage1():
     ]
     
     glColor3f(0.2, 0.9, 0.2)  
-    quadric = gluNewQuadric()
 
     for pos in positions:
         glPushMatrix()
         glTranslatef(*pos)
-        gluSphere(quadric, 1.0, 32, 32)  
+        solid_sphere(1.0, 32, 32, level)  
         glPopMatrix()
 
 
 def draw_trunk2():
+    level = object_lod(1.5)
     
     glPushMatrix()
     glColor3f(0.5, 0.25, 0.1) 
     glTranslatef(0.0, 0.0, 0.0)  
     glRotatef(-90, 1, 0, 0)  
-    quadric = gluNewQuadric()
-    gluCylinder(quadric, 0.2, 0.2, 3.0, 32, 32)  
+    solid_cylinder(0.2, 0.2, 3.0, 32, 32, level)  
     glPopMatrix()
 
 def draw_foliage2():
+    level = object_lod(2.5)
     
     positions = [
         (0.0, 2.5, 0.0, 2.0), 
@@ -208,26 +530,26 @@ def draw_foliage2():
     ]
 
     glColor3f(0.1, 0.5, 0.1) 
-    quadric = gluNewQuadric()
 
     for x, y, z, radius in positions:
         glPushMatrix()
         glTranslatef(x, y, z)
         glRotatef(-90, 1, 0, 0)  
-        gluCylinder(quadric, radius, 0.0, 1.5, 32, 32)  
+        solid_cylinder(radius, 0.0, 1.5, 32, 32, level)  
         glPopMatrix()
 
 def draw_trunk3():
+    level = object_lod(2.0)
     
     glPushMatrix()
     glColor3f(0.9, 0.9, 0.8)  
     glTranslatef(0.0, 0.0, 0.0)  
     glRotatef(-90, 1, 0, 0)  
-    quadric = gluNewQuadric()
-    gluCylinder(quadric, 0.25, 0.2, 4.0, 32, 32)  
+    solid_cylinder(0.25, 0.2, 4.0, 32, 32, level)  
     glPopMatrix()
 
 def draw_foliage3():
+    level = object_lod(1.0)
     
     positions = [
         (0.0, 4.0, 0.0),  
@@ -238,45 +560,45 @@ def draw_foliage3():
     ]
 
     glColor3f(0.5, 0.8, 0.4)  
-    quadric = gluNewQuadric()
 
     for pos in positions:
         glPushMatrix()
         glTranslatef(*pos)
-        gluSphere(quadric, 0.5, 32, 32)  
+        solid_sphere(0.5, 32, 32, level)  
         glPopMatrix()
 
 def draw_trunk4():
+    level = object_lod(1.0)
     
     glPushMatrix()
     glColor3f(0.6, 0.3, 0.1)  
     glTranslatef(0.0, 0.0, 0.0) 
     glRotatef(-90, 1, 0, 0)  
-    quadric = gluNewQuadric()
-    gluCylinder(quadric, 0.3, 0.3, 2.0, 32, 32)  
+    solid_cylinder(0.3, 0.3, 2.0, 32, 32, level)  
     glPopMatrix()
 
 def draw_foliage4():
+    level = object_lod(1.0)
     
     glPushMatrix()
     glColor3f(0.1, 0.8, 0.1)  
     glTranslatef(0.0, 2.0, 0.0)  
-    quadric = gluNewQuadric()
-    gluSphere(quadric, 1.0, 32, 32)  
+    solid_sphere(1.0, 32, 32, level)  
     glPopMatrix()
 
 
 def draw_trunk5():
+    level = object_lod(1.5)
     
     glPushMatrix()
     glColor3f(0.5, 0.3, 0.1) 
     glTranslatef(0.0, 0.0, 0.0) 
     glRotatef(-90, 1, 0, 0)  
-    quadric = gluNewQuadric()
-    gluCylinder(quadric, 0.3, 0.3, 3.0, 32, 32)  
+    solid_cylinder(0.3, 0.3, 3.0, 32, 32, level)  
     glPopMatrix()
 
 def draw_foliage5():
+    level = object_lod(1.5)
     
     glPushMatrix()
     glColor3f(0.1, 0.6, 0.1)  
@@ -286,7 +608,7 @@ def draw_foliage5():
         glPushMatrix()
         glTranslatef(0.0, 2.5 + i * 0.6, 0.0)  
         glRotatef(90, 1, 0, 0)  
-        gluSphere(gluNewQuadric(), 1.0 - i * 0.2, 16, 16)  
+        solid_sphere(1.0 - i * 0.2, 16, 16, level)  
         glPopMatrix()
 
     glPopMatrix()
@@ -665,1098 +987,3028 @@ def draw_ground():
     glVertex3f(-20, 0, -20)
     glEnd()
 
-# Función principal de la escena
-def draw_scene():
-    global rotation_angle, translation_x, translation_y, scale_factor
-    glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-    glLoadIdentity()
-    gluLookAt(50, 25, 50, 0, 5, 0, 0, 1, 0)
-    
-    glTranslatef(translation_x, translation_y, 0)
-    glScalef(scale_factor, scale_factor, scale_factor)
-    glRotatef(rotation_angle, 0, 1, 0)
-
-    draw_ground()  # Dibuja el suelo
-    
-    glTranslatef(0,2,0)
-    
-    draw_foliage1()
-    draw_trunk1()
-    
-    glTranslatef(5,0,0)
-    draw_foliage1()
-    draw_trunk1()
-
-    
-    glTranslatef(-3,0,3.5)
-    draw_base()          # Dibuja la base
-    draw_large_windows() # Dibuja las ventanas grandes
-    draw_second_floor()  # Dibuja el segundo piso
-    draw_terrace()       # Dibuja la terraza
-    draw_railings()      # Dibuja las barandas
-
-    
-    glTranslatef(-3.5,0,-3)
-    draw_hollow_cylinder()  # Dibuja bote de basura
-    
-    glTranslatef(-1,0,5)
-    glScaled(.4,.5,.5)
-    draw_cylinder()    # Dibuja el poste
-    draw_board()       # Dibuja el tablero
-    draw_hoop()        # Dibuja el aro
-    
-    glTranslatef(-1,0,-9)
-    glRotated(180,0,1,0)
-    draw_cylinder()    # Dibuja el poste
-    draw_board()       # Dibuja el tablero
-    draw_hoop()        # Dibuja el aro
-    
-    glTranslatef(-10,0,20)
-    glScaled(2.5,2.5,2.5)
-    glRotated(180,0,1,0)
-    draw_ground()          # Dibuja el suelo
-    draw_rectangular_base()  # Dibuja la base de la casa
-    draw_door()            # Dibuja la puerta
-    draw_windows()         # Dibuja las ventanas
-    draw_prism_roof()      # Dibuja el techo
-    
-    glTranslatef(3,0,2)
-    glScaled(.5,.5,.5)
-    draw_foliage2()
-    draw_trunk2()
-    
-    glTranslatef(-12,0,0)
-    draw_foliage2()
-    draw_trunk2()
-    
-    glTranslatef(5,.5,-1)
-    glScaled(.4,.4,.4)
-    glRotated(180,0,1,0)
-    draw_snowman()
-    
-    glTranslatef(-17,-1,7)
-    draw_cube(0, 0, 0, 5, 3, 5, (0.8, 0.5, 0.2))  # Casa principal
-    draw_roof(0, 3, 0, 5)  # Techo
-    draw_cube(-5, 0, 0, 3, 2, 5, (0.7, 0.7, 0.7))  # Garaje
-    draw_cube(1.5, 5, 0, 0.5, 1.5, 0.5, (0.6, 0.6, 0.6))  # Chimenea
-    
-    glTranslatef(-15,0,-47)
-    glScaled(2.5,2.5,2.5)
-    draw_cube(0, 0, 0, 3, 2, 3, (0.8, 0.5, 0.2))  # Cubo base principal
-    draw_cube(4, 0, 0, 1, 2, 1, (0.7, 0.5, 0.3))  # Cubo adicional a la derecha
-    draw_cube(-4, 0, 0, 1, 2, 1, (0.7, 0.5, 0.3)) # Cubo adicional a la izquierda
-    draw_roof(0, 2, 0, 3)  # Techo más grande
-    
-    glTranslatef(2,0,17)
-    draw_foliage3()
-    draw_trunk3()
-    
-    glTranslatef(0,0,5)
-    draw_foliage4()
-    draw_trunk4()
-    
-    glTranslatef(-3,0,-7)
-    draw_light_pole()  # Dibuja el poste de luz
-    
-    glScaled(3,3,3)
-    glTranslatef(-3,0,-5)
-    draw_ground()  # Dibuja el suelo
-    draw_cube1()    # Dibuja la base de la casa
-    draw_roof1()    # Dibuja el techo
-    
-    glTranslatef(-2,0,2)
-    glScaled(.5,.5,.5)
-    draw_base()          # Dibuja la base
-    draw_large_windows() # Dibuja las ventanas grandes
-    draw_second_floor()  # Dibuja el segundo piso
-    draw_terrace()       # Dibuja la terraza
-    draw_railings()      # Dibuja las barandas
-    
-    glTranslatef(2.5,0,-1)
-    glScaled(.6,.6,.6)
-    draw_light_pole()  # Dibuja el poste de luz
-    
-    glTranslatef(7,0,0)
-    glScaled(1.5,1.5,1.5)
-    draw_foliage5()
-    draw_trunk5()
-    
-    glTranslatef(-7,0,5.25)
-    glScaled(1.75,1.75,1.75)
-    draw_ground()  # Dibuja el suelo
-    draw_cube1()    # Dibuja la base de la casa
-    draw_roof1()    # Dibuja el techo
-    
-    glScaled(.75,.75,.75)
-    glTranslatef(3,0,-2)
-    draw_foliage4()
-    draw_trunk4()
-    
-    glTranslatef(-3,0,5.25)
-    glRotated(90,0,1,0)
-    draw_ground()          # Dibuja el suelo
-    draw_rectangular_base()  # Dibuja la base de la casa
-    draw_door()            # Dibuja la puerta
-    draw_windows()         # Dibuja las ventanas
-    draw_prism_roof()      # Dibuja el techo
-    
-    glTranslatef(2.5,0,3)
-    glScaled(.5,.5,.5)
-    draw_foliage3()
-    draw_trunk3()
-    
-    glTranslatef(-5,0,0)
-    draw_light_pole() 
-    
-    glTranslatef(-3,0,0)
-    draw_foliage2()
-    draw_trunk2()
-    
-    glTranslatef(-3.55,0,-6)
-    glScaled(.5,.5,.5)
-    draw_cube(0, 0, 0, 5, 3, 5, (0.8, 0.5, 0.2))  # Casa principal
-    draw_roof(0, 3, 0, 5)  # Techo
-    draw_cube(-5, 0, 0, 3, 2, 5, (0.7, 0.7, 0.7))  # Garaje
-    draw_cube(1.5, 5, 0, 0.5, 1.5, 0.5, (0.6, 0.6, 0.6))  # Chimenea
-    
-    glTranslatef(2,0,-29)
-    glScaled(3.5,3.5,3.5)
-    draw_foliage1()
-    draw_trunk1()
-    
-    glTranslatef(5,0,0)
-    draw_foliage1()
-    draw_trunk1()
-
-    
-    glTranslatef(-3,0,3.5)
-    draw_base()          # Dibuja la base
-    draw_large_windows() # Dibuja las ventanas grandes
-    draw_second_floor()  # Dibuja el segundo piso
-    draw_terrace()       # Dibuja la terraza
-    draw_railings()      # Dibuja las barandas
-
-    
-    glTranslatef(-3.5,0,-3)
-    draw_hollow_cylinder()  # Dibuja bote de basura
-    
-    glTranslatef(-1,0,5)
-    glScaled(.4,.5,.5)
-    draw_cylinder()    # Dibuja el poste
-    draw_board()       # Dibuja el tablero
-    draw_hoop()        # Dibuja el aro
-    
-    glTranslatef(-1,0,-9)
-    glRotated(180,0,1,0)
-    draw_cylinder()    # Dibuja el poste
-    draw_board()       # Dibuja el tablero
-    draw_hoop()        # Dibuja el aro
-    
-    glTranslatef(-10,0,20)
-    glScaled(2.5,2.5,2.5)
-    glRotated(180,0,1,0)
-    draw_ground()          # Dibuja el suelo
-    draw_rectangular_base()  # Dibuja la base de la casa
-    draw_door()            # Dibuja la puerta
-    draw_windows()         # Dibuja las ventanas
-    draw_prism_roof()      # Dibuja el techo
-    
-    glTranslatef(3,0,2)
-    glScaled(.5,.5,.5)
-    draw_foliage2()
-    draw_trunk2()
-    
-    glTranslatef(-12,0,0)
-    draw_foliage2()
-    draw_trunk2()
-    
-    glTranslatef(5,.5,-1)
-    glScaled(.4,.4,.4)
-    glRotated(180,0,1,0)
-    draw_snowman()
-    
-    glTranslatef(-17,-1,7)
-    draw_cube(0, 0, 0, 5, 3, 5, (0.8, 0.5, 0.2))  # Casa principal
-    draw_roof(0, 3, 0, 5)  # Techo
-    draw_cube(-5, 0, 0, 3, 2, 5, (0.7, 0.7, 0.7))  # Garaje
-    draw_cube(1.5, 5, 0, 0.5, 1.5, 0.5, (0.6, 0.6, 0.6))  # Chimenea
-    
-    glTranslatef(-15,0,-47)
-    glScaled(2.5,2.5,2.5)
-    draw_cube(0, 0, 0, 3, 2, 3, (0.8, 0.5, 0.2))  # Cubo base principal
-    draw_cube(4, 0, 0, 1, 2, 1, (0.7, 0.5, 0.3))  # Cubo adicional a la derecha
-    draw_cube(-4, 0, 0, 1, 2, 1, (0.7, 0.5, 0.3)) # Cubo adicional a la izquierda
-    draw_roof(0, 2, 0, 3)  # Techo más grande
-    
-    glTranslatef(2,0,17)
-    draw_foliage3()
-    draw_trunk3()
-    
-    glTranslatef(0,0,5)
-    draw_foliage4()
-    draw_trunk4()
-    
-    glTranslatef(-3,0,-7)
-    draw_light_pole()  # Dibuja el poste de luz
-    
-    glScaled(3,3,3)
-    glTranslatef(-3,0,-5)
-    draw_ground()  # Dibuja el suelo
-    draw_cube1()    # Dibuja la base de la casa
-    draw_roof1()    # Dibuja el techo
-    
-    glTranslatef(-2,0,2)
-    glScaled(.5,.5,.5)
-    draw_base()          # Dibuja la base
-    draw_large_windows() # Dibuja las ventanas grandes
-    draw_second_floor()  # Dibuja el segundo piso
-    draw_terrace()       # Dibuja la terraza
-    draw_railings()      # Dibuja las barandas
-    
-    glTranslatef(2.5,0,-1)
-    glScaled(.6,.6,.6)
-    draw_light_pole()  # Dibuja el poste de luz
-    
-    glTranslatef(7,0,0)
-    glScaled(1.5,1.5,1.5)
-    draw_foliage5()
-    draw_trunk5()
-    
-    glTranslatef(-7,0,5.25)
-    glScaled(1.75,1.75,1.75)
-    draw_ground()  # Dibuja el suelo
-    draw_cube1()    # Dibuja la base de la casa
-    draw_roof1()    # Dibuja el techo
-    
-    glScaled(.75,.75,.75)
-    glTranslatef(3,0,-2)
-    draw_foliage4()
-    draw_trunk4()
-    
-    glTranslatef(-3,0,5.25)
-    glRotated(90,0,1,0)
-    draw_ground()          # Dibuja el suelo
-    draw_rectangular_base()  # Dibuja la base de la casa
-    draw_door()            # Dibuja la puerta
-    draw_windows()         # Dibuja las ventanas
-    draw_prism_roof()      # Dibuja el techo
-    
-    glTranslatef(2.5,0,3)
-    glScaled(.5,.5,.5)
-    draw_foliage3()
-    draw_trunk3()
-    
-    glTranslatef(-5,0,0)
-    draw_light_pole() 
-    
-    glTranslatef(-3,0,0)
-    draw_foliage2()
-    draw_trunk2()
-    
-    glTranslatef(-3.55,0,-6)
-    glScaled(.5,.5,.5)
-    draw_cube(0, 0, 0, 5, 3, 5, (0.8, 0.5, 0.2))  # Casa principal
-    draw_roof(0, 3, 0, 5)  # Techo
-    draw_cube(-5, 0, 0, 3, 2, 5, (0.7, 0.7, 0.7))  # Garaje
-    draw_cube(1.5, 5, 0, 0.5, 1.5, 0.5, (0.6, 0.6, 0.6))  # Chimenea
-    
-    #P3
-    glTranslatef(2,0,-29)
-    glScaled(3.5,3.5,3.5)
-    draw_foliage1()
-    draw_trunk1()
-    
-    glTranslatef(5,0,0)
-    draw_foliage1()
-    draw_trunk1()
-
-    
-    glTranslatef(-3,0,3.5)
-    draw_base()          # Dibuja la base
-    draw_large_windows() # Dibuja las ventanas grandes
-    draw_second_floor()  # Dibuja el segundo piso
-    draw_terrace()       # Dibuja la terraza
-    draw_railings()      # Dibuja las barandas
-
-    
-    glTranslatef(-3.5,0,-3)
-    draw_hollow_cylinder()  # Dibuja bote de basura
-    
-    glTranslatef(-1,0,5)
-    glScaled(.4,.5,.5)
-    draw_cylinder()    # Dibuja el poste
-    draw_board()       # Dibuja el tablero
-    draw_hoop()        # Dibuja el aro
-    
-    glTranslatef(-1,0,-9)
-    glRotated(180,0,1,0)
-    draw_cylinder()    # Dibuja el poste
-    draw_board()       # Dibuja el tablero
-    draw_hoop()        # Dibuja el aro
-    
-    glTranslatef(-10,0,20)
-    glScaled(2.5,2.5,2.5)
-    glRotated(180,0,1,0)
-    draw_ground()          # Dibuja el suelo
-    draw_rectangular_base()  # Dibuja la base de la casa
-    draw_door()            # Dibuja la puerta
-    draw_windows()         # Dibuja las ventanas
-    draw_prism_roof()      # Dibuja el techo
-    
-    glTranslatef(3,0,2)
-    glScaled(.5,.5,.5)
-    draw_foliage2()
-    draw_trunk2()
-    
-    glTranslatef(-12,0,0)
-    draw_foliage2()
-    draw_trunk2()
-    
-    glTranslatef(5,.5,-1)
-    glScaled(.4,.4,.4)
-    glRotated(180,0,1,0)
-    draw_snowman()
-    
-    glTranslatef(-17,-1,7)
-    draw_cube(0, 0, 0, 5, 3, 5, (0.8, 0.5, 0.2))  # Casa principal
-    draw_roof(0, 3, 0, 5)  # Techo
-    draw_cube(-5, 0, 0, 3, 2, 5, (0.7, 0.7, 0.7))  # Garaje
-    draw_cube(1.5, 5, 0, 0.5, 1.5, 0.5, (0.6, 0.6, 0.6))  # Chimenea
-    
-    glTranslatef(-15,0,-47)
-    glScaled(2.5,2.5,2.5)
-    draw_cube(0, 0, 0, 3, 2, 3, (0.8, 0.5, 0.2))  # Cubo base principal
-    draw_cube(4, 0, 0, 1, 2, 1, (0.7, 0.5, 0.3))  # Cubo adicional a la derecha
-    draw_cube(-4, 0, 0, 1, 2, 1, (0.7, 0.5, 0.3)) # Cubo adicional a la izquierda
-    draw_roof(0, 2, 0, 3)  # Techo más grande
-    
-    glTranslatef(2,0,17)
-    draw_foliage3()
-    draw_trunk3()
-    
-    glTranslatef(0,0,5)
-    draw_foliage4()
-    draw_trunk4()
-    
-    glTranslatef(-3,0,-7)
-    draw_light_pole()  # Dibuja el poste de luz
-    
-    glScaled(3,3,3)
-    glTranslatef(-3,0,-5)
-    draw_ground()  # Dibuja el suelo
-    draw_cube1()    # Dibuja la base de la casa
-    draw_roof1()    # Dibuja el techo
-    
-    glTranslatef(-2,0,2)
-    glScaled(.5,.5,.5)
-    draw_base()          # Dibuja la base
-    draw_large_windows() # Dibuja las ventanas grandes
-    draw_second_floor()  # Dibuja el segundo piso
-    draw_terrace()       # Dibuja la terraza
-    draw_railings()      # Dibuja las barandas
-    
-    glTranslatef(2.5,0,-1)
-    glScaled(.6,.6,.6)
-    draw_light_pole()  # Dibuja el poste de luz
-    
-    glTranslatef(7,0,0)
-    glScaled(1.5,1.5,1.5)
-    draw_foliage5()
-    draw_trunk5()
-    
-    glTranslatef(-7,0,5.25)
-    glScaled(1.75,1.75,1.75)
-    draw_ground()  # Dibuja el suelo
-    draw_cube1()    # Dibuja la base de la casa
-    draw_roof1()    # Dibuja el techo
-    
-    glScaled(.75,.75,.75)
-    glTranslatef(3,0,-2)
-    draw_foliage4()
-    draw_trunk4()
-    
-    glTranslatef(-3,0,5.25)
-    glRotated(90,0,1,0)
-    draw_ground()          # Dibuja el suelo
-    draw_rectangular_base()  # Dibuja la base de la casa
-    draw_door()            # Dibuja la puerta
-    draw_windows()         # Dibuja las ventanas
-    draw_prism_roof()      # Dibuja el techo
-    
-    glTranslatef(2.5,0,3)
-    glScaled(.5,.5,.5)
-    draw_foliage3()
-    draw_trunk3()
-    
-    glTranslatef(-5,0,0)
-    draw_light_pole() 
-    
-    glTranslatef(-3,0,0)
-    draw_foliage2()
-    draw_trunk2()
-    
-    glTranslatef(-3.55,0,-6)
-    glScaled(.5,.5,.5)
-    draw_cube(0, 0, 0, 5, 3, 5, (0.8, 0.5, 0.2))  # Casa principal
-    draw_roof(0, 3, 0, 5)  # Techo
-    draw_cube(-5, 0, 0, 3, 2, 5, (0.7, 0.7, 0.7))  # Garaje
-    draw_cube(1.5, 5, 0, 0.5, 1.5, 0.5, (0.6, 0.6, 0.6))  # Chimenea
-    
-    #P4
-    glTranslatef(2,0,-29)
-    glScaled(3.5,3.5,3.5)
-    draw_foliage1()
-    draw_trunk1()
-    
-    glTranslatef(5,0,0)
-    draw_foliage1()
-    draw_trunk1()
-
-    
-    glTranslatef(-3,0,3.5)
-    draw_base()          # Dibuja la base
-    draw_large_windows() # Dibuja las ventanas grandes
-    draw_second_floor()  # Dibuja el segundo piso
-    draw_terrace()       # Dibuja la terraza
-    draw_railings()      # Dibuja las barandas
-
-    
-    glTranslatef(-3.5,0,-3)
-    draw_hollow_cylinder()  # Dibuja bote de basura
-    
-    glTranslatef(-1,0,5)
-    glScaled(.4,.5,.5)
-    draw_cylinder()    # Dibuja el poste
-    draw_board()       # Dibuja el tablero
-    draw_hoop()        # Dibuja el aro
-    
-    glTranslatef(-1,0,-9)
-    glRotated(180,0,1,0)
-    draw_cylinder()    # Dibuja el poste
-    draw_board()       # Dibuja el tablero
-    draw_hoop()        # Dibuja el aro
-    
-    glTranslatef(-10,0,20)
-    glScaled(2.5,2.5,2.5)
-    glRotated(180,0,1,0)
-    draw_ground()          # Dibuja el suelo
-    draw_rectangular_base()  # Dibuja la base de la casa
-    draw_door()            # Dibuja la puerta
-    draw_windows()         # Dibuja las ventanas
-    draw_prism_roof()      # Dibuja el techo
-    
-    glTranslatef(3,0,2)
-    glScaled(.5,.5,.5)
-    draw_foliage2()
-    draw_trunk2()
-    
-    glTranslatef(-12,0,0)
-    draw_foliage2()
-    draw_trunk2()
-    
-    glTranslatef(5,.5,-1)
-    glScaled(.4,.4,.4)
-    glRotated(180,0,1,0)
-    draw_snowman()
-    
-    glTranslatef(-17,-1,7)
-    draw_cube(0, 0, 0, 5, 3, 5, (0.8, 0.5, 0.2))  # Casa principal
-    draw_roof(0, 3, 0, 5)  # Techo
-    draw_cube(-5, 0, 0, 3, 2, 5, (0.7, 0.7, 0.7))  # Garaje
-    draw_cube(1.5, 5, 0, 0.5, 1.5, 0.5, (0.6, 0.6, 0.6))  # Chimenea
-    
-    glTranslatef(-15,0,-47)
-    glScaled(2.5,2.5,2.5)
-    draw_cube(0, 0, 0, 3, 2, 3, (0.8, 0.5, 0.2))  # Cubo base principal
-    draw_cube(4, 0, 0, 1, 2, 1, (0.7, 0.5, 0.3))  # Cubo adicional a la derecha
-    draw_cube(-4, 0, 0, 1, 2, 1, (0.7, 0.5, 0.3)) # Cubo adicional a la izquierda
-    draw_roof(0, 2, 0, 3)  # Techo más grande
-    
-    glTranslatef(2,0,17)
-    draw_foliage3()
-    draw_trunk3()
-    
-    glTranslatef(0,0,5)
-    draw_foliage4()
-    draw_trunk4()
-    
-    glTranslatef(-3,0,-7)
-    draw_light_pole()  # Dibuja el poste de luz
-    
-    glScaled(3,3,3)
-    glTranslatef(-3,0,-5)
-    draw_ground()  # Dibuja el suelo
-    draw_cube1()    # Dibuja la base de la casa
-    draw_roof1()    # Dibuja el techo
-    
-    glTranslatef(-2,0,2)
-    glScaled(.5,.5,.5)
-    draw_base()          # Dibuja la base
-    draw_large_windows() # Dibuja las ventanas grandes
-    draw_second_floor()  # Dibuja el segundo piso
-    draw_terrace()       # Dibuja la terraza
-    draw_railings()      # Dibuja las barandas
-    
-    glTranslatef(2.5,0,-1)
-    glScaled(.6,.6,.6)
-    draw_light_pole()  # Dibuja el poste de luz
-    
-    glTranslatef(7,0,0)
-    glScaled(1.5,1.5,1.5)
-    draw_foliage5()
-    draw_trunk5()
-    
-    glTranslatef(-7,0,5.25)
-    glScaled(1.75,1.75,1.75)
-    draw_ground()  # Dibuja el suelo
-    draw_cube1()    # Dibuja la base de la casa
-    draw_roof1()    # Dibuja el techo
-    
-    glScaled(.75,.75,.75)
-    glTranslatef(3,0,-2)
-    draw_foliage4()
-    draw_trunk4()
-    
-    glTranslatef(-3,0,5.25)
-    glRotated(90,0,1,0)
-    draw_ground()          # Dibuja el suelo
-    draw_rectangular_base()  # Dibuja la base de la casa
-    draw_door()            # Dibuja la puerta
-    draw_windows()         # Dibuja las ventanas
-    draw_prism_roof()      # Dibuja el techo
-    
-    glTranslatef(2.5,0,3)
-    glScaled(.5,.5,.5)
-    draw_foliage3()
-    draw_trunk3()
-    
-    glTranslatef(-5,0,0)
-    draw_light_pole() 
-    
-    glTranslatef(-3,0,0)
-    draw_foliage2()
-    draw_trunk2()
-    
-    glTranslatef(-3.55,0,-6)
-    glScaled(.5,.5,.5)
-    draw_cube(0, 0, 0, 5, 3, 5, (0.8, 0.5, 0.2))  # Casa principal
-    draw_roof(0, 3, 0, 5)  # Techo
-    draw_cube(-5, 0, 0, 3, 2, 5, (0.7, 0.7, 0.7))  # Garaje
-    draw_cube(1.5, 5, 0, 0.5, 1.5, 0.5, (0.6, 0.6, 0.6))  # Chimenea
-    
-    #p5
-    glTranslatef(120,0,110)
-    glScaled(4.5,4.5,4.5)
-    draw_foliage1()
-    draw_trunk1()
-    
-    glTranslatef(5,0,0)
-    draw_foliage1()
-    draw_trunk1()
+# Pueblo estático (todo lo que no depende de las transformaciones globales).
+# Cada paso es una transformación acumulada ("push"/"pop" guardan y recuperan la
+# matriz) o un modelo dibujado con la matriz actual.
+TOWN = [
+    ("model", "draw_ground"),  # Dibuja el suelo
+
+    ("translate", 0, 2, 0),
+
+    ("model", "draw_foliage1"),
+    ("model", "draw_trunk1"),
+
+    ("translate", 5, 0, 0),
+    ("model", "draw_foliage1"),
+    ("model", "draw_trunk1"),
+
+    ("translate", -3, 0, 3.5),
+    ("model", "draw_base"),  # Dibuja la base
+    ("model", "draw_large_windows"),  # Dibuja las ventanas grandes
+    ("model", "draw_second_floor"),  # Dibuja el segundo piso
+    ("model", "draw_terrace"),  # Dibuja la terraza
+    ("model", "draw_railings"),  # Dibuja las barandas
+
+    ("translate", -3.5, 0, -3),
+    ("model", "draw_hollow_cylinder"),  # Dibuja bote de basura
+
+    ("translate", -1, 0, 5),
+    ("scale", .4, .5, .5),
+    ("model", "draw_cylinder"),  # Dibuja el poste
+    ("model", "draw_board"),  # Dibuja el tablero
+    ("model", "draw_hoop"),  # Dibuja el aro
+
+    ("translate", -1, 0, -9),
+    ("rotate", 180, 0, 1, 0),
+    ("model", "draw_cylinder"),  # Dibuja el poste
+    ("model", "draw_board"),  # Dibuja el tablero
+    ("model", "draw_hoop"),  # Dibuja el aro
+
+    ("translate", -10, 0, 20),
+    ("scale", 2.5, 2.5, 2.5),
+    ("rotate", 180, 0, 1, 0),
+    ("model", "draw_ground"),  # Dibuja el suelo
+    ("model", "draw_rectangular_base"),  # Dibuja la base de la casa
+    ("model", "draw_door"),  # Dibuja la puerta
+    ("model", "draw_windows"),  # Dibuja las ventanas
+    ("model", "draw_prism_roof"),  # Dibuja el techo
+
+    ("translate", 3, 0, 2),
+    ("scale", .5, .5, .5),
+    ("model", "draw_foliage2"),
+    ("model", "draw_trunk2"),
+
+    ("translate", -12, 0, 0),
+    ("model", "draw_foliage2"),
+    ("model", "draw_trunk2"),
+
+    ("translate", 5, .5, -1),
+    ("scale", .4, .4, .4),
+    ("rotate", 180, 0, 1, 0),
+    ("model", "draw_snowman"),
+
+    ("translate", -17, -1, 7),
+    ("model", "draw_cube", 0, 0, 0, 5, 3, 5, (0.8, 0.5, 0.2)),  # Casa principal
+    ("model", "draw_roof", 0, 3, 0, 5),  # Techo
+    ("model", "draw_cube", -5, 0, 0, 3, 2, 5, (0.7, 0.7, 0.7)),  # Garaje
+    ("model", "draw_cube", 1.5, 5, 0, 0.5, 1.5, 0.5, (0.6, 0.6, 0.6)),  # Chimenea
+
+    ("translate", -15, 0, -47),
+    ("scale", 2.5, 2.5, 2.5),
+    ("model", "draw_cube", 0, 0, 0, 3, 2, 3, (0.8, 0.5, 0.2)),  # Cubo base principal
+    ("model", "draw_cube", 4, 0, 0, 1, 2, 1, (0.7, 0.5, 0.3)),  # Cubo adicional a la derecha
+    ("model", "draw_cube", -4, 0, 0, 1, 2, 1, (0.7, 0.5, 0.3)),  # Cubo adicional a la izquierda
+    ("model", "draw_roof", 0, 2, 0, 3),  # Techo más grande
+
+    ("translate", 2, 0, 17),
+    ("model", "draw_foliage3"),
+    ("model", "draw_trunk3"),
+
+    ("translate", 0, 0, 5),
+    ("model", "draw_foliage4"),
+    ("model", "draw_trunk4"),
+
+    ("translate", -3, 0, -7),
+    ("model", "draw_light_pole"),  # Dibuja el poste de luz
+
+    ("scale", 3, 3, 3),
+    ("translate", -3, 0, -5),
+    ("model", "draw_ground"),  # Dibuja el suelo
+    ("model", "draw_cube1"),  # Dibuja la base de la casa
+    ("model", "draw_roof1"),  # Dibuja el techo
+
+    ("translate", -2, 0, 2),
+    ("scale", .5, .5, .5),
+    ("model", "draw_base"),  # Dibuja la base
+    ("model", "draw_large_windows"),  # Dibuja las ventanas grandes
+    ("model", "draw_second_floor"),  # Dibuja el segundo piso
+    ("model", "draw_terrace"),  # Dibuja la terraza
+    ("model", "draw_railings"),  # Dibuja las barandas
+
+    ("translate", 2.5, 0, -1),
+    ("scale", .6, .6, .6),
+    ("model", "draw_light_pole"),  # Dibuja el poste de luz
+
+    ("translate", 7, 0, 0),
+    ("scale", 1.5, 1.5, 1.5),
+    ("model", "draw_foliage5"),
+    ("model", "draw_trunk5"),
+
+    ("translate", -7, 0, 5.25),
+    ("scale", 1.75, 1.75, 1.75),
+    ("model", "draw_ground"),  # Dibuja el suelo
+    ("model", "draw_cube1"),  # Dibuja la base de la casa
+    ("model", "draw_roof1"),  # Dibuja el techo
+
+    ("scale", .75, .75, .75),
+    ("translate", 3, 0, -2),
+    ("model", "draw_foliage4"),
+    ("model", "draw_trunk4"),
+
+    ("translate", -3, 0, 5.25),
+    ("rotate", 90, 0, 1, 0),
+    ("model", "draw_ground"),  # Dibuja el suelo
+    ("model", "draw_rectangular_base"),  # Dibuja la base de la casa
+    ("model", "draw_door"),  # Dibuja la puerta
+    ("model", "draw_windows"),  # Dibuja las ventanas
+    ("model", "draw_prism_roof"),  # Dibuja el techo
+
+    ("translate", 2.5, 0, 3),
+    ("scale", .5, .5, .5),
+    ("model", "draw_foliage3"),
+    ("model", "draw_trunk3"),
+
+    ("translate", -5, 0, 0),
+    ("model", "draw_light_pole"),
+
+    ("translate", -3, 0, 0),
+    ("model", "draw_foliage2"),
+    ("model", "draw_trunk2"),
+
+    ("translate", -3.55, 0, -6),
+    ("scale", .5, .5, .5),
+    ("model", "draw_cube", 0, 0, 0, 5, 3, 5, (0.8, 0.5, 0.2)),  # Casa principal
+    ("model", "draw_roof", 0, 3, 0, 5),  # Techo
+    ("model", "draw_cube", -5, 0, 0, 3, 2, 5, (0.7, 0.7, 0.7)),  # Garaje
+    ("model", "draw_cube", 1.5, 5, 0, 0.5, 1.5, 0.5, (0.6, 0.6, 0.6)),  # Chimenea
+
+    ("translate", 2, 0, -29),
+    ("scale", 3.5, 3.5, 3.5),
+    ("model", "draw_foliage1"),
+    ("model", "draw_trunk1"),
+
+    ("translate", 5, 0, 0),
+    ("model", "draw_foliage1"),
+    ("model", "draw_trunk1"),
+
+    ("translate", -3, 0, 3.5),
+    ("model", "draw_base"),  # Dibuja la base
+    ("model", "draw_large_windows"),  # Dibuja las ventanas grandes
+    ("model", "draw_second_floor"),  # Dibuja el segundo piso
+    ("model", "draw_terrace"),  # Dibuja la terraza
+    ("model", "draw_railings"),  # Dibuja las barandas
+
+    ("translate", -3.5, 0, -3),
+    ("model", "draw_hollow_cylinder"),  # Dibuja bote de basura
+
+    ("translate", -1, 0, 5),
+    ("scale", .4, .5, .5),
+    ("model", "draw_cylinder"),  # Dibuja el poste
+    ("model", "draw_board"),  # Dibuja el tablero
+    ("model", "draw_hoop"),  # Dibuja el aro
+
+    ("translate", -1, 0, -9),
+    ("rotate", 180, 0, 1, 0),
+    ("model", "draw_cylinder"),  # Dibuja el poste
+    ("model", "draw_board"),  # Dibuja el tablero
+    ("model", "draw_hoop"),  # Dibuja el aro
+
+    ("translate", -10, 0, 20),
+    ("scale", 2.5, 2.5, 2.5),
+    ("rotate", 180, 0, 1, 0),
+    ("model", "draw_ground"),  # Dibuja el suelo
+    ("model", "draw_rectangular_base"),  # Dibuja la base de la casa
+    ("model", "draw_door"),  # Dibuja la puerta
+    ("model", "draw_windows"),  # Dibuja las ventanas
+    ("model", "draw_prism_roof"),  # Dibuja el techo
+
+    ("translate", 3, 0, 2),
+    ("scale", .5, .5, .5),
+    ("model", "draw_foliage2"),
+    ("model", "draw_trunk2"),
+
+    ("translate", -12, 0, 0),
+    ("model", "draw_foliage2"),
+    ("model", "draw_trunk2"),
+
+    ("translate", 5, .5, -1),
+    ("scale", .4, .4, .4),
+    ("rotate", 180, 0, 1, 0),
+    ("model", "draw_snowman"),
+
+    ("translate", -17, -1, 7),
+    ("model", "draw_cube", 0, 0, 0, 5, 3, 5, (0.8, 0.5, 0.2)),  # Casa principal
+    ("model", "draw_roof", 0, 3, 0, 5),  # Techo
+    ("model", "draw_cube", -5, 0, 0, 3, 2, 5, (0.7, 0.7, 0.7)),  # Garaje
+    ("model", "draw_cube", 1.5, 5, 0, 0.5, 1.5, 0.5, (0.6, 0.6, 0.6)),  # Chimenea
+
+    ("translate", -15, 0, -47),
+    ("scale", 2.5, 2.5, 2.5),
+    ("model", "draw_cube", 0, 0, 0, 3, 2, 3, (0.8, 0.5, 0.2)),  # Cubo base principal
+    ("model", "draw_cube", 4, 0, 0, 1, 2, 1, (0.7, 0.5, 0.3)),  # Cubo adicional a la derecha
+    ("model", "draw_cube", -4, 0, 0, 1, 2, 1, (0.7, 0.5, 0.3)),  # Cubo adicional a la izquierda
+    ("model", "draw_roof", 0, 2, 0, 3),  # Techo más grande
+
+    ("translate", 2, 0, 17),
+    ("model", "draw_foliage3"),
+    ("model", "draw_trunk3"),
+
+    ("translate", 0, 0, 5),
+    ("model", "draw_foliage4"),
+    ("model", "draw_trunk4"),
+
+    ("translate", -3, 0, -7),
+    ("model", "draw_light_pole"),  # Dibuja el poste de luz
+
+    ("scale", 3, 3, 3),
+    ("translate", -3, 0, -5),
+    ("model", "draw_ground"),  # Dibuja el suelo
+    ("model", "draw_cube1"),  # Dibuja la base de la casa
+    ("model", "draw_roof1"),  # Dibuja el techo
+
+    ("translate", -2, 0, 2),
+    ("scale", .5, .5, .5),
+    ("model", "draw_base"),  # Dibuja la base
+    ("model", "draw_large_windows"),  # Dibuja las ventanas grandes
+    ("model", "draw_second_floor"),  # Dibuja el segundo piso
+    ("model", "draw_terrace"),  # Dibuja la terraza
+    ("model", "draw_railings"),  # Dibuja las barandas
+
+    ("translate", 2.5, 0, -1),
+    ("scale", .6, .6, .6),
+    ("model", "draw_light_pole"),  # Dibuja el poste de luz
+
+    ("translate", 7, 0, 0),
+    ("scale", 1.5, 1.5, 1.5),
+    ("model", "draw_foliage5"),
+    ("model", "draw_trunk5"),
+
+    ("translate", -7, 0, 5.25),
+    ("scale", 1.75, 1.75, 1.75),
+    ("model", "draw_ground"),  # Dibuja el suelo
+    ("model", "draw_cube1"),  # Dibuja la base de la casa
+    ("model", "draw_roof1"),  # Dibuja el techo
+
+    ("scale", .75, .75, .75),
+    ("translate", 3, 0, -2),
+    ("model", "draw_foliage4"),
+    ("model", "draw_trunk4"),
+
+    ("translate", -3, 0, 5.25),
+    ("rotate", 90, 0, 1, 0),
+    ("model", "draw_ground"),  # Dibuja el suelo
+    ("model", "draw_rectangular_base"),  # Dibuja la base de la casa
+    ("model", "draw_door"),  # Dibuja la puerta
+    ("model", "draw_windows"),  # Dibuja las ventanas
+    ("model", "draw_prism_roof"),  # Dibuja el techo
+
+    ("translate", 2.5, 0, 3),
+    ("scale", .5, .5, .5),
+    ("model", "draw_foliage3"),
+    ("model", "draw_trunk3"),
+
+    ("translate", -5, 0, 0),
+    ("model", "draw_light_pole"),
+
+    ("translate", -3, 0, 0),
+    ("model", "draw_foliage2"),
+    ("model", "draw_trunk2"),
+
+    ("translate", -3.55, 0, -6),
+    ("scale", .5, .5, .5),
+    ("model", "draw_cube", 0, 0, 0, 5, 3, 5, (0.8, 0.5, 0.2)),  # Casa principal
+    ("model", "draw_roof", 0, 3, 0, 5),  # Techo
+    ("model", "draw_cube", -5, 0, 0, 3, 2, 5, (0.7, 0.7, 0.7)),  # Garaje
+    ("model", "draw_cube", 1.5, 5, 0, 0.5, 1.5, 0.5, (0.6, 0.6, 0.6)),  # Chimenea
+
+    # P3
+    ("translate", 2, 0, -29),
+    ("scale", 3.5, 3.5, 3.5),
+    ("model", "draw_foliage1"),
+    ("model", "draw_trunk1"),
+
+    ("translate", 5, 0, 0),
+    ("model", "draw_foliage1"),
+    ("model", "draw_trunk1"),
+
+    ("translate", -3, 0, 3.5),
+    ("model", "draw_base"),  # Dibuja la base
+    ("model", "draw_large_windows"),  # Dibuja las ventanas grandes
+    ("model", "draw_second_floor"),  # Dibuja el segundo piso
+    ("model", "draw_terrace"),  # Dibuja la terraza
+    ("model", "draw_railings"),  # Dibuja las barandas
+
+    ("translate", -3.5, 0, -3),
+    ("model", "draw_hollow_cylinder"),  # Dibuja bote de basura
+
+    ("translate", -1, 0, 5),
+    ("scale", .4, .5, .5),
+    ("model", "draw_cylinder"),  # Dibuja el poste
+    ("model", "draw_board"),  # Dibuja el tablero
+    ("model", "draw_hoop"),  # Dibuja el aro
+
+    ("translate", -1, 0, -9),
+    ("rotate", 180, 0, 1, 0),
+    ("model", "draw_cylinder"),  # Dibuja el poste
+    ("model", "draw_board"),  # Dibuja el tablero
+    ("model", "draw_hoop"),  # Dibuja el aro
+
+    ("translate", -10, 0, 20),
+    ("scale", 2.5, 2.5, 2.5),
+    ("rotate", 180, 0, 1, 0),
+    ("model", "draw_ground"),  # Dibuja el suelo
+    ("model", "draw_rectangular_base"),  # Dibuja la base de la casa
+    ("model", "draw_door"),  # Dibuja la puerta
+    ("model", "draw_windows"),  # Dibuja las ventanas
+    ("model", "draw_prism_roof"),  # Dibuja el techo
+
+    ("translate", 3, 0, 2),
+    ("scale", .5, .5, .5),
+    ("model", "draw_foliage2"),
+    ("model", "draw_trunk2"),
+
+    ("translate", -12, 0, 0),
+    ("model", "draw_foliage2"),
+    ("model", "draw_trunk2"),
+
+    ("translate", 5, .5, -1),
+    ("scale", .4, .4, .4),
+    ("rotate", 180, 0, 1, 0),
+    ("model", "draw_snowman"),
+
+    ("translate", -17, -1, 7),
+    ("model", "draw_cube", 0, 0, 0, 5, 3, 5, (0.8, 0.5, 0.2)),  # Casa principal
+    ("model", "draw_roof", 0, 3, 0, 5),  # Techo
+    ("model", "draw_cube", -5, 0, 0, 3, 2, 5, (0.7, 0.7, 0.7)),  # Garaje
+    ("model", "draw_cube", 1.5, 5, 0, 0.5, 1.5, 0.5, (0.6, 0.6, 0.6)),  # Chimenea
+
+    ("translate", -15, 0, -47),
+    ("scale", 2.5, 2.5, 2.5),
+    ("model", "draw_cube", 0, 0, 0, 3, 2, 3, (0.8, 0.5, 0.2)),  # Cubo base principal
+    ("model", "draw_cube", 4, 0, 0, 1, 2, 1, (0.7, 0.5, 0.3)),  # Cubo adicional a la derecha
+    ("model", "draw_cube", -4, 0, 0, 1, 2, 1, (0.7, 0.5, 0.3)),  # Cubo adicional a la izquierda
+    ("model", "draw_roof", 0, 2, 0, 3),  # Techo más grande
+
+    ("translate", 2, 0, 17),
+    ("model", "draw_foliage3"),
+    ("model", "draw_trunk3"),
+
+    ("translate", 0, 0, 5),
+    ("model", "draw_foliage4"),
+    ("model", "draw_trunk4"),
+
+    ("translate", -3, 0, -7),
+    ("model", "draw_light_pole"),  # Dibuja el poste de luz
+
+    ("scale", 3, 3, 3),
+    ("translate", -3, 0, -5),
+    ("model", "draw_ground"),  # Dibuja el suelo
+    ("model", "draw_cube1"),  # Dibuja la base de la casa
+    ("model", "draw_roof1"),  # Dibuja el techo
+
+    ("translate", -2, 0, 2),
+    ("scale", .5, .5, .5),
+    ("model", "draw_base"),  # Dibuja la base
+    ("model", "draw_large_windows"),  # Dibuja las ventanas grandes
+    ("model", "draw_second_floor"),  # Dibuja el segundo piso
+    ("model", "draw_terrace"),  # Dibuja la terraza
+    ("model", "draw_railings"),  # Dibuja las barandas
+
+    ("translate", 2.5, 0, -1),
+    ("scale", .6, .6, .6),
+    ("model", "draw_light_pole"),  # Dibuja el poste de luz
+
+    ("translate", 7, 0, 0),
+    ("scale", 1.5, 1.5, 1.5),
+    ("model", "draw_foliage5"),
+    ("model", "draw_trunk5"),
+
+    ("translate", -7, 0, 5.25),
+    ("scale", 1.75, 1.75, 1.75),
+    ("model", "draw_ground"),  # Dibuja el suelo
+    ("model", "draw_cube1"),  # Dibuja la base de la casa
+    ("model", "draw_roof1"),  # Dibuja el techo
+
+    ("scale", .75, .75, .75),
+    ("translate", 3, 0, -2),
+    ("model", "draw_foliage4"),
+    ("model", "draw_trunk4"),
+
+    ("translate", -3, 0, 5.25),
+    ("rotate", 90, 0, 1, 0),
+    ("model", "draw_ground"),  # Dibuja el suelo
+    ("model", "draw_rectangular_base"),  # Dibuja la base de la casa
+    ("model", "draw_door"),  # Dibuja la puerta
+    ("model", "draw_windows"),  # Dibuja las ventanas
+    ("model", "draw_prism_roof"),  # Dibuja el techo
+
+    ("translate", 2.5, 0, 3),
+    ("scale", .5, .5, .5),
+    ("model", "draw_foliage3"),
+    ("model", "draw_trunk3"),
+
+    ("translate", -5, 0, 0),
+    ("model", "draw_light_pole"),
+
+    ("translate", -3, 0, 0),
+    ("model", "draw_foliage2"),
+    ("model", "draw_trunk2"),
+
+    ("translate", -3.55, 0, -6),
+    ("scale", .5, .5, .5),
+    ("model", "draw_cube", 0, 0, 0, 5, 3, 5, (0.8, 0.5, 0.2)),  # Casa principal
+    ("model", "draw_roof", 0, 3, 0, 5),  # Techo
+    ("model", "draw_cube", -5, 0, 0, 3, 2, 5, (0.7, 0.7, 0.7)),  # Garaje
+    ("model", "draw_cube", 1.5, 5, 0, 0.5, 1.5, 0.5, (0.6, 0.6, 0.6)),  # Chimenea
+
+    # P4
+    ("translate", 2, 0, -29),
+    ("scale", 3.5, 3.5, 3.5),
+    ("model", "draw_foliage1"),
+    ("model", "draw_trunk1"),
+
+    ("translate", 5, 0, 0),
+    ("model", "draw_foliage1"),
+    ("model", "draw_trunk1"),
+
+    ("translate", -3, 0, 3.5),
+    ("model", "draw_base"),  # Dibuja la base
+    ("model", "draw_large_windows"),  # Dibuja las ventanas grandes
+    ("model", "draw_second_floor"),  # Dibuja el segundo piso
+    ("model", "draw_terrace"),  # Dibuja la terraza
+    ("model", "draw_railings"),  # Dibuja las barandas
+
+    ("translate", -3.5, 0, -3),
+    ("model", "draw_hollow_cylinder"),  # Dibuja bote de basura
+
+    ("translate", -1, 0, 5),
+    ("scale", .4, .5, .5),
+    ("model", "draw_cylinder"),  # Dibuja el poste
+    ("model", "draw_board"),  # Dibuja el tablero
+    ("model", "draw_hoop"),  # Dibuja el aro
+
+    ("translate", -1, 0, -9),
+    ("rotate", 180, 0, 1, 0),
+    ("model", "draw_cylinder"),  # Dibuja el poste
+    ("model", "draw_board"),  # Dibuja el tablero
+    ("model", "draw_hoop"),  # Dibuja el aro
+
+    ("translate", -10, 0, 20),
+    ("scale", 2.5, 2.5, 2.5),
+    ("rotate", 180, 0, 1, 0),
+    ("model", "draw_ground"),  # Dibuja el suelo
+    ("model", "draw_rectangular_base"),  # Dibuja la base de la casa
+    ("model", "draw_door"),  # Dibuja la puerta
+    ("model", "draw_windows"),  # Dibuja las ventanas
+    ("model", "draw_prism_roof"),  # Dibuja el techo
+
+    ("translate", 3, 0, 2),
+    ("scale", .5, .5, .5),
+    ("model", "draw_foliage2"),
+    ("model", "draw_trunk2"),
+
+    ("translate", -12, 0, 0),
+    ("model", "draw_foliage2"),
+    ("model", "draw_trunk2"),
+
+    ("translate", 5, .5, -1),
+    ("scale", .4, .4, .4),
+    ("rotate", 180, 0, 1, 0),
+    ("model", "draw_snowman"),
+
+    ("translate", -17, -1, 7),
+    ("model", "draw_cube", 0, 0, 0, 5, 3, 5, (0.8, 0.5, 0.2)),  # Casa principal
+    ("model", "draw_roof", 0, 3, 0, 5),  # Techo
+    ("model", "draw_cube", -5, 0, 0, 3, 2, 5, (0.7, 0.7, 0.7)),  # Garaje
+    ("model", "draw_cube", 1.5, 5, 0, 0.5, 1.5, 0.5, (0.6, 0.6, 0.6)),  # Chimenea
+
+    ("translate", -15, 0, -47),
+    ("scale", 2.5, 2.5, 2.5),
+    ("model", "draw_cube", 0, 0, 0, 3, 2, 3, (0.8, 0.5, 0.2)),  # Cubo base principal
+    ("model", "draw_cube", 4, 0, 0, 1, 2, 1, (0.7, 0.5, 0.3)),  # Cubo adicional a la derecha
+    ("model", "draw_cube", -4, 0, 0, 1, 2, 1, (0.7, 0.5, 0.3)),  # Cubo adicional a la izquierda
+    ("model", "draw_roof", 0, 2, 0, 3),  # Techo más grande
+
+    ("translate", 2, 0, 17),
+    ("model", "draw_foliage3"),
+    ("model", "draw_trunk3"),
+
+    ("translate", 0, 0, 5),
+    ("model", "draw_foliage4"),
+    ("model", "draw_trunk4"),
+
+    ("translate", -3, 0, -7),
+    ("model", "draw_light_pole"),  # Dibuja el poste de luz
+
+    ("scale", 3, 3, 3),
+    ("translate", -3, 0, -5),
+    ("model", "draw_ground"),  # Dibuja el suelo
+    ("model", "draw_cube1"),  # Dibuja la base de la casa
+    ("model", "draw_roof1"),  # Dibuja el techo
+
+    ("translate", -2, 0, 2),
+    ("scale", .5, .5, .5),
+    ("model", "draw_base"),  # Dibuja la base
+    ("model", "draw_large_windows"),  # Dibuja las ventanas grandes
+    ("model", "draw_second_floor"),  # Dibuja el segundo piso
+    ("model", "draw_terrace"),  # Dibuja la terraza
+    ("model", "draw_railings"),  # Dibuja las barandas
+
+    ("translate", 2.5, 0, -1),
+    ("scale", .6, .6, .6),
+    ("model", "draw_light_pole"),  # Dibuja el poste de luz
+
+    ("translate", 7, 0, 0),
+    ("scale", 1.5, 1.5, 1.5),
+    ("model", "draw_foliage5"),
+    ("model", "draw_trunk5"),
+
+    ("translate", -7, 0, 5.25),
+    ("scale", 1.75, 1.75, 1.75),
+    ("model", "draw_ground"),  # Dibuja el suelo
+    ("model", "draw_cube1"),  # Dibuja la base de la casa
+    ("model", "draw_roof1"),  # Dibuja el techo
+
+    ("scale", .75, .75, .75),
+    ("translate", 3, 0, -2),
+    ("model", "draw_foliage4"),
+    ("model", "draw_trunk4"),
+
+    ("translate", -3, 0, 5.25),
+    ("rotate", 90, 0, 1, 0),
+    ("model", "draw_ground"),  # Dibuja el suelo
+    ("model", "draw_rectangular_base"),  # Dibuja la base de la casa
+    ("model", "draw_door"),  # Dibuja la puerta
+    ("model", "draw_windows"),  # Dibuja las ventanas
+    ("model", "draw_prism_roof"),  # Dibuja el techo
+
+    ("translate", 2.5, 0, 3),
+    ("scale", .5, .5, .5),
+    ("model", "draw_foliage3"),
+    ("model", "draw_trunk3"),
+
+    ("translate", -5, 0, 0),
+    ("model", "draw_light_pole"),
+
+    ("translate", -3, 0, 0),
+    ("model", "draw_foliage2"),
+    ("model", "draw_trunk2"),
+
+    ("translate", -3.55, 0, -6),
+    ("scale", .5, .5, .5),
+    ("model", "draw_cube", 0, 0, 0, 5, 3, 5, (0.8, 0.5, 0.2)),  # Casa principal
+    ("model", "draw_roof", 0, 3, 0, 5),  # Techo
+    ("model", "draw_cube", -5, 0, 0, 3, 2, 5, (0.7, 0.7, 0.7)),  # Garaje
+    ("model", "draw_cube", 1.5, 5, 0, 0.5, 1.5, 0.5, (0.6, 0.6, 0.6)),  # Chimenea
+
+    # p5
+    ("translate", 120, 0, 110),
+    ("scale", 4.5, 4.5, 4.5),
+    ("model", "draw_foliage1"),
+    ("model", "draw_trunk1"),
+
+    ("translate", 5, 0, 0),
+    ("model", "draw_foliage1"),
+    ("model", "draw_trunk1"),
+
+    ("translate", -3, 0, 3.5),
+    ("model", "draw_base"),  # Dibuja la base
+    ("model", "draw_large_windows"),  # Dibuja las ventanas grandes
+    ("model", "draw_second_floor"),  # Dibuja el segundo piso
+    ("model", "draw_terrace"),  # Dibuja la terraza
+    ("model", "draw_railings"),  # Dibuja las barandas
+
+    ("translate", -3.5, 0, -3),
+    ("model", "draw_hollow_cylinder"),  # Dibuja bote de basura
+
+    ("translate", -1, 0, 5),
+    ("scale", .4, .5, .5),
+
+    ("translate", -1, 0, -9),
+    ("rotate", 180, 0, 1, 0),
+
+    ("translate", -10, 0, 20),
+    ("scale", 2.5, 2.5, 2.5),
+    ("rotate", 180, 0, 1, 0),
+    ("model", "draw_ground"),  # Dibuja el suelo
+    ("model", "draw_rectangular_base"),  # Dibuja la base de la casa
+    ("model", "draw_door"),  # Dibuja la puerta
+    ("model", "draw_windows"),  # Dibuja las ventanas
+    ("model", "draw_prism_roof"),  # Dibuja el techo
+
+    ("translate", 3, 0, 2),
+    ("scale", .5, .5, .5),
+    ("model", "draw_foliage2"),
+    ("model", "draw_trunk2"),
+
+    ("translate", -12, 0, 0),
+    ("model", "draw_foliage2"),
+    ("model", "draw_trunk2"),
+
+    ("translate", 5, .5, -1),
+    ("scale", .4, .4, .4),
+    ("rotate", 180, 0, 1, 0),
+    ("model", "draw_snowman"),
+
+    ("translate", -17, -1, 7),
+    ("model", "draw_cube", 0, 0, 0, 5, 3, 5, (0.8, 0.5, 0.2)),  # Casa principal
+    ("model", "draw_roof", 0, 3, 0, 5),  # Techo
+    ("model", "draw_cube", -5, 0, 0, 3, 2, 5, (0.7, 0.7, 0.7)),  # Garaje
+    ("model", "draw_cube", 1.5, 5, 0, 0.5, 1.5, 0.5, (0.6, 0.6, 0.6)),  # Chimenea
+
+    ("translate", -15, 0, -47),
+    ("scale", 2.5, 2.5, 2.5),
+    ("model", "draw_cube", 0, 0, 0, 3, 2, 3, (0.8, 0.5, 0.2)),  # Cubo base principal
+    ("model", "draw_cube", 4, 0, 0, 1, 2, 1, (0.7, 0.5, 0.3)),  # Cubo adicional a la derecha
+    ("model", "draw_cube", -4, 0, 0, 1, 2, 1, (0.7, 0.5, 0.3)),  # Cubo adicional a la izquierda
+    ("model", "draw_roof", 0, 2, 0, 3),  # Techo más grande
+
+    ("translate", 2, 0, 17),
+    ("model", "draw_foliage3"),
+    ("model", "draw_trunk3"),
+
+    ("translate", 0, 0, 5),
+    ("model", "draw_foliage4"),
+    ("model", "draw_trunk4"),
+
+    ("translate", -3, 0, -7),
+    ("model", "draw_light_pole"),  # Dibuja el poste de luz
+
+    ("scale", 3, 3, 3),
+    ("translate", -3, 0, -5),
+    ("model", "draw_ground"),  # Dibuja el suelo
+    ("model", "draw_cube1"),  # Dibuja la base de la casa
+    ("model", "draw_roof1"),  # Dibuja el techo
+
+    ("translate", -2, 0, 2),
+    ("scale", .5, .5, .5),
+    ("model", "draw_base"),  # Dibuja la base
+    ("model", "draw_large_windows"),  # Dibuja las ventanas grandes
+    ("model", "draw_second_floor"),  # Dibuja el segundo piso
+    ("model", "draw_terrace"),  # Dibuja la terraza
+    ("model", "draw_railings"),  # Dibuja las barandas
+
+    ("translate", 2.5, 0, -1),
+    ("scale", .6, .6, .6),
+    ("model", "draw_light_pole"),  # Dibuja el poste de luz
+
+    ("translate", 7, 0, 0),
+    ("scale", 1.5, 1.5, 1.5),
+    ("model", "draw_foliage5"),
+    ("model", "draw_trunk5"),
+
+    ("translate", -7, 0, 5.25),
+    ("scale", 1.75, 1.75, 1.75),
+    ("model", "draw_ground"),  # Dibuja el suelo
+    ("model", "draw_cube1"),  # Dibuja la base de la casa
+    ("model", "draw_roof1"),  # Dibuja el techo
+
+    ("scale", .75, .75, .75),
+    ("translate", 3, 0, -2),
+    ("model", "draw_foliage4"),
+    ("model", "draw_trunk4"),
+
+    ("translate", -3, 0, 5.25),
+    ("rotate", 90, 0, 1, 0),
+    ("model", "draw_ground"),  # Dibuja el suelo
+    ("model", "draw_rectangular_base"),  # Dibuja la base de la casa
+    ("model", "draw_door"),  # Dibuja la puerta
+    ("model", "draw_windows"),  # Dibuja las ventanas
+    ("model", "draw_prism_roof"),  # Dibuja el techo
+
+    ("translate", 2.5, 0, 3),
+    ("scale", .5, .5, .5),
+    ("model", "draw_foliage3"),
+    ("model", "draw_trunk3"),
+
+    ("translate", -5, 0, 0),
+    ("model", "draw_light_pole"),
+
+    ("translate", -3, 0, 0),
+    ("model", "draw_foliage2"),
+    ("model", "draw_trunk2"),
+
+    ("translate", -3.55, 0, -6),
+    ("scale", .5, .5, .5),
+    ("model", "draw_cube", 0, 0, 0, 5, 3, 5, (0.8, 0.5, 0.2)),  # Casa principal
+    ("model", "draw_roof", 0, 3, 0, 5),  # Techo
+    ("model", "draw_cube", -5, 0, 0, 3, 2, 5, (0.7, 0.7, 0.7)),  # Garaje
+    ("model", "draw_cube", 1.5, 5, 0, 0.5, 1.5, 0.5, (0.6, 0.6, 0.6)),  # Chimenea
+
+    ("translate", -15, 0, 0),
+    ("scale", 4, 4, 4),
+    ("model", "draw_foliage1"),
+    ("model", "draw_trunk1"),
+
+    ("translate", -5, 0, 4),
+    ("model", "draw_foliage2"),
+    ("model", "draw_trunk2"),
+
+    ("translate", 0, 0, -5),
+    ("model", "draw_foliage3"),
+    ("model", "draw_trunk3"),
+
+    ("translate", 2.5, 0, 0),
+    ("model", "draw_foliage4"),
+    ("model", "draw_trunk4"),
+
+    ("translate", 0, 0, 5),
+    ("model", "draw_foliage5"),
+    ("model", "draw_trunk5"),
+
+    ("translate", -5, 0, -4),
+    ("model", "draw_foliage1"),
+    ("model", "draw_trunk1"),
+
+    ("translate", -2, 0, 3),
+    ("model", "draw_foliage2"),
+    ("model", "draw_trunk2"),
+
+    # p6
+    ("translate", 11, 0, 51),
+    ("scale", .85, .85, .85),
+    ("model", "draw_foliage1"),
+    ("model", "draw_trunk1"),
+
+    ("translate", 5, 0, 0),
+    ("model", "draw_foliage1"),
+    ("model", "draw_trunk1"),
+
+    ("translate", -3, 0, 3.5),
+    ("model", "draw_base"),  # Dibuja la base
+    ("model", "draw_large_windows"),  # Dibuja las ventanas grandes
+    ("model", "draw_second_floor"),  # Dibuja el segundo piso
+    ("model", "draw_terrace"),  # Dibuja la terraza
+    ("model", "draw_railings"),  # Dibuja las barandas
+
+    ("translate", -3.5, 0, -3),
+    ("model", "draw_hollow_cylinder"),  # Dibuja bote de basura
+
+    ("translate", -1, 0, 5),
+    ("scale", .4, .5, .5),
+
+    ("translate", -1, 0, -9),
+    ("rotate", 180, 0, 1, 0),
+
+    ("translate", -10, 0, 20),
+    ("scale", 2.5, 2.5, 2.5),
+    ("rotate", 180, 0, 1, 0),
+    ("model", "draw_ground"),  # Dibuja el suelo
+    ("model", "draw_rectangular_base"),  # Dibuja la base de la casa
+    ("model", "draw_door"),  # Dibuja la puerta
+    ("model", "draw_windows"),  # Dibuja las ventanas
+    ("model", "draw_prism_roof"),  # Dibuja el techo
+
+    ("translate", 3, 0, 2),
+    ("scale", .5, .5, .5),
+    ("model", "draw_foliage2"),
+    ("model", "draw_trunk2"),
+
+    ("translate", -12, 0, 0),
+    ("model", "draw_foliage2"),
+    ("model", "draw_trunk2"),
+
+    ("translate", 5, .5, -1),
+    ("scale", .4, .4, .4),
+    ("rotate", 180, 0, 1, 0),
+    ("model", "draw_snowman"),
+
+    ("translate", -17, -1, 7),
+    ("model", "draw_cube", 0, 0, 0, 5, 3, 5, (0.8, 0.5, 0.2)),  # Casa principal
+    ("model", "draw_roof", 0, 3, 0, 5),  # Techo
+    ("model", "draw_cube", -5, 0, 0, 3, 2, 5, (0.7, 0.7, 0.7)),  # Garaje
+    ("model", "draw_cube", 1.5, 5, 0, 0.5, 1.5, 0.5, (0.6, 0.6, 0.6)),  # Chimenea
+
+    ("translate", -15, 0, -47),
+    ("scale", 2.5, 2.5, 2.5),
+    ("model", "draw_cube", 0, 0, 0, 3, 2, 3, (0.8, 0.5, 0.2)),  # Cubo base principal
+    ("model", "draw_cube", 4, 0, 0, 1, 2, 1, (0.7, 0.5, 0.3)),  # Cubo adicional a la derecha
+    ("model", "draw_cube", -4, 0, 0, 1, 2, 1, (0.7, 0.5, 0.3)),  # Cubo adicional a la izquierda
+    ("model", "draw_roof", 0, 2, 0, 3),  # Techo más grande
+
+    ("translate", 2, 0, 17),
+    ("model", "draw_foliage3"),
+    ("model", "draw_trunk3"),
+
+    ("translate", 0, 0, 5),
+    ("model", "draw_foliage4"),
+    ("model", "draw_trunk4"),
+
+    ("translate", -3, 0, -7),
+    ("model", "draw_light_pole"),  # Dibuja el poste de luz
+
+    ("scale", 3, 3, 3),
+    ("translate", -3, 0, -5),
+    ("model", "draw_ground"),  # Dibuja el suelo
+    ("model", "draw_cube1"),  # Dibuja la base de la casa
+    ("model", "draw_roof1"),  # Dibuja el techo
+
+    ("translate", -2, 0, 2),
+    ("scale", .5, .5, .5),
+    ("model", "draw_base"),  # Dibuja la base
+    ("model", "draw_large_windows"),  # Dibuja las ventanas grandes
+    ("model", "draw_second_floor"),  # Dibuja el segundo piso
+    ("model", "draw_terrace"),  # Dibuja la terraza
+    ("model", "draw_railings"),  # Dibuja las barandas
+
+    ("translate", 2.5, 0, -1),
+    ("scale", .6, .6, .6),
+    ("model", "draw_light_pole"),  # Dibuja el poste de luz
+
+    ("translate", 7, 0, 0),
+    ("scale", 1.5, 1.5, 1.5),
+    ("model", "draw_foliage5"),
+    ("model", "draw_trunk5"),
+
+    ("translate", -7, 0, 5.25),
+    ("scale", 1.75, 1.75, 1.75),
+    ("model", "draw_ground"),  # Dibuja el suelo
+    ("model", "draw_cube1"),  # Dibuja la base de la casa
+    ("model", "draw_roof1"),  # Dibuja el techo
+
+    ("scale", .75, .75, .75),
+    ("translate", 3, 0, -2),
+    ("model", "draw_foliage4"),
+    ("model", "draw_trunk4"),
+
+    ("translate", -3, 0, 5.25),
+    ("rotate", 90, 0, 1, 0),
+    ("model", "draw_ground"),  # Dibuja el suelo
+    ("model", "draw_rectangular_base"),  # Dibuja la base de la casa
+    ("model", "draw_door"),  # Dibuja la puerta
+    ("model", "draw_windows"),  # Dibuja las ventanas
+    ("model", "draw_prism_roof"),  # Dibuja el techo
+
+    ("translate", 2.5, 0, 3),
+    ("scale", .5, .5, .5),
+    ("model", "draw_foliage3"),
+    ("model", "draw_trunk3"),
+
+    ("translate", -5, 0, 0),
+    ("model", "draw_light_pole"),
+
+    ("translate", -3, 0, 0),
+    ("model", "draw_foliage2"),
+    ("model", "draw_trunk2"),
+
+    ("translate", -3.55, 0, -6),
+    ("scale", .5, .5, .5),
+    ("model", "draw_cube", 0, 0, 0, 5, 3, 5, (0.8, 0.5, 0.2)),  # Casa principal
+    ("model", "draw_roof", 0, 3, 0, 5),  # Techo
+    ("model", "draw_cube", -5, 0, 0, 3, 2, 5, (0.7, 0.7, 0.7)),  # Garaje
+    ("model", "draw_cube", 1.5, 5, 0, 0.5, 1.5, 0.5, (0.6, 0.6, 0.6)),  # Chimenea
+
+    ("translate", -15, 0, 0),
+    ("scale", 4, 4, 4),
+    ("model", "draw_foliage1"),
+    ("model", "draw_trunk1"),
+
+    ("translate", -5, 0, 4),
+    ("model", "draw_foliage2"),
+    ("model", "draw_trunk2"),
+
+    ("translate", 0, 0, -5),
+    ("model", "draw_foliage3"),
+    ("model", "draw_trunk3"),
+
+    ("translate", 2.5, 0, 0),
+    ("model", "draw_foliage4"),
+    ("model", "draw_trunk4"),
+
+    ("translate", 0, 0, 5),
+    ("model", "draw_foliage5"),
+    ("model", "draw_trunk5"),
+
+    ("translate", -5, 0, -4),
+    ("model", "draw_foliage1"),
+    ("model", "draw_trunk1"),
+
+    ("translate", -2, 0, 3),
+    ("model", "draw_foliage2"),
+    ("model", "draw_trunk2"),
+
+    # p7
+    ("translate", 20, 0, 65),
+    ("scale", .95, .95, .95),
+    ("model", "draw_foliage1"),
+    ("model", "draw_trunk1"),
+
+    ("translate", 5, 0, 0),
+    ("model", "draw_foliage1"),
+    ("model", "draw_trunk1"),
+
+    ("translate", -3, 0, 3.5),
+    ("model", "draw_base"),  # Dibuja la base
+    ("model", "draw_large_windows"),  # Dibuja las ventanas grandes
+    ("model", "draw_second_floor"),  # Dibuja el segundo piso
+    ("model", "draw_terrace"),  # Dibuja la terraza
+    ("model", "draw_railings"),  # Dibuja las barandas
+
+    ("translate", -3.5, 0, -3),
+    ("model", "draw_hollow_cylinder"),  # Dibuja bote de basura
+
+    ("translate", -1, 0, 5),
+    ("scale", .4, .5, .5),
+
+    ("translate", -1, 0, -9),
+    ("rotate", 180, 0, 1, 0),
+
+    ("translate", -10, 0, 20),
+    ("scale", 2.5, 2.5, 2.5),
+    ("rotate", 180, 0, 1, 0),
+    ("model", "draw_ground"),  # Dibuja el suelo
+    ("model", "draw_rectangular_base"),  # Dibuja la base de la casa
+    ("model", "draw_door"),  # Dibuja la puerta
+    ("model", "draw_windows"),  # Dibuja las ventanas
+    ("model", "draw_prism_roof"),  # Dibuja el techo
+
+    ("translate", 3, 0, 2),
+    ("scale", .5, .5, .5),
+    ("model", "draw_foliage2"),
+    ("model", "draw_trunk2"),
+
+    ("translate", -12, 0, 0),
+    ("model", "draw_foliage2"),
+    ("model", "draw_trunk2"),
+
+    ("translate", 5, .5, -1),
+    ("scale", .4, .4, .4),
+    ("rotate", 180, 0, 1, 0),
+    ("model", "draw_snowman"),
+
+    ("translate", -17, -1, 7),
+    ("model", "draw_cube", 0, 0, 0, 5, 3, 5, (0.8, 0.5, 0.2)),  # Casa principal
+    ("model", "draw_roof", 0, 3, 0, 5),  # Techo
+    ("model", "draw_cube", -5, 0, 0, 3, 2, 5, (0.7, 0.7, 0.7)),  # Garaje
+    ("model", "draw_cube", 1.5, 5, 0, 0.5, 1.5, 0.5, (0.6, 0.6, 0.6)),  # Chimenea
+
+    ("translate", -15, 0, -47),
+    ("scale", 2.5, 2.5, 2.5),
+    ("model", "draw_cube", 0, 0, 0, 3, 2, 3, (0.8, 0.5, 0.2)),  # Cubo base principal
+    ("model", "draw_cube", 4, 0, 0, 1, 2, 1, (0.7, 0.5, 0.3)),  # Cubo adicional a la derecha
+    ("model", "draw_cube", -4, 0, 0, 1, 2, 1, (0.7, 0.5, 0.3)),  # Cubo adicional a la izquierda
+    ("model", "draw_roof", 0, 2, 0, 3),  # Techo más grande
+
+    ("translate", 2, 0, 17),
+    ("model", "draw_foliage3"),
+    ("model", "draw_trunk3"),
+
+    ("translate", 0, 0, 5),
+    ("model", "draw_foliage4"),
+    ("model", "draw_trunk4"),
+
+    ("translate", -3, 0, -7),
+    ("model", "draw_light_pole"),  # Dibuja el poste de luz
+
+    ("scale", 3, 3, 3),
+    ("translate", -3, 0, -5),
+    ("model", "draw_ground"),  # Dibuja el suelo
+    ("model", "draw_cube1"),  # Dibuja la base de la casa
+    ("model", "draw_roof1"),  # Dibuja el techo
+
+    ("translate", -2, 0, 2),
+    ("scale", .5, .5, .5),
+    ("model", "draw_base"),  # Dibuja la base
+    ("model", "draw_large_windows"),  # Dibuja las ventanas grandes
+    ("model", "draw_second_floor"),  # Dibuja el segundo piso
+    ("model", "draw_terrace"),  # Dibuja la terraza
+    ("model", "draw_railings"),  # Dibuja las barandas
+
+    ("translate", 2.5, 0, -1),
+    ("scale", .6, .6, .6),
+    ("model", "draw_light_pole"),  # Dibuja el poste de luz
+
+    ("translate", 7, 0, 0),
+    ("scale", 1.5, 1.5, 1.5),
+    ("model", "draw_foliage5"),
+    ("model", "draw_trunk5"),
+
+    ("translate", -7, 0, 5.25),
+    ("scale", 1.75, 1.75, 1.75),
+    ("model", "draw_ground"),  # Dibuja el suelo
+    ("model", "draw_cube1"),  # Dibuja la base de la casa
+    ("model", "draw_roof1"),  # Dibuja el techo
+
+    ("scale", .75, .75, .75),
+    ("translate", 3, 0, -2),
+    ("model", "draw_foliage4"),
+    ("model", "draw_trunk4"),
+
+    ("translate", -3, 0, 5.25),
+    ("rotate", 90, 0, 1, 0),
+    ("model", "draw_ground"),  # Dibuja el suelo
+    ("model", "draw_rectangular_base"),  # Dibuja la base de la casa
+    ("model", "draw_door"),  # Dibuja la puerta
+    ("model", "draw_windows"),  # Dibuja las ventanas
+    ("model", "draw_prism_roof"),  # Dibuja el techo
+
+    ("translate", 2.5, 0, 3),
+    ("scale", .5, .5, .5),
+    ("model", "draw_foliage3"),
+    ("model", "draw_trunk3"),
+
+    ("translate", -5, 0, 0),
+    ("model", "draw_light_pole"),
+
+    ("translate", -3, 0, 0),
+    ("model", "draw_foliage2"),
+    ("model", "draw_trunk2"),
+
+    ("translate", -3.55, 0, -6),
+    ("scale", .5, .5, .5),
+    ("model", "draw_cube", 0, 0, 0, 5, 3, 5, (0.8, 0.5, 0.2)),  # Casa principal
+    ("model", "draw_roof", 0, 3, 0, 5),  # Techo
+    ("model", "draw_cube", -5, 0, 0, 3, 2, 5, (0.7, 0.7, 0.7)),  # Garaje
+    ("model", "draw_cube", 1.5, 5, 0, 0.5, 1.5, 0.5, (0.6, 0.6, 0.6)),  # Chimenea
+
+    ("translate", -15, 0, 0),
+    ("scale", 4, 4, 4),
+    ("model", "draw_foliage1"),
+    ("model", "draw_trunk1"),
+
+    ("translate", -5, 0, 4),
+    ("model", "draw_foliage2"),
+    ("model", "draw_trunk2"),
+
+    ("translate", 0, 0, -5),
+    ("model", "draw_foliage3"),
+    ("model", "draw_trunk3"),
+
+    ("translate", 2.5, 0, 0),
+    ("model", "draw_foliage4"),
+    ("model", "draw_trunk4"),
+
+    ("translate", 0, 0, 5),
+    ("model", "draw_foliage5"),
+    ("model", "draw_trunk5"),
+
+    ("translate", -5, 0, -4),
+    ("model", "draw_foliage1"),
+    ("model", "draw_trunk1"),
+
+    ("translate", -2, 0, 3),
+    ("model", "draw_foliage2"),
+    ("model", "draw_trunk2"),
+
+    ("translate", 0, 7, 0),
+    ("scale", 5, 3, 5),
+    ("model", "draw_cloud"),
+
+    ("translate", 7, 0, 10),
+    ("model", "draw_cloud"),
+
+    ("translate", -7, 0, 10),
+    ("model", "draw_cloud"),
+
+    ("translate", 7, 0, -5),
+    ("model", "draw_cloud"),
+]
+
+MODELS = {
+    "draw_base": draw_base,
+    "draw_board": draw_board,
+    "draw_cloud": draw_cloud,
+    "draw_cube": draw_cube,
+    "draw_cube1": draw_cube1,
+    "draw_cylinder": draw_cylinder,
+    "draw_door": draw_door,
+    "draw_foliage1": draw_foliage1,
+    "draw_foliage2": draw_foliage2,
+    "draw_foliage3": draw_foliage3,
+    "draw_foliage4": draw_foliage4,
+    "draw_foliage5": draw_foliage5,
+    "draw_ground": draw_ground,
+    "draw_hollow_cylinder": draw_hollow_cylinder,
+    "draw_hoop": draw_hoop,
+    "draw_large_windows": draw_large_windows,
+    "draw_light_pole": draw_light_pole,
+    "draw_prism_roof": draw_prism_roof,
+    "draw_railings": draw_railings,
+    "draw_rectangular_base": draw_rectangular_base,
+    "draw_roof": draw_roof,
+    "draw_roof1": draw_roof1,
+    "draw_second_floor": draw_second_floor,
+    "draw_snowman": draw_snowman,
+    "draw_terrace": draw_terrace,
+    "draw_trunk1": draw_trunk1,
+    "draw_trunk2": draw_trunk2,
+    "draw_trunk3": draw_trunk3,
+    "draw_trunk4": draw_trunk4,
+    "draw_trunk5": draw_trunk5,
+    "draw_windows": draw_windows,
+}
+
+# Generador de pueblos de prueba: N x N manzanas con los mismos modelos de TOWN
+
+BLOCK_SIZE = 16.0      # Lado de una manzana
+HOUSE_COLORS = [(0.8, 0.5, 0.2), (0.7, 0.7, 0.7), (0.9, 0.9, 0.6), (0.6, 0.3, 0.3)]
+HOUSE_TYPES = [
+    [("model", "draw_base"), ("model", "draw_large_windows"), ("model", "draw_second_floor"),
+     ("model", "draw_terrace"), ("model", "draw_railings")],
+    [("scale", 1.5, 1.5, 1.5), ("model", "draw_rectangular_base"), ("model", "draw_door"),
+     ("model", "draw_windows"), ("model", "draw_prism_roof")],
+    [("scale", 2, 2, 2), ("model", "draw_cube1"), ("model", "draw_roof1")],
+] + [[("model", "draw_cube", 0, 0, 0, 2, 1.5, 2, color), ("model", "draw_roof", 0, 1.5, 0, 2)]
+     for color in HOUSE_COLORS]
+TREE_TYPES = [[("model", f"draw_foliage{i}"), ("model", f"draw_trunk{i}")] for i in range(1, 6)]
+
+def generate_town(n, seed=0):
+    """Pasos de un pueblo de n x n manzanas: cuatro casas, árboles y un poste por manzana, y algunas nubes"""
+    rng = np.random.default_rng(seed)
+    half = n * BLOCK_SIZE / 2
+    steps = [("push",), ("scale", half / 20, 1, half / 20), ("model", "draw_ground"), ("pop",)]  # Suelo de 40 x 40
+    for i in range(n):
+        for j in range(n):
+            x, z = -half + (i + 0.5) * BLOCK_SIZE, -half + (j + 0.5) * BLOCK_SIZE
+            for dx, dz in ((-4, -4), (4, -4), (-4, 4), (4, 4)):
+                house = HOUSE_TYPES[rng.integers(len(HOUSE_TYPES))]
+                steps += [("push",), ("translate", x + dx, 0, z + dz), ("rotate", 90 * int(rng.integers(4)), 0, 1, 0),
+                          *house, ("pop",)]
+            for _ in range(rng.integers(1, 4)):
+                tree = TREE_TYPES[rng.integers(len(TREE_TYPES))]
+                tx, tz = rng.uniform(-1.5, 1.5, 2)
+                steps += [("push",), ("translate", x + tx, 0, z + tz), *tree, ("pop",)]
+            steps += [("push",), ("translate", x - BLOCK_SIZE / 2 - 2, 0, z - BLOCK_SIZE / 2 + 1),
+                      ("model", "draw_light_pole"), ("pop",)]
+            if rng.random() < 0.25:
+                steps += [("push",), ("translate", x, 20 + 5 * rng.random(), z), ("scale", 3, 3, 3),
+                          ("model", "draw_cloud"), ("pop",)]
+    return steps
+
+def apply_step(step, models=MODELS):
+    """Ejecuta un paso de TOWN con la pila de matrices de OpenGL"""
+    op, *args = step
+    if op == "translate":
+        glTranslatef(*args)
+    elif op == "scale":
+        glScaled(*args)
+    elif op == "rotate":
+        glRotated(*args)
+    elif op == "push":
+        glPushMatrix()
+    elif op == "pop":
+        glPopMatrix()
+    else:
+        models[args[0]](*args[1:])
 
-    
-    glTranslatef(-3,0,3.5)
-    draw_base()          # Dibuja la base
-    draw_large_windows() # Dibuja las ventanas grandes
-    draw_second_floor()  # Dibuja el segundo piso
-    draw_terrace()       # Dibuja la terraza
-    draw_railings()      # Dibuja las barandas
+def draw_town():
+    """Dibuja el pueblo completo en modo inmediato"""
+    glPushMatrix()
+    for step in TOWN:
+        apply_step(step)
+    glPopMatrix()
 
-    
-    glTranslatef(-3.5,0,-3)
-    draw_hollow_cylinder()  # Dibuja bote de basura
-    
-    glTranslatef(-1,0,5)
-    glScaled(.4,.5,.5)
-    
-    glTranslatef(-1,0,-9)
-    glRotated(180,0,1,0)
-    
-    glTranslatef(-10,0,20)
-    glScaled(2.5,2.5,2.5)
-    glRotated(180,0,1,0)
-    draw_ground()          # Dibuja el suelo
-    draw_rectangular_base()  # Dibuja la base de la casa
-    draw_door()            # Dibuja la puerta
-    draw_windows()         # Dibuja las ventanas
-    draw_prism_roof()      # Dibuja el techo
-    
-    glTranslatef(3,0,2)
-    glScaled(.5,.5,.5)
-    draw_foliage2()
-    draw_trunk2()
-    
-    glTranslatef(-12,0,0)
-    draw_foliage2()
-    draw_trunk2()
-    
-    glTranslatef(5,.5,-1)
-    glScaled(.4,.4,.4)
-    glRotated(180,0,1,0)
-    draw_snowman()
-    
-    glTranslatef(-17,-1,7)
-    draw_cube(0, 0, 0, 5, 3, 5, (0.8, 0.5, 0.2))  # Casa principal
-    draw_roof(0, 3, 0, 5)  # Techo
-    draw_cube(-5, 0, 0, 3, 2, 5, (0.7, 0.7, 0.7))  # Garaje
-    draw_cube(1.5, 5, 0, 0.5, 1.5, 0.5, (0.6, 0.6, 0.6))  # Chimenea
-    
-    glTranslatef(-15,0,-47)
-    glScaled(2.5,2.5,2.5)
-    draw_cube(0, 0, 0, 3, 2, 3, (0.8, 0.5, 0.2))  # Cubo base principal
-    draw_cube(4, 0, 0, 1, 2, 1, (0.7, 0.5, 0.3))  # Cubo adicional a la derecha
-    draw_cube(-4, 0, 0, 1, 2, 1, (0.7, 0.5, 0.3)) # Cubo adicional a la izquierda
-    draw_roof(0, 2, 0, 3)  # Techo más grande
-    
-    glTranslatef(2,0,17)
-    draw_foliage3()
-    draw_trunk3()
-    
-    glTranslatef(0,0,5)
-    draw_foliage4()
-    draw_trunk4()
-    
-    glTranslatef(-3,0,-7)
-    draw_light_pole()  # Dibuja el poste de luz
-    
-    glScaled(3,3,3)
-    glTranslatef(-3,0,-5)
-    draw_ground()  # Dibuja el suelo
-    draw_cube1()    # Dibuja la base de la casa
-    draw_roof1()    # Dibuja el techo
-    
-    glTranslatef(-2,0,2)
-    glScaled(.5,.5,.5)
-    draw_base()          # Dibuja la base
-    draw_large_windows() # Dibuja las ventanas grandes
-    draw_second_floor()  # Dibuja el segundo piso
-    draw_terrace()       # Dibuja la terraza
-    draw_railings()      # Dibuja las barandas
-    
-    glTranslatef(2.5,0,-1)
-    glScaled(.6,.6,.6)
-    draw_light_pole()  # Dibuja el poste de luz
-    
-    glTranslatef(7,0,0)
-    glScaled(1.5,1.5,1.5)
-    draw_foliage5()
-    draw_trunk5()
-    
-    glTranslatef(-7,0,5.25)
-    glScaled(1.75,1.75,1.75)
-    draw_ground()  # Dibuja el suelo
-    draw_cube1()    # Dibuja la base de la casa
-    draw_roof1()    # Dibuja el techo
-    
-    glScaled(.75,.75,.75)
-    glTranslatef(3,0,-2)
-    draw_foliage4()
-    draw_trunk4()
-    
-    glTranslatef(-3,0,5.25)
-    glRotated(90,0,1,0)
-    draw_ground()          # Dibuja el suelo
-    draw_rectangular_base()  # Dibuja la base de la casa
-    draw_door()            # Dibuja la puerta
-    draw_windows()         # Dibuja las ventanas
-    draw_prism_roof()      # Dibuja el techo
-    
-    glTranslatef(2.5,0,3)
-    glScaled(.5,.5,.5)
-    draw_foliage3()
-    draw_trunk3()
-    
-    glTranslatef(-5,0,0)
-    draw_light_pole() 
-    
-    glTranslatef(-3,0,0)
-    draw_foliage2()
-    draw_trunk2()
-    
-    glTranslatef(-3.55,0,-6)
-    glScaled(.5,.5,.5)
-    draw_cube(0, 0, 0, 5, 3, 5, (0.8, 0.5, 0.2))  # Casa principal
-    draw_roof(0, 3, 0, 5)  # Techo
-    draw_cube(-5, 0, 0, 3, 2, 5, (0.7, 0.7, 0.7))  # Garaje
-    draw_cube(1.5, 5, 0, 0.5, 1.5, 0.5, (0.6, 0.6, 0.6))  # Chimenea
-    
-    glTranslatef(-15,0,0)
-    glScaled(4,4,4)
-    draw_foliage1()
-    draw_trunk1()
-    
-    glTranslatef(-5,0,4)
-    draw_foliage2()
-    draw_trunk2()
-    
-    glTranslatef(0,0,-5)
-    draw_foliage3()
-    draw_trunk3()
-    
-    glTranslatef(2.5,0,0)
-    draw_foliage4()
-    draw_trunk4()
-    
-    glTranslatef(0,0,5)
-    draw_foliage5()
-    draw_trunk5()
-    
-    glTranslatef(-5,0,-4)
-    draw_foliage1()
-    draw_trunk1()
-    
-    glTranslatef(-2,0,3)
-    draw_foliage2()
-    draw_trunk2()
-    
-    #p6
-    glTranslatef(11,0,51)
-    glScaled(.85,.85,.85)
-    draw_foliage1()
-    draw_trunk1()
-    
-    glTranslatef(5,0,0)
-    draw_foliage1()
-    draw_trunk1()
+def compile_town():
+    """Graba el pueblo estático una sola vez en una display list"""
+    global town_list, forced_lod
+    town_list = glGenLists(1)
+    glNewList(town_list, GL_COMPILE)
+    forced_lod = 0  # La lista es fija: siempre con la teselación completa
+    draw_town()
+    forced_lod = None
+    glEndList()
+
+# Matrices 4x4 en NumPy (convención de OpenGL: vectores columna)
+
+def translation_matrix(x, y, z):
+    m = np.identity(4)
+    m[:3, 3] = (x, y, z)
+    return m
+
+def scale_matrix(x, y, z):
+    return np.diag([x, y, z, 1.0])
+
+def rotation_matrix(angle, x, y, z):
+    """Misma matriz que glRotate (ángulo en grados alrededor del eje x, y, z)"""
+    axis = np.array([x, y, z], dtype=float)
+    axis /= np.linalg.norm(axis)
+    c, s = math.cos(math.radians(angle)), math.sin(math.radians(angle))
+    cross = np.array([[0, -axis[2], axis[1]], [axis[2], 0, -axis[0]], [-axis[1], axis[0], 0]])
+    m = np.identity(4)
+    m[:3, :3] = c * np.identity(3) + s * cross + (1 - c) * np.outer(axis, axis)
+    return m
+
+def look_at_matrix(eye, target, up):
+    """Misma matriz que gluLookAt"""
+    eye = np.asarray(eye, dtype=float)
+    f = np.asarray(target, dtype=float) - eye
+    f /= np.linalg.norm(f)
+    side = np.cross(f, up)
+    side /= np.linalg.norm(side)
+    u = np.cross(side, f)
+    m = np.identity(4)
+    m[0, :3], m[1, :3], m[2, :3] = side, u, -f
+    return m @ translation_matrix(*-eye)
+
+def view_matrix():
+    """Matriz de vista del frame: cámara fija más rotación/traslación/escala globales"""
+    return (look_at_matrix(camera_eye, camera_target, camera_up)
+            @ translation_matrix(translation_x, translation_y, 0)
+            @ scale_matrix(scale_factor, scale_factor, scale_factor)
+            @ rotation_matrix(rotation_angle, 0, 1, 0))
+
+# Captura de geometría: ejecuta una función draw_* sin OpenGL y guarda lo que emitiría
+# como arreglos intercalados float32 (x, y, z, r, g, b, nx, ny, nz) por tipo de primitiva.
+
+VERTEX_FLOATS = 9
+VERTEX_STRIDE = VERTEX_FLOATS * 4  # Bytes por vértice
+
+capture_local = threading.local()  # state: la captura en curso en este hilo; level: su nivel de detalle
+capture_lock = threading.Lock()  # Protege capture_modules
+capture_modules = {}   # id(globales de un módulo) -> [capturas en curso, {nombre: función reemplazada}]
+
+def _capture_begin(mode):
+    capture_local.state["mode"] = mode
+    capture_local.state["vertices"] = []
+
+def _capture_vertex(x, y, z):
+    normal = capture_local.state["normal"] or (math.nan, math.nan, math.nan)  # Se calcula al final
+    capture_local.state["vertices"].append((x, y, z) + capture_local.state["color"] + normal)
+
+def _capture_color(r, g, b):
+    capture_local.state["color"] = (r, g, b)
+
+def _capture_normal(x, y, z):
+    capture_local.state["normal"] = (x, y, z)
+
+def _capture_push():
+    capture_local.state["stack"].append(capture_local.state["stack"][-1].copy())
+
+def _capture_pop():
+    capture_local.state["stack"].pop()
+
+def _capture_transform(matrix):
+    capture_local.state["stack"][-1] = capture_local.state["stack"][-1] @ matrix
+
+def _capture_emit(kind, vertices):
+    """Guarda vértices pasando posición y normal a las coordenadas del modelo"""
+    m = capture_local.state["stack"][-1]
+    vertices = np.array(vertices, dtype=float)
+    vertices[:, :3] = vertices[:, :3] @ m[:3, :3].T + m[:3, 3]
+    normals = vertices[:, 6:] @ np.linalg.inv(m[:3, :3])  # Inversa transpuesta
+    vertices[:, 6:] = normals / np.maximum(np.linalg.norm(normals, axis=1, keepdims=True), 1e-12)
+    capture_local.state[kind].append(vertices.astype(np.float32))
+
+def _fill_missing_normals(captured):
+    """Normal de cara (hacia fuera del centro del modelo) para lo dibujado sin glNormal"""
+    positions = np.concatenate([data[:, :3] for data in captured.values()])
+    center = (positions.min(axis=0) + positions.max(axis=0)) / 2
+    flat = 1e-3 * np.ptp(positions, axis=0).max()  # Caras casi en el plano del centro (suelos): hacia arriba
+    for kind, data in captured.items():
+        missing = np.isnan(data[:, 6])
+        if kind == "triangles" and missing.any():
+            tri = data.reshape(-1, 3, VERTEX_FLOATS)
+            normals = np.cross(tri[:, 1, :3] - tri[:, 0, :3], tri[:, 2, :3] - tri[:, 0, :3])
+            length = np.linalg.norm(normals, axis=1, keepdims=True)
+            normals = np.where(length > 1e-9, normals / np.maximum(length, 1e-9), (0.0, 1.0, 0.0))
+            offset = np.einsum("ij,ij->i", normals, tri[:, :, :3].mean(axis=1) - center)
+            outward = np.where(np.abs(offset) < flat, normals[:, 1] >= 0, offset >= 0)
+            normals[~outward] *= -1
+            face_missing = missing.reshape(-1, 3)[:, 0]
+            tri[face_missing, :, 6:] = normals[face_missing, None, :]
+        data[np.isnan(data[:, 6]), 6:] = (0.0, 1.0, 0.0)
+
+def _capture_end():
+    mode = capture_local.state["mode"]
+    v = np.array(capture_local.state["vertices"], dtype=float).reshape(-1, VERTEX_FLOATS)
+    if mode == GL_QUADS:
+        quads = v.reshape(-1, 4, VERTEX_FLOATS)
+        _capture_emit("triangles", quads[:, [0, 1, 2, 0, 2, 3]].reshape(-1, VERTEX_FLOATS))
+    elif mode == GL_QUAD_STRIP:
+        a, b, c, d = v[0:-2:2], v[1:-2:2], v[2::2], v[3::2]
+        _capture_emit("triangles", np.stack([a, b, c, c, b, d], axis=1).reshape(-1, VERTEX_FLOATS))
+    elif mode == GL_TRIANGLES:
+        _capture_emit("triangles", v)
+    elif mode == GL_LINES:
+        _capture_emit("lines", v)
+    else:
+        raise ValueError("Primitiva no soportada en la captura: %s" % mode)
+
+def _capture_mesh(mesh):
+    positions = mesh["vertices"][mesh["indices"]]
+    colors = np.broadcast_to(capture_local.state["color"], positions.shape)
+    _capture_emit("triangles", np.hstack([positions, colors, mesh["normals"][mesh["indices"]]]))
+
+CAPTURE_FUNCTIONS = {
+    "glBegin": _capture_begin,
+    "glEnd": _capture_end,
+    "glVertex3f": _capture_vertex,
+    "glColor3f": _capture_color,
+    "glNormal3f": _capture_normal,
+    "glPushMatrix": _capture_push,
+    "glPopMatrix": _capture_pop,
+    "glTranslatef": lambda x, y, z: _capture_transform(translation_matrix(x, y, z)),
+    "glTranslated": lambda x, y, z: _capture_transform(translation_matrix(x, y, z)),
+    "glScalef": lambda x, y, z: _capture_transform(scale_matrix(x, y, z)),
+    "glScaled": lambda x, y, z: _capture_transform(scale_matrix(x, y, z)),
+    "glRotatef": lambda a, x, y, z: _capture_transform(rotation_matrix(a, x, y, z)),
+    "glRotated": lambda a, x, y, z: _capture_transform(rotation_matrix(a, x, y, z)),
+    "gluNewQuadric": lambda: None,
+    "gluSphere": lambda q, r, sl, st: _capture_mesh(sphere_mesh(r, sl, st)),
+    "gluCylinder": lambda q, b, t, h, sl, st: _capture_mesh(cylinder_mesh(b, t, h, sl, st)),
+    "draw_mesh": _capture_mesh,
+}
+
+def _capture_dispatch(name, originals):
+    """Graba la llamada si este hilo está capturando; si no, la pasa a la función original"""
+    capture = CAPTURE_FUNCTIONS[name]
+
+    def dispatch(*args):
+        if getattr(capture_local, "state", None) is not None:
+            return capture(*args)
+        return originals[name](*args)
+    return dispatch
+
+def _install_capture(module):
+    with capture_lock:
+        entry = capture_modules.get(id(module))
+        if entry is None:
+            originals = {name: module[name] for name in CAPTURE_FUNCTIONS if name in module}
+            entry = capture_modules[id(module)] = [0, originals]
+            module.update({name: _capture_dispatch(name, originals) for name in originals})
+        entry[0] += 1
+
+def _remove_capture(module):
+    with capture_lock:
+        entry = capture_modules[id(module)]
+        entry[0] -= 1
+        if entry[0] == 0:
+            module.update(entry[1])
+            del capture_modules[id(module)]
+
+def module_function(module, name):
+    """Función name de los globales module, sin el despacho de una captura en curso"""
+    with capture_lock:
+        entry = capture_modules.get(id(module))
+        return entry[1][name] if entry and name in entry[1] else module[name]
+
+def set_module_function(module, name, function):
+    """Reemplaza una función de los globales module; con capturas en curso, la que usan los demás hilos"""
+    with capture_lock:
+        entry = capture_modules.get(id(module))
+        if entry and name in entry[1]:
+            entry[1][name] = function
+        else:
+            module[name] = function
+
+def capture_geometry(function, *args, level=0):
+    """Ejecuta function(*args) grabando su geometría (con el nivel de detalle dado) en lugar de enviarla a OpenGL.
+
+    Mientras dura, las llamadas de OpenGL del módulo de la función (y de este) pasan por un
+    despacho que sólo graba en el hilo que captura: los demás hilos siguen dibujando.
+    """
+    modules = list({id(g): g for g in (function.__globals__, globals())}.values())
+    capture_local.state = {"stack": [np.identity(4)], "color": (1.0, 1.0, 1.0), "normal": None,
+                           "triangles": [], "lines": []}
+    capture_local.level = level
+    for module in modules:
+        _install_capture(module)
+    try:
+        function(*args)
+    finally:
+        for module in modules:
+            _remove_capture(module)
+        state, capture_local.state = capture_local.state, None
+    captured = {kind: np.concatenate(state[kind]) for kind in ("triangles", "lines") if state[kind]}
+    if captured:
+        _fill_missing_normals(captured)
+    return captured
+
+# Iluminación horneada: luz direccional + ambiente (y oclusión ambiental opcional) calculadas una
+# vez en los colores de los vértices al armar el grafo, así se dibuja sin GL_LIGHTING. La luz
+# depende de la normal de mundo: las partes fusionadas y los lotes la hornean ya transformados,
+# los modelos instanciados la calculan en el shader y los nodos sueltos con GL_LIGHT0 (sun_light).
+
+def light_factors(normals):
+    """Luz de cada vértice según su normal (de mundo) con LIGHT_DIRECTION"""
+    direction = np.array(LIGHT_DIRECTION, dtype=float)
+    direction /= np.linalg.norm(direction)
+    return LIGHT_AMBIENT + LIGHT_DIFFUSE * np.maximum(normals @ direction, 0.0)
+
+def sun_light():
+    """GL_LIGHT0 con la misma luz que light_factors (con la vista cargada); el llamador guarda el estado"""
+    glLightModelfv(GL_LIGHT_MODEL_AMBIENT, (0.0, 0.0, 0.0, 1.0))
+    glLightfv(GL_LIGHT0, GL_POSITION, (*LIGHT_DIRECTION, 0.0))
+    glLightfv(GL_LIGHT0, GL_AMBIENT, (LIGHT_AMBIENT,) * 3 + (1.0,))
+    glLightfv(GL_LIGHT0, GL_DIFFUSE, (LIGHT_DIFFUSE,) * 3 + (1.0,))
+    glLightfv(GL_LIGHT0, GL_SPECULAR, (0.0, 0.0, 0.0, 1.0))
+    glColorMaterial(GL_FRONT_AND_BACK, GL_AMBIENT_AND_DIFFUSE)
+    glEnable(GL_COLOR_MATERIAL)
+    glEnable(GL_LIGHT0)
+    glEnable(GL_NORMALIZE)  # Las matrices de mundo tienen escala
+
+def ambient_occlusion(positions, normals, occluders):
+    """Oclusión (0 a 1) de cada punto por los triángulos del modelo, tomados como discos.
+
+    Cada triángulo tapa según su área y distancia y según cuánto queda frente a la
+    normal del punto (como la oclusión por discos de Bunnell, en un solo paso).
+    """
+    corners = occluders[:, :3].reshape(-1, 3, 3).astype(float)
+    stride = -(-len(corners) // AO_MAX_OCCLUDERS)  # Los vecinos de una teselación son parecidos
+    corners = corners[::stride]
+    centers = corners.mean(axis=1)
+    cross = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    areas = np.linalg.norm(cross, axis=1) / 2
+    disk_normals = cross / np.maximum(2 * areas, 1e-12)[:, None]
+    occlusion = np.zeros(len(positions))
+    step = max(1, 2 ** 20 // max(len(centers), 1))  # Puntos por bloque: matrices de ~1M pares
+    for start in range(0, len(positions), step):
+        v = centers[None] - positions[start:start + step, None]
+        d2 = np.einsum("pti,pti->pt", v, v) + 1e-9
+        v /= np.sqrt(d2)[..., None]
+        facing = np.clip(4 * np.einsum("pti,pi->pt", v, normals[start:start + step]), 0, 1)
+        emitter = np.abs(np.einsum("pti,ti->pt", v, disk_normals))
+        occlusion[start:start + step] = ((1 - 1 / np.sqrt(1 + stride * areas / (np.pi * d2))) * facing * emitter).sum(axis=1)
+    return np.minimum(occlusion, 1.0)
+
+def bake_occlusion(levels):
+    """Oscurece los triángulos de cada nivel según la oclusión del nivel más grueso del modelo"""
+    occluders = levels[-1].get("triangles")
+    if occluders is None:
+        return levels
+    shaded = {}
+    for baked in levels:
+        if id(baked) not in shaded and "triangles" in baked:
+            data = np.array(baked["triangles"], dtype=np.float32)
+            points, inverse = np.unique(data[:, [0, 1, 2, 6, 7, 8]], axis=0, return_inverse=True)
+            occlusion = ambient_occlusion(points[:, :3].astype(float), points[:, 3:].astype(float), occluders)
+            data[:, 3:6] *= (1 - AO_STRENGTH * occlusion[inverse.ravel()]).astype(np.float32)[:, None]
+            shaded[id(baked)] = {**baked, "triangles": data}
+    return [shaded.get(id(baked), baked) for baked in levels]
+
+# Grafo de escena plano: cada nodo es (modelo, matriz de mundo 4x4)
+
+PRIMITIVE_MODES = {"triangles": GL_TRIANGLES, "lines": GL_LINES}
+
+def evaluate_steps(steps):
+    """Recorre la cadena de transformaciones con NumPy y devuelve (claves de modelo, matrices de mundo)"""
+    matrix = np.identity(4)
+    stack, keys, worlds = [], [], []
+    for op, *args in steps:
+        if op == "translate":
+            matrix = matrix @ translation_matrix(*args)
+        elif op == "scale":
+            matrix = matrix @ scale_matrix(*args)
+        elif op == "rotate":
+            matrix = matrix @ rotation_matrix(*args)
+        elif op == "push":
+            stack.append(matrix)
+        elif op == "pop":
+            matrix = stack.pop()
+        else:
+            keys.append((args[0], tuple(args[1:])))
+            worlds.append(matrix)
+    return keys, np.array(worlds).reshape(-1, 4, 4)
+
+def upload_model(baked):
+    """Sube la geometría capturada de un modelo a VBOs: tipo -> (vbo, número de vértices)"""
+    buffers = {}
+    for kind, data in baked.items():
+        vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, vbo)
+        glBufferData(GL_ARRAY_BUFFER, data.nbytes, data, GL_STATIC_DRAW)
+        buffers[kind] = (vbo, len(data))
+    glBindBuffer(GL_ARRAY_BUFFER, 0)
+    return buffers
+
+def bounding_sphere(baked):
+    """Esfera envolvente (centro, radio) de la geometría capturada de un modelo"""
+    positions = np.concatenate([data[:, :3] for data in baked.values()]).astype(float)
+    center = (positions.min(axis=0) + positions.max(axis=0)) / 2
+    return center, float(np.linalg.norm(positions - center, axis=1).max())
+
+def bake_model(key, models=MODELS):
+    """Captura un modelo en todos sus niveles de detalle, sin OpenGL: (niveles, triángulos por nivel)"""
+    name, args = key
+    levels, triangles = [], []
+    for level in range(len(LOD_FACTORS)):
+        baked = capture_geometry(models[name], *args, level=level)
+        count = len(baked.get("triangles", ())) // 3
+        if level and count == triangles[0]:
+            baked = levels[0]  # Sin primitivas: mismo modelo
+        levels.append(baked)
+        triangles.append(count)
+    if use_baked_ao:
+        levels = bake_occlusion(levels)
+    return levels, triangles
+
+def add_model(key, levels, triangles, sphere=None):
+    """Sube a VBOs un modelo ya capturado; los niveles que son el mismo objeto comparten buffers"""
+    uploaded = {}
+    model_geometry[key], model_buffers[key] = levels, []
+    for baked in levels:
+        if id(baked) not in uploaded:
+            uploaded[id(baked)] = upload_model(baked)  # Sin luz: depende de la matriz de mundo
+        model_buffers[key].append(uploaded[id(baked)])
+    model_triangles[key] = triangles
+    model_spheres[key] = bounding_sphere(levels[0]) if sphere is None else sphere
+
+def load_model(key, models=MODELS):
+    """Captura un modelo y lo sube a VBOs (sólo la primera vez)"""
+    if key not in model_geometry:
+        add_model(key, *bake_model(key, models))
+
+def world_spheres(keys, worlds, spheres=None):
+    """Esferas envolventes (centros, radios) en coordenadas de mundo"""
+    spheres = model_spheres if spheres is None else spheres
+    centers = np.array([spheres[key][0] for key in keys]).reshape(-1, 3)
+    radii = np.array([spheres[key][1] for key in keys])
+    return (np.einsum("nij,nj->ni", worlds[:, :3, :3], centers) + worlds[:, :3, 3],
+            radii * np.linalg.norm(worlds[:, :3, :3], ord=2, axis=(1, 2)))
+
+def clear_scene_graph():
+    """Libera los VBOs y olvida los modelos capturados (otra escena puede usar los mismos nombres)"""
+    buffers = {vbo for levels in model_buffers.values() for level in levels for vbo, _ in level.values()}
+    buffers |= {vbo for vbo, _ in merged_buffers.values()}
+    if buffers:
+        glDeleteBuffers(len(buffers), np.array(sorted(buffers), dtype=np.uint32))
+    for cache in (model_geometry, model_buffers, model_spheres, model_triangles, merged_buffers,
+                  batch_cache, minimap_cache, instance_levels):
+        cache.clear()
+
+def build_scene_graph(steps=TOWN, models=MODELS):
+    """Evalúa la cadena una sola vez: captura cada modelo distinto y guarda las matrices de mundo"""
+    clear_scene_graph()
+    keys, worlds = evaluate_steps(steps)
+    for key in keys:
+        load_model(key, models)
+    set_scene(keys, worlds)
+
+def set_scene(keys, worlds, merged=None):
+    """Prepara el grafo para dibujar unos nodos cuyos modelos ya están cargados.
+
+    merged son las partes fusionadas ya calculadas (static_parts), por ejemplo en el hilo de armado.
+    """
+    global scene_keys, scene_worlds, scene_centers, scene_radii, scene_levels
+    global scene_tints, scene_key_list, scene_key_ids, scene_merged, scene_bvh, selected_node, minimap_center
+    scene_keys, scene_worlds = keys, worlds
+    minimap_center = None  # El minimapa se vuelve a dibujar con la escena nueva
+    scene_bvh, selected_node = None, None  # La BVH se arma al seleccionar por primera vez
+    pick_triangles.clear()
+    scene_key_list = list(dict.fromkeys(scene_keys))
+    key_index = {key: i for i, key in enumerate(scene_key_list)}
+    scene_key_ids = np.array([key_index[key] for key in scene_keys], dtype=int)
+    scene_levels = np.zeros(len(scene_keys), dtype=int)
+    scene_merged = np.zeros(len(scene_keys), dtype=bool)
+    scene_tints = np.ones((len(scene_keys), 3), dtype=np.float32)
+    scene_centers, scene_radii = world_spheres(scene_keys, scene_worlds)  # El pueblo es estático
+    if use_merged_parts:
+        merge_static_parts(merged)
+
+# Archivo de escena: JSON con los modelos y la matriz de mundo de cada nodo, y la geometría
+# capturada de todos los modelos en un solo .npy que se abre con memory map al iniciar
+
+SCENE_FORMAT = 1
+
+def saved_function(module, name):
+    """Valor de name en los globales module sin instrumentar: sin contadores de GL ni despacho de captura"""
+    if module is globals() and name in gl_originals:
+        return gl_originals[name]
+    return module_function(module, name)
+
+def code_digest(digest, functions):
+    """Agrega a digest el código de unas funciones y de lo que usan: otras funciones del módulo
+    (también por atributo, como town.solid_sphere), las de diccionarios como CAPTURE_FUNCTIONS
+    y las constantes (MAYÚSCULAS). Los comentarios, los textos del HUD, las opciones use_* (las
+    que cambian las mallas van aparte en scene_fingerprint) y la instrumentación no cuentan.
+    """
+    pending, seen = list(functions), set()
+    while pending:
+        function = pending.pop(0)
+        if function in seen:
+            continue
+        seen.add(function)
+        codes = [function.__code__]
+        while codes:
+            code = codes.pop(0)
+            digest.update(code.co_code + repr(code.co_names).encode())
+            for constant in code.co_consts:
+                if isinstance(constant, types.CodeType):
+                    codes.append(constant)  # Funciones anidadas y lambdas
+                else:
+                    digest.update(repr(constant).encode())
+            for name in code.co_names:
+                module = function.__globals__ if name in function.__globals__ else globals()
+                value = saved_function(module, name) if name in module else None
+                if isinstance(value, types.FunctionType):
+                    pending.append(value)
+                elif isinstance(value, dict):
+                    pending.extend(item for item in value.values() if isinstance(item, types.FunctionType))
+                elif name.isupper():
+                    digest.update(repr((name, value)).encode())
+
+def scene_fingerprint(steps, models, extra_keys=()):
+    """Huella de lo que cambia las mallas guardadas: pasos, modelos extra, niveles de detalle,
+    opciones de horneado y el código de los modelos y de la captura"""
+    occlusion = (AO_STRENGTH, AO_MAX_OCCLUDERS) if use_baked_ao else None  # La oclusión queda en las mallas
+    digest = hashlib.sha1(repr((SCENE_FORMAT, LOD_FACTORS, occlusion, steps, list(extra_keys))).encode())
+    code_digest(digest, [bake_model] + [models[name] for name in sorted(models)])
+    return digest.hexdigest()
+
+def as_tuple(value):
+    """Los argumentos vuelven del JSON como listas; las claves de modelo necesitan tuplas"""
+    return tuple(as_tuple(item) for item in value) if isinstance(value, list) else value
+
+def write_scene_file(path, fingerprint, keys, worlds, baked):
+    """Guarda nodos y modelos {clave: (niveles, triángulos, esfera)} en path.json y su .npy de mallas"""
+    mesh_path = os.path.splitext(path)[0] + ".npy"
+    chunks, offsets, offset = [], {}, 0
+    entries = []
+    for key, (levels, triangles, sphere) in baked.items():
+        entry = {"name": key[0], "args": key[1], "triangles": triangles,
+                 "sphere": [*map(float, sphere[0]), sphere[1]], "levels": []}
+        for level in levels:
+            ranges = {}
+            for kind, data in level.items():
+                if id(data) not in offsets:  # Niveles sin cambios comparten los mismos datos
+                    offsets[id(data)] = offset
+                    chunks.append(data)
+                    offset += len(data)
+                ranges[kind] = [offsets[id(data)], len(data)]
+            entry["levels"].append(ranges)
+        entries.append(entry)
+    model_index = {key: i for i, key in enumerate(baked)}
+    nodes = [{"model": model_index[key], "world": world.ravel().tolist()} for key, world in zip(keys, worlds)]
+    meshes = np.concatenate(chunks) if chunks else np.zeros((0, VERTEX_FLOATS), dtype=np.float32)
+    np.save(mesh_path, meshes.astype(np.float32))
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump({"format": SCENE_FORMAT, "fingerprint": fingerprint, "meshes": os.path.basename(mesh_path),
+                   "models": entries, "nodes": nodes}, file)
+
+def export_scene(path, fingerprint=""):
+    """Guarda el grafo actual y todos los modelos cargados (path.json y su .npy de mallas)"""
+    baked = {key: (model_geometry[key], model_triangles[key], model_spheres[key]) for key in model_geometry}
+    write_scene_file(path, fingerprint, scene_keys, scene_worlds, baked)
+
+def read_scene_file(path, fingerprint=None):
+    """(claves, matrices, modelos) de un archivo de escena, con las mallas abiertas con memory map.
+
+    Con fingerprint devuelve None si el archivo es de otra versión de la escena.
+    """
+    with open(path, encoding="utf-8") as file:
+        scene = json.load(file)
+    if fingerprint is not None and (scene.get("format") != SCENE_FORMAT or scene.get("fingerprint") != fingerprint):
+        return None
+    meshes = np.load(os.path.join(os.path.dirname(path), scene["meshes"]), mmap_mode="r")
+    keys, baked = [], {}
+    for entry in scene["models"]:
+        key = (entry["name"], as_tuple(entry["args"]))
+        shared, levels = {}, []
+        for ranges in entry["levels"]:
+            signature = tuple(sorted((kind, tuple(span)) for kind, span in ranges.items()))
+            if signature not in shared:  # Niveles iguales: el mismo objeto, así se suben una vez
+                shared[signature] = {kind: meshes[start:start + count] for kind, (start, count) in ranges.items()}
+            levels.append(shared[signature])
+        baked[key] = (levels, entry["triangles"], (np.array(entry["sphere"][:3]), entry["sphere"][3]))
+        keys.append(key)
+    node_keys = [keys[node["model"]] for node in scene["nodes"]]
+    worlds = np.array([node["world"] for node in scene["nodes"]], dtype=float).reshape(-1, 4, 4)
+    return node_keys, worlds, baked
+
+def load_baked(keys, worlds, baked):
+    """Sube modelos ya capturados y prepara el grafo con sus nodos"""
+    clear_scene_graph()
+    for key, model in baked.items():
+        add_model(key, *model)
+    set_scene(keys, worlds)
+
+def load_scene(path):
+    """Carga un archivo de escena: las mallas se abren con memory map y se suben directo a VBOs"""
+    load_baked(*read_scene_file(path))
+
+def open_scene(path, steps=TOWN, models=MODELS, extra_keys=()):
+    """Usa el archivo de escena si corresponde al código actual; si no, lo genera desde los draw_*"""
+    fingerprint = scene_fingerprint(steps, models, extra_keys)
+    try:
+        stored = read_scene_file(path, fingerprint)
+    except (OSError, ValueError):
+        stored = None
+    if stored is not None:
+        load_baked(*stored)
+        return
+    build_scene_graph(steps, models)
+    for key in extra_keys:
+        load_model(key, models)
+    export_scene(path, fingerprint)
+
+# Armado en segundo plano: un hilo captura los modelos (o los lee del archivo de escena) y los
+# manda por bake_queue; el hilo de OpenGL los sube de a poco y dibuja lo que ya llegó
+
+def send_nodes(output, keys, worlds):
+    """Manda al hilo de OpenGL los nodos de la escena con el índice de modelo de cada uno"""
+    key_list = list(dict.fromkeys(keys))
+    index = {key: i for i, key in enumerate(key_list)}
+    output.put(("nodos", list(keys), worlds, key_list, np.array([index[key] for key in keys], dtype=int)))
+
+def bake_scene(output, path, steps, models, extra_keys):
+    """Hilo de armado: el suelo (primer modelo de los pasos), luego todos los nodos, cada modelo y las partes fusionadas"""
+    try:
+        baked = {}
+        first = next((i for i, step in enumerate(steps) if step[0] == "model"), None)
+        if first is not None:  # Sólo el prefijo hasta el suelo: no depende del tamaño del pueblo
+            keys, worlds = evaluate_steps(steps[:first + 1])
+            levels, triangles = bake_model(keys[0], models)
+            baked[keys[0]] = (levels, triangles, bounding_sphere(levels[0]))
+            send_nodes(output, keys, worlds)
+            output.put(("modelo", keys[0], *baked[keys[0]]))
+        fingerprint = scene_fingerprint(steps, models, extra_keys)
+        try:
+            stored = read_scene_file(path, fingerprint) if path else None
+        except (OSError, ValueError):
+            stored = None
+        if stored is not None:
+            keys, worlds, stored_models = stored
+            send_nodes(output, keys, worlds)
+            for key, model in stored_models.items():
+                if key not in baked:
+                    output.put(("modelo", key, *model))
+            baked.update(stored_models)
+        else:
+            keys, worlds = evaluate_steps(steps)
+            send_nodes(output, keys, worlds)
+            for key in dict.fromkeys(list(keys) + list(extra_keys)):
+                if key not in baked:
+                    levels, triangles = bake_model(key, models)
+                    baked[key] = (levels, triangles, bounding_sphere(levels[0]))
+                    output.put(("modelo", key, *baked[key]))
+        output.put(("listo", static_parts(keys, worlds, baked) if use_merged_parts else None))
+        if path and stored is None:
+            write_scene_file(path, fingerprint, keys, worlds, baked)
+    except Exception as error:
+        output.put(("error", error))
+
+def start_scene_build(path=None, steps=TOWN, models=MODELS, extra_keys=()):
+    """Arma el grafo en un hilo; draw_scene sube y dibuja lo que va llegando"""
+    global bake_queue, scene_loading, scene_ready_ms
+    clear_scene_graph()
+    set_scene([], np.zeros((0, 4, 4)))
+    set_loading_nodes([], np.zeros((0, 4, 4)), [], np.zeros(0, dtype=int))
+    bake_queue = queue.Queue()  # Nueva cola: un hilo anterior que siga vivo escribe en la suya
+    scene_loading, scene_ready_ms = True, None
+    threading.Thread(target=bake_scene, args=(bake_queue, path, steps, models, extra_keys), daemon=True).start()
+
+def set_loading_nodes(keys, worlds, key_list, key_ids):
+    """Nodos de la escena en armado; los de modelos ya subidos quedan listos para dibujar"""
+    global loading_keys, loading_worlds, loading_key_list, loading_key_ids
+    global loading_ready, loading_centers, loading_radii, loading_levels
+    loading_keys, loading_worlds, loading_key_list, loading_key_ids = keys, worlds, key_list, key_ids
+    loading_ready, loading_levels = np.zeros(len(keys), dtype=bool), np.zeros(len(keys), dtype=int)
+    loading_centers, loading_radii = np.zeros((len(keys), 3)), np.zeros(len(keys))
+    loading_cache.clear()
+    for key in key_list:
+        if key in model_geometry:
+            mark_loaded(key)
+
+def mark_loaded(key):
+    """Marca listos los nodos de un modelo recién subido y calcula sus esferas para el recorte"""
+    nodes = np.flatnonzero(loading_key_ids == loading_key_list.index(key))
+    loading_centers[nodes], loading_radii[nodes] = world_spheres([key] * len(nodes), loading_worlds[nodes])
+    loading_ready[nodes] = True
+
+def receive_baked(budget_ms=UPLOAD_BUDGET_MS, wait=0.0):
+    """Sube lo que terminó el hilo de armado, hasta budget_ms por llamada; wait (s) espera el primer envío"""
+    global scene_loading, scene_dirty, scene_ready_ms
+    deadline = time.perf_counter() + budget_ms / 1000
+    while scene_loading:
+        try:
+            item = bake_queue.get(timeout=wait) if wait > 0 else bake_queue.get_nowait()
+        except queue.Empty:
+            break
+        wait = 0.0
+        kind, *data = item
+        if kind == "nodos":
+            set_loading_nodes(*data)
+        elif kind == "modelo":
+            key, levels, triangles, sphere = data
+            add_model(key, levels, triangles, sphere)
+            if key in loading_key_list:  # Las nubes animadas (extra_keys) no tienen nodos
+                mark_loaded(key)
+        elif kind == "listo":
+            set_scene(loading_keys, loading_worlds, data[0])
+            scene_loading = False
+            scene_ready_ms = (time.perf_counter() - clock_start) * 1000
+            print(f"Escena completa ({len(loading_keys)} objetos) en {scene_ready_ms:.0f} ms")
+        else:
+            scene_loading = False
+            raise data[0]
+        scene_dirty = True
+        if time.perf_counter() >= deadline:
+            break
 
-    
-    glTranslatef(-3,0,3.5)
-    draw_base()          # Dibuja la base
-    draw_large_windows() # Dibuja las ventanas grandes
-    draw_second_floor()  # Dibuja el segundo piso
-    draw_terrace()       # Dibuja la terraza
-    draw_railings()      # Dibuja las barandas
+def draw_loading_scene(view):
+    """Mientras se arma el grafo: los nodos que ya tienen modelo, con recorte y LOD"""
+    global drawn_nodes
+    visible = loading_ready.copy()
+    if use_frustum_culling:
+        visible &= spheres_visible(view, loading_centers, loading_radii)
+    indices = np.flatnonzero(visible)
+    if use_lod:
+        loading_levels[indices] = spheres_lod(view, loading_centers[indices], loading_radii[indices],
+                                              loading_levels[indices])
+    drawn_nodes = len(indices)
+    count_lod_savings([loading_keys[i] for i in indices], loading_levels[indices])
+    glLoadMatrixf(np.ascontiguousarray(view.T, dtype=np.float32))
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glEnableClientState(GL_COLOR_ARRAY)
+    glEnableClientState(GL_NORMAL_ARRAY)
+    if use_instancing:
+        draw_batches(loading_key_list, loading_key_ids[indices], loading_worlds[indices], loading_levels[indices],
+                     np.ones((len(indices), 3), dtype=np.float32), loading_cache)
+    else:
+        draw_nodes(view, [loading_keys[i] for i in indices], loading_worlds[indices], loading_levels[indices])
+    glBindBuffer(GL_ARRAY_BUFFER, 0)
+    glDisableClientState(GL_NORMAL_ARRAY)
+    glDisableClientState(GL_COLOR_ARRAY)
+    glDisableClientState(GL_VERTEX_ARRAY)
+    glLoadMatrixf(np.ascontiguousarray(view.T, dtype=np.float32))
+
+# Recorte por volumen de visión (frustum culling)
+
+def perspective_matrix(fov, aspect, near, far):
+    """Misma matriz que gluPerspective"""
+    f = 1.0 / math.tan(math.radians(fov) / 2)
+    return np.array([
+        [f / aspect, 0, 0, 0],
+        [0, f, 0, 0],
+        [0, 0, (far + near) / (near - far), 2 * far * near / (near - far)],
+        [0, 0, -1, 0],
+    ])
+
+def frustum_planes(clip):
+    """Los 6 planos (a, b, c, d) normalizados del volumen de visión de la matriz clip = P · V"""
+    planes = np.array([clip[3] + clip[0], clip[3] - clip[0],
+                       clip[3] + clip[1], clip[3] - clip[1],
+                       clip[3] + clip[2], clip[3] - clip[2]])
+    return planes / np.linalg.norm(planes[:, :3], axis=1, keepdims=True)
+
+def spheres_visible(view, centers, radii):
+    """Máscara de las esferas que tocan el volumen de visión"""
+    clip = perspective_matrix(fov_y, aspect_ratio, z_near, z_far) @ view
+    planes = frustum_planes(clip)
+    distances = centers @ planes[:, :3].T + planes[:, 3]
+    return np.all(distances > -radii[:, None], axis=1)
+
+def spheres_lod(view, centers, radii, levels):
+    """Nivel de cada esfera según su radio proyectado en pantalla"""
+    depth = centers @ view[2, :3] + view[2, 3]
+    distance = np.maximum(-depth, z_near)
+    pixel_scale = viewport_height / 2 / math.tan(math.radians(fov_y) / 2)
+    pixels = radii * np.linalg.norm(view[:3, :3], ord=2) / distance * pixel_scale
+    return lod_from_size(pixels, levels)
+
+# Dibujo de los modelos: un nodo a la vez, instanciado o en lotes
+
+def bind_model_arrays(vbo):
+    glBindBuffer(GL_ARRAY_BUFFER, vbo)
+    glVertexPointer(3, GL_FLOAT, VERTEX_STRIDE, ctypes.c_void_p(0))
+    glColorPointer(3, GL_FLOAT, VERTEX_STRIDE, ctypes.c_void_p(12))
+    glNormalPointer(GL_FLOAT, VERTEX_STRIDE, ctypes.c_void_p(24))
+
+def draw_model(buffers):
+    for kind, (vbo, count) in buffers.items():
+        bind_model_arrays(vbo)
+        if use_baked_lighting:  # Como light_factors: sólo los triángulos reciben el sol
+            (glEnable if kind == "triangles" else glDisable)(GL_LIGHTING)
+        glDrawArrays(PRIMITIVE_MODES[kind], 0, count)
+
+def count_lod_savings(keys, levels):
+    """Suma al conteo del frame los triángulos que ahorra dibujar cada modelo en el nivel elegido"""
+    global lod_triangles_saved
+    lod_triangles_saved += sum(model_triangles[key][0] - model_triangles[key][level] for key, level in zip(keys, levels))
+
+def draw_nodes(view, keys, worlds, levels):
+    """Un glLoadMatrixf(vista · mundo) y un glDrawArrays por primitiva para cada nodo"""
+    if use_baked_lighting:
+        glPushAttrib(GL_ENABLE_BIT | GL_LIGHTING_BIT)
+        glLoadMatrixf(np.ascontiguousarray(view.T, dtype=np.float32))  # Sol en coordenadas de mundo
+        sun_light()
+    modelviews = np.ascontiguousarray((view @ worlds).transpose(0, 2, 1), dtype=np.float32)
+    for key, modelview, level in zip(keys, modelviews, levels):
+        glLoadMatrixf(modelview)
+        draw_model(model_buffers[key][level])
+    if use_baked_lighting:
+        glPopAttrib()
+
+INSTANCE_VERTEX_SHADER = """
+#version 120
+attribute vec3 position;
+attribute vec3 color;
+attribute vec3 normal;
+attribute vec4 model0;  // Columnas de la matriz de mundo de la instancia
+attribute vec4 model1;
+attribute vec4 model2;
+attribute vec4 model3;
+attribute vec3 tint;
+uniform bool lighting;
+uniform bool sun;  // Luz de light_factors con la normal de mundo (use_baked_lighting)
+uniform vec3 sun_direction;
+uniform float sun_ambient;
+uniform float sun_diffuse;
+varying vec3 frag_color;
+
+void main() {
+    mat4 world = mat4(model0, model1, model2, model3);
+    gl_Position = gl_ModelViewProjectionMatrix * (world * vec4(position, 1.0));
+    frag_color = color * tint;
+    if (lighting) {
+        // GL_LIGHT0 direccional con GL_COLOR_MATERIAL, como en el pipeline fijo
+        vec3 n = normalize(gl_NormalMatrix * (mat3(world) * normal));
+        vec3 l = normalize(gl_LightSource[0].position.xyz);
+        frag_color *= gl_LightModel.ambient.rgb + gl_LightSource[0].ambient.rgb
+                      + max(dot(n, l), 0.0) * gl_LightSource[0].diffuse.rgb;
+    }
+    if (sun) {
+        // Cofactores de mat3(world): su inversa transpuesta por el determinante
+        mat3 m = mat3(world);
+        mat3 cofactors = mat3(cross(m[1], m[2]), cross(m[2], m[0]), cross(m[0], m[1]));
+        vec3 n = normalize(cofactors * normal) * sign(dot(m[0], cross(m[1], m[2])));
+        frag_color *= sun_ambient + sun_diffuse * max(dot(n, sun_direction), 0.0);
+    }
+}
+"""
+
+INSTANCE_FRAGMENT_SHADER = """
+#version 120
+varying vec3 frag_color;
+
+void main() {
+    gl_FragColor = vec4(frag_color, 1.0);
+}
+"""
+
+INSTANCE_ATTRIBUTES = ("position", "color", "normal", "model0", "model1", "model2", "model3", "tint")
+INSTANCE_FLOATS = 19  # Matriz 4x4 + tinte RGB por instancia
+
+def init_instancing():
+    """Compila el shader de instancias; devuelve False si el driver no soporta instancing"""
+    global instancing_supported, instance_program, instance_buffer
+    instancing_supported = False
+    if not (bool(glDrawArraysInstanced) and bool(glVertexAttribDivisor)):
+        return False
+    try:
+        instance_program = shaders.compileProgram(
+            shaders.compileShader(INSTANCE_VERTEX_SHADER, GL_VERTEX_SHADER),
+            shaders.compileShader(INSTANCE_FRAGMENT_SHADER, GL_FRAGMENT_SHADER))
+    except (RuntimeError, GLError) as error:
+        print("Instancing no disponible, se usan lotes de vertex arrays:", error)
+        return False
+    for name in INSTANCE_ATTRIBUTES:
+        instance_attributes[name] = glGetAttribLocation(instance_program, name)
+    instance_buffer = glGenBuffers(1)
+    instancing_supported = True
+    return True
+
+def group_instances(key_ids, levels):
+    """Agrupa los índices de los objetos por (modelo, nivel)"""
+    combined = key_ids * len(LOD_FACTORS) + levels
+    order = np.argsort(combined, kind="stable")
+    boundaries = np.flatnonzero(np.diff(combined[order])) + 1
+    for group in np.split(order, boundaries):
+        if len(group):
+            yield key_ids[group[0]], levels[group[0]], group
+
+def draw_instanced(buffers, worlds, tints):
+    """Todas las copias de un modelo con un glDrawArraysInstanced por primitiva"""
+    data = np.empty((len(worlds), INSTANCE_FLOATS), dtype=np.float32)
+    data[:, :16] = worlds.transpose(0, 2, 1).reshape(-1, 16)
+    data[:, 16:] = tints
+    glBindBuffer(GL_ARRAY_BUFFER, instance_buffer)
+    glBufferData(GL_ARRAY_BUFFER, data.nbytes, data, GL_STREAM_DRAW)
+    for i, name in enumerate(("model0", "model1", "model2", "model3", "tint")):
+        size = 3 if name == "tint" else 4
+        glVertexAttribPointer(instance_attributes[name], size, GL_FLOAT, GL_FALSE, INSTANCE_FLOATS * 4,
+                              ctypes.c_void_p(16 * i))
+    for kind, (vbo, count) in buffers.items():
+        glBindBuffer(GL_ARRAY_BUFFER, vbo)
+        for offset, name in ((0, "position"), (12, "color"), (24, "normal")):
+            glVertexAttribPointer(instance_attributes[name], 3, GL_FLOAT, GL_FALSE, VERTEX_STRIDE,
+                                  ctypes.c_void_p(offset))
+        glUniform1i(glGetUniformLocation(instance_program, "sun"), use_baked_lighting and kind == "triangles")
+        glDrawArraysInstanced(PRIMITIVE_MODES[kind], 0, count, len(worlds))
+
+def batched_vertices(baked, worlds, tints):
+    """Copias del modelo ya transformadas a coordenadas de mundo: tipo -> arreglo intercalado"""
+    rotations = worlds[:, :3, :3]
+    normal_matrices = np.linalg.inv(rotations)  # Inversa transpuesta (se usa por la derecha)
+    batch = {}
+    for kind, data in baked.items():
+        out = np.empty((len(worlds), len(data), VERTEX_FLOATS), dtype=np.float32)
+        out[..., :3] = np.einsum("vj,nij->nvi", data[:, :3], rotations) + worlds[:, None, :3, 3]
+        out[..., 3:6] = data[:, 3:6] * tints[:, None, :]
+        normals = np.einsum("vj,nji->nvi", data[:, 6:], normal_matrices)
+        out[..., 6:] = normals / np.maximum(np.linalg.norm(normals, axis=-1, keepdims=True), 1e-12)
+        if use_baked_lighting and kind == "triangles":  # Ya en coordenadas de mundo: luz exacta por copia
+            out[..., 3:6] *= light_factors(out[..., 6:]).astype(np.float32)[..., None]
+        batch[kind] = out.reshape(-1, VERTEX_FLOATS)
+    return batch
+
+def draw_vertex_arrays(arrays):
+    """Dibuja arreglos intercalados desde memoria del cliente, un glDrawArrays por primitiva"""
+    glBindBuffer(GL_ARRAY_BUFFER, 0)
+    for kind, data in arrays.items():
+        base = data.ctypes.data
+        glVertexPointer(3, GL_FLOAT, VERTEX_STRIDE, ctypes.c_void_p(base))
+        glColorPointer(3, GL_FLOAT, VERTEX_STRIDE, ctypes.c_void_p(base + 12))
+        glNormalPointer(GL_FLOAT, VERTEX_STRIDE, ctypes.c_void_p(base + 24))
+        glDrawArrays(PRIMITIVE_MODES[kind], 0, len(data))
+
+def draw_batches(key_list, key_ids, worlds, levels, tints, cache=None):
+    """Dibuja objetos agrupados por (modelo, nivel), con la vista ya cargada en GL_MODELVIEW.
+
+    Con instancing cada grupo es una sola llamada; si no hay soporte, todas las
+    copias se transforman con NumPy y se juntan en un arreglo por primitiva.
+    """
+    if instancing_supported is None:
+        init_instancing()
+    groups = list(group_instances(key_ids, levels))
+    if instancing_supported:
+        glUseProgram(instance_program)
+        glUniform1i(glGetUniformLocation(instance_program, "lighting"), glIsEnabled(GL_LIGHTING))
+        direction = np.array(LIGHT_DIRECTION, dtype=float)
+        glUniform3f(glGetUniformLocation(instance_program, "sun_direction"), *direction / np.linalg.norm(direction))
+        glUniform1f(glGetUniformLocation(instance_program, "sun_ambient"), LIGHT_AMBIENT)
+        glUniform1f(glGetUniformLocation(instance_program, "sun_diffuse"), LIGHT_DIFFUSE)
+        for name in INSTANCE_ATTRIBUTES:
+            glEnableVertexAttribArray(instance_attributes[name])
+            glVertexAttribDivisor(instance_attributes[name], 1 if name.startswith(("model", "tint")) else 0)
+        for key_id, level, group in groups:
+            draw_instanced(model_buffers[key_list[key_id]][level], worlds[group], tints[group])
+        for name in INSTANCE_ATTRIBUTES:
+            glVertexAttribDivisor(instance_attributes[name], 0)
+            glDisableVertexAttribArray(instance_attributes[name])
+        glUseProgram(0)
+        return
+    signature = (key_ids.tobytes(), levels.tobytes(), worlds.tobytes(), tints.tobytes())
+    if cache is not None and cache.get("signature") == signature:
+        arrays = cache["arrays"]  # Mismos objetos (modelo, nivel, matriz y tinte) que el frame anterior
+    else:
+        parts = {}
+        for key_id, level, group in groups:
+            batch = batched_vertices(model_geometry[key_list[key_id]][level], worlds[group], tints[group])
+            for kind, data in batch.items():
+                parts.setdefault(kind, []).append(data)
+        arrays = {kind: np.concatenate(data) for kind, data in parts.items()}
+        if cache is not None:
+            cache.update(signature=signature, arrays=arrays)
+    draw_vertex_arrays(arrays)
+
+# Partes estáticas fusionadas: los modelos sin niveles de detalle (casas, suelo, tableros)
+# se pasan a coordenadas de mundo y se juntan en un VBO por tipo de primitiva.
+
+def static_parts(keys, worlds, baked):
+    """Partes fusionadas de unos nodos con modelos {clave: (niveles, triángulos, esfera)}, sin OpenGL"""
+    centers, radii = world_spheres(keys, worlds, {key: model[2] for key, model in baked.items()})
+    return merged_arrays(keys, worlds, centers, radii, {key: model[0][0] for key, model in baked.items()},
+                         {key: model[1] for key, model in baked.items()})
+
+def merged_arrays(keys, worlds, node_centers, node_radii, geometry, triangles):
+    """Vértices de mundo de los nodos sin LOD, agrupados por celdas del pueblo.
+
+    Devuelve (máscara de nodos fusionados, tipo -> vértices, firsts, counts, centros, radios, nodos por celda).
+    """
+    merged = np.array([len(set(triangles[key])) == 1 for key in keys], dtype=bool)
+    nodes = np.flatnonzero(merged)
+    cells = np.floor(node_centers[nodes][:, [0, 2]] / MERGE_CELL_SIZE).astype(int)
+    _, cell_ids = np.unique(cells, axis=0, return_inverse=True)
+    cell_ids = cell_ids.ravel()
+    chunks = [nodes[cell_ids == cell] for cell in range(cell_ids.max() + 1)] if len(nodes) else []
+
+    parts = {kind: [] for kind in PRIMITIVE_MODES}
+    firsts = {kind: [] for kind in PRIMITIVE_MODES}
+    counts = {kind: [] for kind in PRIMITIVE_MODES}
+    centers, radii = [], []
+    white = np.ones((1, 3), dtype=np.float32)
+    for chunk in chunks:
+        for kind in PRIMITIVE_MODES:
+            arrays = [batched_vertices({kind: geometry[keys[i]][kind]}, worlds[i:i + 1], white)[kind]
+                      for i in chunk if kind in geometry[keys[i]]]
+            firsts[kind].append(sum(len(a) for a in parts[kind]))
+            counts[kind].append(sum(len(a) for a in arrays))
+            parts[kind] += arrays
+        low = (node_centers[chunk] - node_radii[chunk, None]).min(axis=0)
+        high = (node_centers[chunk] + node_radii[chunk, None]).max(axis=0)
+        center = (low + high) / 2
+        centers.append(center)
+        radii.append((np.linalg.norm(node_centers[chunk] - center, axis=1) + node_radii[chunk]).max())
+    return (merged, {kind: np.concatenate(data) for kind, data in parts.items() if data}, firsts, counts,
+            np.array(centers).reshape(-1, 3), np.array(radii), np.array([len(chunk) for chunk in chunks], dtype=int))
+
+def merge_static_parts(merged=None):
+    """Sube a VBOs las partes sin LOD del grafo (merged_arrays), calculadas aquí si no vienen hechas"""
+    global scene_merged, merged_buffers, merged_firsts, merged_counts
+    global merged_centers, merged_radii, merged_node_counts
+    if merged is None:
+        merged = merged_arrays(scene_keys, scene_worlds, scene_centers, scene_radii,
+                               {key: model_geometry[key][0] for key in scene_key_list}, model_triangles)
+    scene_merged, arrays, firsts, counts, merged_centers, merged_radii, merged_node_counts = merged
+    merged_buffers = upload_model(arrays)
+    merged_firsts = {kind: np.array(firsts[kind], dtype=np.int32) for kind in merged_buffers}
+    merged_counts = {kind: np.array(counts[kind], dtype=np.int32) for kind in merged_buffers}
+
+def draw_merged_parts(view, visible=None):
+    """Un glMultiDrawArrays por tipo de primitiva con las celdas visibles; devuelve los nodos dibujados.
+
+    visible son las celdas ya elegidas por quien llama (el minimapa); si no, las que ve la cámara.
+    """
+    if visible is None and use_frustum_culling:
+        visible = spheres_visible(view, merged_centers, merged_radii)
+    elif visible is None:
+        visible = np.ones(len(merged_radii), dtype=bool)
+    for kind, (vbo, _) in merged_buffers.items():
+        selected = visible & (merged_counts[kind] > 0)
+        if selected.any():
+            bind_model_arrays(vbo)
+            glMultiDrawArrays(PRIMITIVE_MODES[kind], merged_firsts[kind][selected], merged_counts[kind][selected],
+                              int(selected.sum()))
+    return int(merged_node_counts[visible].sum())
+
+def draw_scene_graph(view):
+    """Dibuja los nodos visibles del grafo, instanciados o uno por uno (use_instancing)"""
+    global drawn_nodes
+    if use_frustum_culling:
+        indices = np.flatnonzero(spheres_visible(view, scene_centers, scene_radii) & ~scene_merged)
+    else:
+        indices = np.flatnonzero(~scene_merged)
+    drawn_nodes = len(indices)
+    if use_lod:
+        scene_levels[indices] = spheres_lod(view, scene_centers[indices], scene_radii[indices], scene_levels[indices])
+    count_lod_savings([scene_keys[i] for i in indices], scene_levels[indices])
+    glLoadMatrixf(np.ascontiguousarray(view.T, dtype=np.float32))
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glEnableClientState(GL_COLOR_ARRAY)
+    glEnableClientState(GL_NORMAL_ARRAY)
+    if scene_merged.any():
+        drawn_nodes += draw_merged_parts(view)
+    if use_instancing:
+        draw_batches(scene_key_list, scene_key_ids[indices], scene_worlds[indices], scene_levels[indices],
+                     scene_tints[indices], batch_cache)
+    else:
+        draw_nodes(view, [scene_keys[i] for i in indices], scene_worlds[indices], scene_levels[indices])
+    glBindBuffer(GL_ARRAY_BUFFER, 0)
+    glDisableClientState(GL_NORMAL_ARRAY)
+    glDisableClientState(GL_COLOR_ARRAY)
+    glDisableClientState(GL_VERTEX_ARRAY)
+    glLoadMatrixf(np.ascontiguousarray(view.T, dtype=np.float32))  # Deja cargada la vista
+
+def draw_instances(view, key, worlds, tints=None):
+    """Dibuja muchas copias de un modelo (por ejemplo animadas) con recorte y nivel de detalle"""
+    worlds = np.asarray(worlds, dtype=float).reshape(-1, 4, 4)
+    tints = np.ones((len(worlds), 3), dtype=np.float32) if tints is None else np.asarray(tints, dtype=np.float32)
+    centers, radii = world_spheres([key] * len(worlds), worlds)
+    visible = spheres_visible(view, centers, radii) if use_frustum_culling else np.ones(len(worlds), dtype=bool)
+    levels = instance_levels.get(key)
+    if levels is None or len(levels) != len(worlds):
+        levels = instance_levels[key] = np.zeros(len(worlds), dtype=int)
+    if use_lod:
+        levels[visible] = spheres_lod(view, centers[visible], radii[visible], levels[visible])
+    count_lod_savings([key] * int(visible.sum()), levels[visible])
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glEnableClientState(GL_COLOR_ARRAY)
+    glEnableClientState(GL_NORMAL_ARRAY)
+    draw_batches([key], np.zeros(visible.sum(), dtype=int), worlds[visible], levels[visible], tints[visible])
+    glBindBuffer(GL_ARRAY_BUFFER, 0)
+    glDisableClientState(GL_NORMAL_ARRAY)
+    glDisableClientState(GL_COLOR_ARRAY)
+    glDisableClientState(GL_VERTEX_ARRAY)
+
+# Selección de objetos: rayo desde la pantalla contra una jerarquía de cajas (BVH) sobre
+# las cajas de mundo de los nodos, y prueba exacta contra los triángulos del modelo
+
+def scene_boxes(keys, worlds):
+    """Cajas alineadas a los ejes (mínimo, máximo) de cada nodo en coordenadas de mundo"""
+    local = {}
+    for key in dict.fromkeys(keys):
+        positions = np.concatenate([data[:, :3] for data in model_geometry[key][0].values()])
+        local[key] = (positions.min(axis=0), positions.max(axis=0))
+    low = np.array([local[key][0] for key in keys]).reshape(-1, 3)
+    high = np.array([local[key][1] for key in keys]).reshape(-1, 3)
+    corners = np.stack([np.where(np.array(mask, dtype=bool), high, low)
+                        for mask in np.ndindex(2, 2, 2)], axis=1)  # (N, 8, 3)
+    world_corners = np.einsum("nij,nkj->nki", worlds[:, :3, :3], corners) + worlds[:, None, :3, 3]
+    return world_corners.min(axis=1), world_corners.max(axis=1), local
+
+def build_bvh(low, high, leaf_size=BVH_LEAF_SIZE):
+    """BVH por mediana del eje más largo; nodos en listas planas para recorrerlos rápido en Python"""
+    centers = (low + high) / 2
+    order = np.arange(len(low))
+    bvh = {"low": [], "high": [], "left": [], "right": [], "items": []}
+
+    def add_node():
+        for field in bvh.values():
+            field.append(None)
+        return len(bvh["low"]) - 1
+
+    stack = [(add_node(), 0, len(order))] if len(order) else []
+    while stack:
+        node, start, end = stack.pop()
+        items = order[start:end]
+        bvh["low"][node] = low[items].min(axis=0).tolist()  # Floats de Python: más rápidos que escalares de NumPy
+        bvh["high"][node] = high[items].max(axis=0).tolist()
+        if end - start <= leaf_size:
+            bvh["items"][node] = items.tolist()
+            continue
+        axis = int(np.argmax(np.ptp(centers[items], axis=0)))
+        order[start:end] = items[np.argsort(centers[items, axis], kind="stable")]
+        middle = (start + end) // 2
+        bvh["left"][node], bvh["right"][node] = add_node(), add_node()
+        stack += [(bvh["left"][node], start, middle), (bvh["right"][node], middle, end)]
+    return bvh
+
+def ray_box(origin, inverse, low, high):
+    """Distancia de entrada del rayo a la caja (método de las losas), o None"""
+    near, far = 0.0, math.inf
+    for axis in range(3):
+        t1 = (low[axis] - origin[axis]) * inverse[axis]
+        t2 = (high[axis] - origin[axis]) * inverse[axis]
+        if t1 > t2:
+            t1, t2 = t2, t1
+        if t1 > near:
+            near = t1
+        if t2 < far:
+            far = t2
+        if near > far:
+            return None
+    return near
+
+def cross_matrix(vector):
+    """Matriz M tal que rows @ M es el producto cruz vector × fila para cada fila"""
+    x, y, z = vector
+    return np.array([[0.0, z, -y], [-z, 0.0, x], [y, -x, 0.0]])
+
+def ray_triangles(origin, direction, triangles):
+    """Distancia al triángulo más cercano (Möller–Trumbore con NumPy), o None"""
+    v0, edge1, edge2, v0_cross_edge1 = triangles
+    p = edge2 @ cross_matrix(direction)
+    determinant = np.einsum("ij,ij->i", edge1, p)
+    valid = np.abs(determinant) > 1e-12
+    inverse = np.where(valid, 1.0 / np.where(valid, determinant, 1.0), 0.0)
+    u = (p @ origin - np.einsum("ij,ij->i", v0, p)) * inverse
+    q = edge1 @ cross_matrix(origin) - v0_cross_edge1  # (origen - v0) × arista1
+    v = (q @ direction) * inverse
+    t = np.einsum("ij,ij->i", edge2, q) * inverse
+    hit = valid & (u >= 0) & (v >= 0) & (u + v <= 1) & (t > 0)
+    return float(t[hit].min()) if hit.any() else None
+
+def model_triangles_for_picking(key):
+    """(v0, arista1, arista2, v0 × arista1) del nivel más grueso del modelo, guardados por modelo"""
+    if key not in pick_triangles:
+        triangles = model_geometry[key][-1].get("triangles")  # Misma silueta con menos triángulos
+        if triangles is None or len(triangles) == 0:
+            pick_triangles[key] = None
+        else:
+            corners = np.asarray(triangles[:, :3], dtype=float).reshape(-1, 3, 3)
+            v0, edge1, edge2 = corners[:, 0], corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0]
+            pick_triangles[key] = (v0, edge1, edge2, np.cross(v0, edge1))
+    return pick_triangles[key]
+
+def build_picking():
+    """Arma la BVH del grafo actual (la primera vez que se selecciona algo)"""
+    global scene_bvh, scene_inverse_worlds, scene_box_low, scene_box_high, scene_box_list, model_boxes
+    scene_box_low, scene_box_high, model_boxes = scene_boxes(scene_keys, scene_worlds)
+    scene_box_list = list(zip(scene_box_low.tolist(), scene_box_high.tolist()))
+    scene_inverse_worlds = np.linalg.inv(scene_worlds)
+    scene_bvh = build_bvh(scene_box_low, scene_box_high)
+
+def node_hit(node, origin, direction):
+    """Distancia del rayo a la geometría del nodo (t en las mismas unidades que el rayo de mundo)"""
+    triangles = model_triangles_for_picking(scene_keys[node])
+    if triangles is None:
+        return 0.0  # Modelo sólo de líneas: basta con la caja
+    inverse = scene_inverse_worlds[node]
+    return ray_triangles(inverse[:3, :3] @ origin + inverse[:3, 3], inverse[:3, :3] @ direction, triangles)
+
+def ray_cast(origin, direction):
+    """Nodo más cercano que toca el rayo (origen + t · dirección), o None"""
+    if scene_bvh is None:
+        build_picking()
+    if not scene_bvh["low"]:
+        return None
+    origin, direction = np.asarray(origin, dtype=float), np.asarray(direction, dtype=float)
+    start = origin.tolist()
+    inverse = [1.0 / d if d != 0 else math.inf for d in direction.tolist()]
+    bvh, boxes, best, best_node = scene_bvh, scene_box_list, math.inf, None
+    stack = [(0, ray_box(start, inverse, bvh["low"][0], bvh["high"][0]))]
+    while stack:
+        node, entry = stack.pop()
+        if entry is None or entry >= best:
+            continue
+        items = bvh["items"][node]
+        if items is not None:
+            for item in items:
+                box = ray_box(start, inverse, *boxes[item])
+                if box is None or box >= best:
+                    continue
+                t = node_hit(item, origin, direction)
+                if t is not None and max(t, box) < best:
+                    best, best_node = max(t, box), item
+            continue
+        children = [(child, ray_box(start, inverse, bvh["low"][child], bvh["high"][child]))
+                    for child in (bvh["left"][node], bvh["right"][node])]
+        children.sort(key=lambda child: math.inf if child[1] is None else child[1], reverse=True)
+        stack += children  # El hijo más cercano queda arriba de la pila
+    return best_node
+
+def screen_ray(x, y, width, height, view=None):
+    """Rayo de mundo (origen en el plano cercano, dirección hasta el lejano) por el píxel (x, y)"""
+    view = view_matrix() if view is None else view
+    inverse = np.linalg.inv(perspective_matrix(fov_y, aspect_ratio, z_near, z_far) @ view)
+    ndc_x, ndc_y = 2 * x / width - 1, 1 - 2 * y / height
+    near = inverse @ (ndc_x, ndc_y, -1, 1)
+    far = inverse @ (ndc_x, ndc_y, 1, 1)
+    near, far = near[:3] / near[3], far[:3] / far[3]
+    return near, far - near
+
+def pick(x, y, width, height, view=None):
+    """Nodo del grafo bajo el píxel (x, y) de una ventana de width x height, o None"""
+    if not len(scene_keys):
+        return None
+    return ray_cast(*screen_ray(x, y, width, height, view))
+
+def select_normalized(u, v, view=None):
+    """Selecciona lo que hay bajo (u, v) en [0, 1] (cursor o punta del dedo); devuelve el nodo"""
+    global selected_node, scene_dirty
+    selected_node = pick(u, v, 1.0, 1.0, view)
+    scene_dirty = True
+    return selected_node
+
+def mouse_button_callback(window, button, action, mods):
+    """Clic izquierdo: selecciona el objeto bajo el cursor"""
+    if button == glfw.MOUSE_BUTTON_LEFT and action == glfw.PRESS and render_mode == "scene_graph":
+        x, y = glfw.get_cursor_pos(window)
+        width, height = glfw.get_window_size(window)
+        select_normalized(x / width, y / height)
+
+def draw_selection(view):
+    """Caja de alambre amarilla alrededor del objeto seleccionado"""
+    if selected_node is None or scene_bvh is None:
+        return
+    low, high = model_boxes[scene_keys[selected_node]]
+    corners = [np.where(np.array(mask, dtype=bool), high, low) for mask in np.ndindex(2, 2, 2)]
+    glPushAttrib(GL_ENABLE_BIT | GL_LINE_BIT | GL_CURRENT_BIT)
+    glDisable(GL_LIGHTING)
+    glLineWidth(2)
+    glColor3f(1.0, 1.0, 0.0)
+    glLoadMatrixf(np.ascontiguousarray((view @ scene_worlds[selected_node]).T, dtype=np.float32))
+    glBegin(GL_LINES)
+    for a in range(8):
+        for axis in range(3):
+            b = a | (4 >> axis)  # Vecino en el eje: cambia un bit del índice (x, y, z)
+            if b != a:
+                glVertex3f(*corners[a])
+                glVertex3f(*corners[b])
+    glEnd()
+    glLoadMatrixf(np.ascontiguousarray(view.T, dtype=np.float32))
+    glPopAttrib()
+
+# Minimapa: vista cenital del pueblo en la esquina superior izquierda. La imagen se dibuja
+# con el nivel de detalle más grueso, se copia a una textura y sólo se vuelve a dibujar
+# cuando el punto mirado se aleja; cada frame se pega la textura y encima la cámara.
+
+def gaze_point(view):
+    """(ojo, punto mirado) en coordenadas de mundo: las transformaciones globales mueven el pueblo, no la cámara"""
+    inverse = np.linalg.inv(view)
+    target = look_at_matrix(camera_eye, camera_target, camera_up) @ (*camera_target, 1.0)
+    return inverse[:3, 3], (inverse @ target)[:3]
+
+def minimap_view(center):
+    """Vista cenital centrada en el punto (x, z), con -z (el norte) hacia arriba"""
+    x, z = center
+    return look_at_matrix((x, MINIMAP_HEIGHT, z), (x, 0.0, z), (0.0, 0.0, -1.0))
+
+def draw_minimap_scene(center, size):
+    """El pueblo visto desde arriba: nodos dentro del área, nivel MINIMAP_LEVEL y sin los de menos de un píxel"""
+    glLoadMatrixf(np.ascontiguousarray(minimap_view(center).T, dtype=np.float32))
+    if render_mode == "display_list":
+        glCallList(town_list)
+        return
 
-    
-    glTranslatef(-3.5,0,-3)
-    draw_hollow_cylinder()  # Dibuja bote de basura
-    
-    glTranslatef(-1,0,5)
-    glScaled(.4,.5,.5)
-    
-    glTranslatef(-1,0,-9)
-    glRotated(180,0,1,0)
-    
-    glTranslatef(-10,0,20)
-    glScaled(2.5,2.5,2.5)
-    glRotated(180,0,1,0)
-    draw_ground()          # Dibuja el suelo
-    draw_rectangular_base()  # Dibuja la base de la casa
-    draw_door()            # Dibuja la puerta
-    draw_windows()         # Dibuja las ventanas
-    draw_prism_roof()      # Dibuja el techo
-    
-    glTranslatef(3,0,2)
-    glScaled(.5,.5,.5)
-    draw_foliage2()
-    draw_trunk2()
-    
-    glTranslatef(-12,0,0)
-    draw_foliage2()
-    draw_trunk2()
-    
-    glTranslatef(5,.5,-1)
-    glScaled(.4,.4,.4)
-    glRotated(180,0,1,0)
-    draw_snowman()
-    
-    glTranslatef(-17,-1,7)
-    draw_cube(0, 0, 0, 5, 3, 5, (0.8, 0.5, 0.2))  # Casa principal
-    draw_roof(0, 3, 0, 5)  # Techo
-    draw_cube(-5, 0, 0, 3, 2, 5, (0.7, 0.7, 0.7))  # Garaje
-    draw_cube(1.5, 5, 0, 0.5, 1.5, 0.5, (0.6, 0.6, 0.6))  # Chimenea
-    
-    glTranslatef(-15,0,-47)
-    glScaled(2.5,2.5,2.5)
-    draw_cube(0, 0, 0, 3, 2, 3, (0.8, 0.5, 0.2))  # Cubo base principal
-    draw_cube(4, 0, 0, 1, 2, 1, (0.7, 0.5, 0.3))  # Cubo adicional a la derecha
-    draw_cube(-4, 0, 0, 1, 2, 1, (0.7, 0.5, 0.3)) # Cubo adicional a la izquierda
-    draw_roof(0, 2, 0, 3)  # Techo más grande
-    
-    glTranslatef(2,0,17)
-    draw_foliage3()
-    draw_trunk3()
-    
-    glTranslatef(0,0,5)
-    draw_foliage4()
-    draw_trunk4()
-    
-    glTranslatef(-3,0,-7)
-    draw_light_pole()  # Dibuja el poste de luz
-    
-    glScaled(3,3,3)
-    glTranslatef(-3,0,-5)
-    draw_ground()  # Dibuja el suelo
-    draw_cube1()    # Dibuja la base de la casa
-    draw_roof1()    # Dibuja el techo
-    
-    glTranslatef(-2,0,2)
-    glScaled(.5,.5,.5)
-    draw_base()          # Dibuja la base
-    draw_large_windows() # Dibuja las ventanas grandes
-    draw_second_floor()  # Dibuja el segundo piso
-    draw_terrace()       # Dibuja la terraza
-    draw_railings()      # Dibuja las barandas
-    
-    glTranslatef(2.5,0,-1)
-    glScaled(.6,.6,.6)
-    draw_light_pole()  # Dibuja el poste de luz
-    
-    glTranslatef(7,0,0)
-    glScaled(1.5,1.5,1.5)
-    draw_foliage5()
-    draw_trunk5()
-    
-    glTranslatef(-7,0,5.25)
-    glScaled(1.75,1.75,1.75)
-    draw_ground()  # Dibuja el suelo
-    draw_cube1()    # Dibuja la base de la casa
-    draw_roof1()    # Dibuja el techo
-    
-    glScaled(.75,.75,.75)
-    glTranslatef(3,0,-2)
-    draw_foliage4()
-    draw_trunk4()
-    
-    glTranslatef(-3,0,5.25)
-    glRotated(90,0,1,0)
-    draw_ground()          # Dibuja el suelo
-    draw_rectangular_base()  # Dibuja la base de la casa
-    draw_door()            # Dibuja la puerta
-    draw_windows()         # Dibuja las ventanas
-    draw_prism_roof()      # Dibuja el techo
-    
-    glTranslatef(2.5,0,3)
-    glScaled(.5,.5,.5)
-    draw_foliage3()
-    draw_trunk3()
-    
-    glTranslatef(-5,0,0)
-    draw_light_pole() 
-    
-    glTranslatef(-3,0,0)
-    draw_foliage2()
-    draw_trunk2()
-    
-    glTranslatef(-3.55,0,-6)
-    glScaled(.5,.5,.5)
-    draw_cube(0, 0, 0, 5, 3, 5, (0.8, 0.5, 0.2))  # Casa principal
-    draw_roof(0, 3, 0, 5)  # Techo
-    draw_cube(-5, 0, 0, 3, 2, 5, (0.7, 0.7, 0.7))  # Garaje
-    draw_cube(1.5, 5, 0, 0.5, 1.5, 0.5, (0.6, 0.6, 0.6))  # Chimenea
-    
-    glTranslatef(-15,0,0)
-    glScaled(4,4,4)
-    draw_foliage1()
-    draw_trunk1()
-    
-    glTranslatef(-5,0,4)
-    draw_foliage2()
-    draw_trunk2()
-    
-    glTranslatef(0,0,-5)
-    draw_foliage3()
-    draw_trunk3()
-    
-    glTranslatef(2.5,0,0)
-    draw_foliage4()
-    draw_trunk4()
-    
-    glTranslatef(0,0,5)
-    draw_foliage5()
-    draw_trunk5()
-    
-    glTranslatef(-5,0,-4)
-    draw_foliage1()
-    draw_trunk1()
-    
-    glTranslatef(-2,0,3)
-    draw_foliage2()
-    draw_trunk2()
-    
-    #p7
-    glTranslatef(20,0,65)
-    glScaled(.95,.95,.95)
-    draw_foliage1()
-    draw_trunk1()
-    
-    glTranslatef(5,0,0)
-    draw_foliage1()
-    draw_trunk1()
+    def inside(centers, radii):
+        return np.all(np.abs(centers[:, [0, 2]] - center) < MINIMAP_RANGE + radii[:, None], axis=1)
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glEnableClientState(GL_COLOR_ARRAY)
+    glEnableClientState(GL_NORMAL_ARRAY)
+    if scene_merged.any():
+        draw_merged_parts(None, inside(merged_centers, merged_radii))
+    pixel = 2 * MINIMAP_RANGE / size
+    indices = np.flatnonzero(inside(scene_centers, scene_radii) & ~scene_merged
+                             & (scene_radii >= MINIMAP_MIN_PIXELS * pixel))
+    draw_batches(scene_key_list, scene_key_ids[indices], scene_worlds[indices],
+                 np.full(len(indices), MINIMAP_LEVEL), scene_tints[indices], minimap_cache)
+    glBindBuffer(GL_ARRAY_BUFFER, 0)
+    glDisableClientState(GL_NORMAL_ARRAY)
+    glDisableClientState(GL_COLOR_ARRAY)
+    glDisableClientState(GL_VERTEX_ARRAY)
+
+def refresh_minimap(center, x, y, size):
+    """Dibuja el minimapa en su rincón del búfer y lo copia a minimap_texture"""
+    global minimap_texture
+    glPushAttrib(GL_VIEWPORT_BIT | GL_SCISSOR_BIT | GL_COLOR_BUFFER_BIT)
+    glViewport(x, y, size, size)
+    glScissor(x, y, size, size)
+    glEnable(GL_SCISSOR_TEST)
+    glClearColor(0.15, 0.2, 0.15, 1.0)
+    glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+    glMatrixMode(GL_PROJECTION)
+    glPushMatrix()
+    glLoadIdentity()
+    glOrtho(-MINIMAP_RANGE, MINIMAP_RANGE, -MINIMAP_RANGE, MINIMAP_RANGE, 1.0, 2 * MINIMAP_HEIGHT)
+    glMatrixMode(GL_MODELVIEW)
+    draw_minimap_scene(center, size)
+    glMatrixMode(GL_PROJECTION)
+    glPopMatrix()
+    glMatrixMode(GL_MODELVIEW)
+    if not minimap_texture:
+        minimap_texture = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, minimap_texture)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+    glBindTexture(GL_TEXTURE_2D, minimap_texture)
+    glCopyTexImage2D(GL_TEXTURE_2D, 0, GL_RGB, x, y, size, size, 0)
+    glBindTexture(GL_TEXTURE_2D, 0)
+    glPopAttrib()
+
+def overlay_minimap(eye, target, x, y, size):
+    """Pega la última imagen del minimapa y dibuja encima la cámara y lo que abarca su vista"""
+    to_map = lambda point: np.array([point[0] - minimap_center[0], minimap_center[1] - point[2]]) / MINIMAP_RANGE
+    camera, gaze = to_map(eye), to_map(target)
+    glPushAttrib(GL_VIEWPORT_BIT | GL_ENABLE_BIT | GL_CURRENT_BIT | GL_LINE_BIT)
+    glViewport(x, y, size, size)
+    glDisable(GL_DEPTH_TEST)
+    glDisable(GL_LIGHTING)
+    glMatrixMode(GL_PROJECTION)
+    glPushMatrix()
+    glLoadIdentity()
+    glMatrixMode(GL_MODELVIEW)
+    glLoadIdentity()  # Coordenadas del minimapa: de -1 a 1
+    glEnable(GL_TEXTURE_2D)
+    glBindTexture(GL_TEXTURE_2D, minimap_texture)
+    glColor3f(1.0, 1.0, 1.0)
+    glBegin(GL_QUADS)
+    for u, v in ((0, 0), (1, 0), (1, 1), (0, 1)):
+        glTexCoord2f(u, v)
+        glVertex2f(2 * u - 1, 2 * v - 1)
+    glEnd()
+    glBindTexture(GL_TEXTURE_2D, 0)
+    glDisable(GL_TEXTURE_2D)
+
+    glLineWidth(2)
+    glColor3f(1.0, 1.0, 0.0)
+    heading = gaze - camera
+    if np.linalg.norm(heading) > 1e-6:  # Con la cámara justo encima no hay dirección
+        heading /= np.linalg.norm(heading)
+        half = math.atan(math.tan(math.radians(fov_y) / 2) * aspect_ratio)  # Media apertura horizontal
+        length = 2 + np.linalg.norm(camera)  # Hasta el otro lado del mapa aunque la cámara esté fuera
+        glBegin(GL_LINES)
+        for angle in (-half, half):
+            cos, sin = math.cos(angle), math.sin(angle)
+            glVertex2f(*camera)
+            glVertex2f(*(camera + length * np.array([cos * heading[0] - sin * heading[1],
+                                                     sin * heading[0] + cos * heading[1]])))
+        glEnd()
+    glPointSize(6)
+    glBegin(GL_POINTS)
+    glVertex2f(*np.clip(camera, -0.95, 0.95))  # Fuera del área, la cámara queda en el borde
+    glColor3f(1.0, 0.3, 0.0)
+    glVertex2f(*gaze)
+    glEnd()
+    glColor3f(1.0, 1.0, 1.0)
+    glBegin(GL_LINE_LOOP)
+    for corner in ((-1, -1), (1, -1), (1, 1), (-1, 1)):
+        glVertex2f(*corner)
+    glEnd()
+    glMatrixMode(GL_PROJECTION)
+    glPopMatrix()
+    glMatrixMode(GL_MODELVIEW)
+    glPopAttrib()
+
+def minimap_credit_now():
+    """Crédito del minimapa (ms) acumulado hasta ahora, sin pasar de MINIMAP_BURST_MS"""
+    global minimap_credit, minimap_credit_time
+    now = time.perf_counter()
+    if minimap_credit_time is not None:
+        period = 1.0 / TARGET_FPS if TARGET_FPS > 0 else 1.0 / 60
+        minimap_credit = min(minimap_credit + MINIMAP_BUDGET_MS * (now - minimap_credit_time) / period,
+                             MINIMAP_BURST_MS)
+    minimap_credit_time = now
+    return minimap_credit
+
+def spend_minimap_credit(milliseconds):
+    global minimap_credit
+    minimap_credit = minimap_credit_now() - milliseconds
+
+def draw_minimap():
+    """Minimapa del frame: se redibuja si el punto mirado se alejó y queda crédito de tiempo, si no se reutiliza.
+
+    El crédito crece con el tiempo, MINIMAP_BUDGET_MS por periodo de frame (también con la
+    escena quieta), y cada redibujado descuenta lo que tardó (tiempo de CPU), así que en
+    promedio el minimapa no pasa del presupuesto.
+    """
+    global minimap_center, minimap_size, minimap_refreshes, minimap_pending
+    if not show_minimap or scene_loading or render_mode == "immediate" or (render_mode == "display_list"
+                                                                           and not town_list):
+        minimap_pending = False
+        return
+    start = time.perf_counter()
+    view = view_matrix()
+    eye, target = gaze_point(view)
+    center = target[[0, 2]]
+    size = max(1, int(viewport_height * MINIMAP_FRACTION))
+    x, y = 10, viewport_height - size - 10
+    moved = minimap_center is not None and np.abs(center - minimap_center).max() > MINIMAP_REFRESH * MINIMAP_RANGE
+    minimap_pending = moved or size != minimap_size
+    if minimap_center is None or (minimap_pending and minimap_credit_now() > 0):
+        refresh_start = time.perf_counter()
+        refresh_minimap(center, x, y, size)
+        minimap_center, minimap_size, minimap_pending = center, size, False
+        spend_minimap_credit((time.perf_counter() - refresh_start) * 1000)
+        minimap_refreshes += 1
+        record_stage("minimapa_redibujo", refresh_start)
+    overlay_minimap(eye, target, x, y, size)
+    glLoadMatrixf(np.ascontiguousarray(view.T, dtype=np.float32))  # Deja cargada la vista
+    record_stage("minimapa", start)
+
+# Estadísticas por etapa: tiempos en ms y llamadas de dibujo, con HUD y exportación a CSV
+
+GL_COUNTERS = {
+    "glDrawArrays": "dibujos", "glDrawElements": "dibujos", "glMultiDrawArrays": "dibujos",
+    "glDrawArraysInstanced": "dibujos", "glCallList": "dibujos", "glBegin": "dibujos",
+    "glVertex3f": "glVertex", "glVertex3fv": "glVertex",
+    "gluSphere": "cuadricas", "gluCylinder": "cuadricas", "draw_mesh": "cuadricas",
+}
+
+def record_sample(stage, value):
+    with stats_lock:
+        samples = stage_samples.get(stage)
+        if samples is None:
+            samples = stage_samples[stage] = deque(maxlen=STATS_HISTORY)
+        samples.append(value)
+
+def record_stage(stage, start):
+    """Guarda los ms transcurridos desde start (time.perf_counter) en la etapa"""
+    if use_frame_stats:
+        record_sample(stage, (time.perf_counter() - start) * 1000)
+
+def stage_percentiles(samples=STATS_WINDOW):
+    """Etapa -> (p50, p95, p99) de las últimas muestras"""
+    with stats_lock:
+        recent = {stage: list(values)[-samples:] for stage, values in stage_samples.items() if values}
+    return {stage: tuple(np.percentile(values, [50, 95, 99])) for stage, values in recent.items()}
+
+def install_gl_counters():
+    """Reemplaza las funciones de dibujo del módulo por versiones que cuentan sus llamadas"""
+    module = globals()
+    for name, counter in GL_COUNTERS.items():
+        if name in gl_originals:
+            continue
+        original = gl_originals[name] = module_function(module, name)
+
+        def counted(*args, _original=original, _counter=counter):
+            gl_counts[_counter] += 1
+            return _original(*args)
+        set_module_function(module, name, counted)
+
+def remove_gl_counters():
+    for name, original in gl_originals.items():
+        set_module_function(globals(), name, original)
+    gl_originals.clear()
+
+def enable_frame_stats():
+    """Activa la medición de etapas y los contadores de GL (el HUD no tiene nada que mostrar sin ellos)"""
+    global use_frame_stats
+    if not use_frame_stats:
+        use_frame_stats = True
+        install_gl_counters()
+
+def export_frame_stats(path):
+    """Resumen de cada etapa (muestras, media y percentiles sobre todo el historial) en CSV"""
+    with stats_lock:
+        history = {stage: list(values) for stage, values in stage_samples.items() if values}
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["etapa", "muestras", "media", "p50", "p95", "p99"])
+        for stage, values in history.items():
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            writer.writerow([stage, len(values), f"{np.mean(values):.3f}", f"{p50:.3f}", f"{p95:.3f}", f"{p99:.3f}"])
+
+def draw_hud():
+    """Dibuja las estadísticas en la esquina inferior izquierda: texto de cv2 pasado con glDrawPixels"""
+    rows = [("etapa", "p50", "p95", "p99")]
+    rows += [(stage, *(f"{value:.1f}" for value in values)) for stage, values in stage_percentiles().items()]
+    image = np.zeros((16 * len(rows) + 8, 340, 3), dtype=np.uint8)
+    for i, row in enumerate(rows):
+        for x, text in zip((6, 170, 226, 282), row):  # Columnas fijas: la fuente no es monoespaciada
+            cv2.putText(image, text, (x, 18 + 16 * i), cv2.FONT_HERSHEY_PLAIN, 1.0, (255, 255, 0), 1)
+    glPushAttrib(GL_ENABLE_BIT)
+    glDisable(GL_DEPTH_TEST)
+    glDisable(GL_LIGHTING)
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+    glWindowPos2i(10, 10)
+    glDrawPixels(image.shape[1], image.shape[0], GL_RGB, GL_UNSIGNED_BYTE, np.ascontiguousarray(image[::-1]))
+    glPopAttrib()
 
-    
-    glTranslatef(-3,0,3.5)
-    draw_base()          # Dibuja la base
-    draw_large_windows() # Dibuja las ventanas grandes
-    draw_second_floor()  # Dibuja el segundo piso
-    draw_terrace()       # Dibuja la terraza
-    draw_railings()      # Dibuja las barandas
+# Función principal de la escena
+def draw_scene():
+    global rotation_angle, translation_x, translation_y, scale_factor, lod_triangles_saved
+    start = time.perf_counter()
+    for counter in gl_counts:
+        gl_counts[counter] = 0
+    lod_triangles_saved = 0  # Lo suman los caminos de dibujo del frame
+    glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
 
-    
-    glTranslatef(-3.5,0,-3)
-    draw_hollow_cylinder()  # Dibuja bote de basura
-    
-    glTranslatef(-1,0,5)
-    glScaled(.4,.5,.5)
-    
-    glTranslatef(-1,0,-9)
-    glRotated(180,0,1,0)
-    
-    glTranslatef(-10,0,20)
-    glScaled(2.5,2.5,2.5)
-    glRotated(180,0,1,0)
-    draw_ground()          # Dibuja el suelo
-    draw_rectangular_base()  # Dibuja la base de la casa
-    draw_door()            # Dibuja la puerta
-    draw_windows()         # Dibuja las ventanas
-    draw_prism_roof()      # Dibuja el techo
-    
-    glTranslatef(3,0,2)
-    glScaled(.5,.5,.5)
-    draw_foliage2()
-    draw_trunk2()
-    
-    glTranslatef(-12,0,0)
-    draw_foliage2()
-    draw_trunk2()
-    
-    glTranslatef(5,.5,-1)
-    glScaled(.4,.4,.4)
-    glRotated(180,0,1,0)
-    draw_snowman()
-    
-    glTranslatef(-17,-1,7)
-    draw_cube(0, 0, 0, 5, 3, 5, (0.8, 0.5, 0.2))  # Casa principal
-    draw_roof(0, 3, 0, 5)  # Techo
-    draw_cube(-5, 0, 0, 3, 2, 5, (0.7, 0.7, 0.7))  # Garaje
-    draw_cube(1.5, 5, 0, 0.5, 1.5, 0.5, (0.6, 0.6, 0.6))  # Chimenea
-    
-    glTranslatef(-15,0,-47)
-    glScaled(2.5,2.5,2.5)
-    draw_cube(0, 0, 0, 3, 2, 3, (0.8, 0.5, 0.2))  # Cubo base principal
-    draw_cube(4, 0, 0, 1, 2, 1, (0.7, 0.5, 0.3))  # Cubo adicional a la derecha
-    draw_cube(-4, 0, 0, 1, 2, 1, (0.7, 0.5, 0.3)) # Cubo adicional a la izquierda
-    draw_roof(0, 2, 0, 3)  # Techo más grande
-    
-    glTranslatef(2,0,17)
-    draw_foliage3()
-    draw_trunk3()
-    
-    glTranslatef(0,0,5)
-    draw_foliage4()
-    draw_trunk4()
-    
-    glTranslatef(-3,0,-7)
-    draw_light_pole()  # Dibuja el poste de luz
-    
-    glScaled(3,3,3)
-    glTranslatef(-3,0,-5)
-    draw_ground()  # Dibuja el suelo
-    draw_cube1()    # Dibuja la base de la casa
-    draw_roof1()    # Dibuja el techo
-    
-    glTranslatef(-2,0,2)
-    glScaled(.5,.5,.5)
-    draw_base()          # Dibuja la base
-    draw_large_windows() # Dibuja las ventanas grandes
-    draw_second_floor()  # Dibuja el segundo piso
-    draw_terrace()       # Dibuja la terraza
-    draw_railings()      # Dibuja las barandas
-    
-    glTranslatef(2.5,0,-1)
-    glScaled(.6,.6,.6)
-    draw_light_pole()  # Dibuja el poste de luz
-    
-    glTranslatef(7,0,0)
-    glScaled(1.5,1.5,1.5)
-    draw_foliage5()
-    draw_trunk5()
-    
-    glTranslatef(-7,0,5.25)
-    glScaled(1.75,1.75,1.75)
-    draw_ground()  # Dibuja el suelo
-    draw_cube1()    # Dibuja la base de la casa
-    draw_roof1()    # Dibuja el techo
-    
-    glScaled(.75,.75,.75)
-    glTranslatef(3,0,-2)
-    draw_foliage4()
-    draw_trunk4()
-    
-    glTranslatef(-3,0,5.25)
-    glRotated(90,0,1,0)
-    draw_ground()          # Dibuja el suelo
-    draw_rectangular_base()  # Dibuja la base de la casa
-    draw_door()            # Dibuja la puerta
-    draw_windows()         # Dibuja las ventanas
-    draw_prism_roof()      # Dibuja el techo
-    
-    glTranslatef(2.5,0,3)
-    glScaled(.5,.5,.5)
-    draw_foliage3()
-    draw_trunk3()
-    
-    glTranslatef(-5,0,0)
-    draw_light_pole() 
-    
-    glTranslatef(-3,0,0)
-    draw_foliage2()
-    draw_trunk2()
-    
-    glTranslatef(-3.55,0,-6)
-    glScaled(.5,.5,.5)
-    draw_cube(0, 0, 0, 5, 3, 5, (0.8, 0.5, 0.2))  # Casa principal
-    draw_roof(0, 3, 0, 5)  # Techo
-    draw_cube(-5, 0, 0, 3, 2, 5, (0.7, 0.7, 0.7))  # Garaje
-    draw_cube(1.5, 5, 0, 0.5, 1.5, 0.5, (0.6, 0.6, 0.6))  # Chimenea
-    
-    glTranslatef(-15,0,0)
-    glScaled(4,4,4)
-    draw_foliage1()
-    draw_trunk1()
-    
-    glTranslatef(-5,0,4)
-    draw_foliage2()
-    draw_trunk2()
-    
-    glTranslatef(0,0,-5)
-    draw_foliage3()
-    draw_trunk3()
-    
-    glTranslatef(2.5,0,0)
-    draw_foliage4()
-    draw_trunk4()
-    
-    glTranslatef(0,0,5)
-    draw_foliage5()
-    draw_trunk5()
-    
-    glTranslatef(-5,0,-4)
-    draw_foliage1()
-    draw_trunk1()
-    
-    glTranslatef(-2,0,3)
-    draw_foliage2()
-    draw_trunk2()
-    
-    glTranslatef(0,7,0)
-    glScaled(5,3,5)
-    draw_cloud()
-    
-    glTranslatef(7,0,10)
-    draw_cloud()
-    
-    glTranslatef(-7,0,10)
-    draw_cloud()
-    
-    glTranslatef(7,0,-5)
-    draw_cloud()
-    
-    glfw.swap_buffers(window)
+    if render_mode == "scene_graph":
+        view = view_matrix()
+        if scene_loading:
+            receive_baked()
+        if scene_loading:
+            draw_loading_scene(view)
+        else:
+            draw_scene_graph(view)
+            draw_selection(view)
+    else:
+        glLoadIdentity()
+        gluLookAt(*camera_eye, *camera_target, *camera_up)
+
+        glTranslatef(translation_x, translation_y, 0)
+        glScalef(scale_factor, scale_factor, scale_factor)
+        glRotatef(rotation_angle, 0, 1, 0)
+
+        if render_mode == "display_list" and town_list:
+            glCallList(town_list)  # Una sola llamada por frame
+        else:
+            begin_lod_frame()
+            draw_town()
+
+    record_stage("draw_scene", start)
+    draw_minimap()
+    if use_frame_stats:
+        for counter, count in gl_counts.items():
+            record_sample(counter, count)
+    if show_hud:
+        draw_hud()
+    if window is not None:  # Sin ventana (render fuera de pantalla) no hay nada que intercambiar
+        start = time.perf_counter()
+        glfw.swap_buffers(window)
+        record_stage("swap_buffers", start)
+        if first_frame_ms is None:
+            report_first_frame()
+
+def report_first_frame():
+    """Imprime el tiempo hasta el primer frame (desde que se cargó el módulo) contra su presupuesto"""
+    global first_frame_ms
+    first_frame_ms = (time.perf_counter() - clock_start) * 1000
+    over = " (supera el presupuesto de %.0f ms)" % FIRST_FRAME_BUDGET_MS if first_frame_ms > FIRST_FRAME_BUDGET_MS else ""
+    print(f"Primer frame en {first_frame_ms:.0f} ms{over}")
+
+# Ritmo de frames: FPS objetivo, vsync opcional y espera hasta el plazo de cada frame
+
+def steady_time():
+    """Segundos desde que se cargó el módulo con un reloj monótono (para las animaciones)"""
+    return time.perf_counter() - clock_start
+
+def set_swap_interval():
+    """Aplica use_vsync a la ventana con el contexto actual"""
+    glfw.swap_interval(1 if use_vsync else 0)
+
+def pace_frame(drawn=True):
+    """Duerme hasta el plazo del frame según TARGET_FPS y cuenta los plazos perdidos.
+
+    Si en esta vuelta no se dibujó nada el ritmo se reinicia: la espera ociosa no es un plazo perdido.
+    """
+    global frame_deadline
+    if not drawn or TARGET_FPS <= 0:
+        frame_deadline = None
+        return
+    period = 1.0 / TARGET_FPS
+    now = time.perf_counter()
+    if frame_deadline is None:
+        frame_deadline = now
+    frame_pacing["frames"] += 1
+    late = now - frame_deadline
+    if late > 0:  # Se perdió el plazo: se sigue desde ahora, sin intentar recuperar frames
+        frame_pacing["perdidos"] += 1
+        frame_pacing["peor_ms"] = max(frame_pacing["peor_ms"], late * 1000)
+        if use_frame_stats:
+            record_sample("retraso_frame", late * 1000)
+        frame_deadline = now + period
+        return
+    if frame_deadline - now > FRAME_SPIN:
+        time.sleep(frame_deadline - now - FRAME_SPIN)
+    while time.perf_counter() < frame_deadline:
+        pass
+    record_stage("espera_frame", now)
+    frame_deadline += period
+
+def pacing_summary():
+    """Texto corto con los plazos perdidos, para dibujar sobre la cámara"""
+    return (f"{TARGET_FPS} FPS: {frame_pacing['perdidos']}/{frame_pacing['frames']} plazos perdidos"
+            f" (peor {frame_pacing['peor_ms']:.1f} ms)")
 
 # Procesar movimientos de cámara
+# La cámara y el flujo óptico corren en un hilo aparte; el hilo de OpenGL sólo consume los cambios
+
+# Motores de flujo óptico: cada uno devuelve el flujo medio (x, y) entre dos recortes en gris
+
+def farneback_flow(prev, curr):
+    """Flujo denso de Farneback sobre todo el recorte"""
+    flow = cv2.calcOpticalFlowFarneback(prev, curr, None, 0.5, 3, 15, 3, 5, 1.2, 0)
+    return float(np.mean(flow[..., 0])), float(np.mean(flow[..., 1]))
+
+def dis_flow(prev, curr):
+    """Flujo denso DIS con el preset ultrarrápido, llevado a la escala del de Farneback con DIS_GAIN"""
+    global dis_engine
+    if dis_engine is None:
+        dis_engine = cv2.DISOpticalFlow_create(cv2.DISOPTICAL_FLOW_PRESET_ULTRAFAST)
+    flow = dis_engine.calc(np.ascontiguousarray(prev), np.ascontiguousarray(curr), None)
+    return float(np.mean(flow[..., 0]) * DIS_GAIN), float(np.mean(flow[..., 1]) * DIS_GAIN)
+
+def lucas_kanade_flow(prev, curr):
+    """Lucas-Kanade piramidal sobre esquinas del recorte, llevado a la escala del flujo medio denso con LK_GAIN"""
+    corners = cv2.goodFeaturesToTrack(prev, LK_MAX_CORNERS, 0.01, 5)
+    if corners is None:
+        return 0.0, 0.0
+    tracked, status, _ = cv2.calcOpticalFlowPyrLK(prev, curr, corners, None, winSize=(15, 15), maxLevel=2)
+    moved = (tracked - corners)[status.ravel() == 1].reshape(-1, 2)
+    if len(moved) == 0:
+        return 0.0, 0.0
+    # La mediana de las esquinas movidas es el desplazamiento de la mano; los flujos densos promedian
+    # también el fondo quieto, así que se escala por LK_GAIN (calibrada contra Farneback)
+    moving = np.linalg.norm(moved, axis=1) > LK_MIN_MOTION
+    if not moving.any():
+        return 0.0, 0.0
+    dx, dy = np.median(moved[moving], axis=0) * LK_GAIN
+    return float(dx), float(dy)
+
+FLOW_ENGINES = {"farneback": farneback_flow, "dis": dis_flow, "lucas_kanade": lucas_kanade_flow}
+
+def adapt_analysis_scale(elapsed_ms):
+    """Baja la escala de análisis si el promedio pasa de ANALYSIS_BUDGET_MS y la sube si cabe de sobra"""
+    global analysis_level, analysis_ms
+    analysis_ms = elapsed_ms if analysis_ms is None else analysis_ms + ANALYSIS_SMOOTHING * (elapsed_ms - analysis_ms)
+    if analysis_ms > ANALYSIS_BUDGET_MS and analysis_level < len(ANALYSIS_SCALES) - 1:
+        analysis_level += 1
+        analysis_ms = None
+    elif analysis_level > 0:
+        # El costo crece con el área: se estima el de la escala anterior antes de volver a ella
+        growth = (ANALYSIS_SCALES[analysis_level - 1] / ANALYSIS_SCALES[analysis_level]) ** 2
+        if analysis_ms * growth < ANALYSIS_BUDGET_MS * (1 - ANALYSIS_HYSTERESIS):
+            analysis_level -= 1
+            analysis_ms = None
+
+def region_moving(name, prev, curr):
+    """Detector barato de cambios: energía del absdiff reducido; cuenta los frames en que la zona está quieta"""
+    if not use_motion_gate:
+        return True
+    size = (max(1, curr.shape[1] // MOTION_GATE_STEP), max(1, curr.shape[0] // MOTION_GATE_STEP))
+    difference = cv2.absdiff(cv2.resize(prev, size, interpolation=cv2.INTER_AREA),
+                             cv2.resize(curr, size, interpolation=cv2.INTER_AREA))
+    if np.mean(difference) > MOTION_GATE_THRESHOLD:
+        return True
+    skipped_frames[name] += 1
+    return False
+
+def hand_position_in(roi_scale):
+    """Centro horizontal del contorno más grande, relativo al ancho de la zona, o None"""
+    gray_scale = cv2.cvtColor(roi_scale, cv2.COLOR_BGR2GRAY)
+    blurred = cv2.GaussianBlur(gray_scale, (5, 5), 0)
+    _, thresh = cv2.threshold(blurred, 60, 255, cv2.THRESH_BINARY_INV)
+    contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return None
+    largest_contour = max(contours, key=cv2.contourArea)
+    x, _, w, _ = cv2.boundingRect(largest_contour)
+    hand_position = x + w / 2
+    rec_width = roi_scale.shape[1]
+    return hand_position / rec_width
+
+def hand_position_profile(roi_scale):
+    """Centroide de la suma por columnas de la máscara oscura (zona reducida), suavizado en el tiempo"""
+    global profile_position
+    gray_scale = cv2.cvtColor(roi_scale, cv2.COLOR_BGR2GRAY)
+    if PROFILE_STEP > 1:  # INTER_AREA promedia: también hace de desenfoque
+        size = (max(1, gray_scale.shape[1] // PROFILE_STEP), max(1, gray_scale.shape[0] // PROFILE_STEP))
+        gray_scale = cv2.resize(gray_scale, size, interpolation=cv2.INTER_AREA)
+    profile = np.count_nonzero(gray_scale < 60, axis=0)  # Mismo umbral que el contorno
+    total = profile.sum()
+    if total < PROFILE_MIN_FRACTION * gray_scale.size:
+        profile_position = None
+        return None
+    position = float(profile @ (np.arange(len(profile)) + 0.5)) / total / len(profile)
+    if profile_position is not None:
+        position = profile_position + PROFILE_SMOOTHING * (position - profile_position)
+    profile_position = position
+    return position
+
+HAND_LOCATORS = {"contorno": hand_position_in, "perfil": hand_position_profile}
+
+def fingertip_in(roi_pointer):
+    """Punto más alto del contorno más grande (la punta del dedo), (u, v) relativos a la zona, o None"""
+    gray_pointer = cv2.cvtColor(roi_pointer, cv2.COLOR_BGR2GRAY)
+    blurred = cv2.GaussianBlur(gray_pointer, (5, 5), 0)
+    _, thresh = cv2.threshold(blurred, 60, 255, cv2.THRESH_BINARY_INV)  # Mismo umbral que hand_position_in
+    contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return None
+    largest_contour = max(contours, key=cv2.contourArea)
+    x, y = largest_contour[largest_contour[:, 0, 1].argmin(), 0]
+    return float((x + 0.5) / roi_pointer.shape[1]), float((y + 0.5) / roi_pointer.shape[0])
+
+def analyze_frame(frame, prev_gray):
+    """Flujo óptico y contorno de la mano sobre un frame; devuelve (gris analizado, cambios) y marca las zonas en frame"""
+    global analyzed_frames, last_hand_position
+    analyzed_frames += 1
+    stage_start = time.perf_counter()
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    height, width = gray.shape[:2]
+    deltas = {"rotation": 0.0, "translation_x": 0.0, "translation_y": 0.0, "scale": 0.0}
+
+    # Dibujar los rectángulos
+    cv2.rectangle(frame, (0, 0), (int(width * 0.3), int(height * 0.3)), (0, 255, 0), 2)  # Rotación
+    cv2.rectangle(frame, (int(width * 0.7), 0), (width, int(height * 0.3)), (255, 0, 0), 2)  # Traslación
+    cv2.rectangle(frame, (0, int(height * 0.7)), (int(width * 0.3), height), (0, 0, 255), 2)  # Escalamiento
+    if use_finger_selection:
+        cv2.rectangle(frame, (int(width * 0.7), int(height * 0.7)), (width, height), (0, 255, 255), 2)  # Selección
+
+    # Flujo sobre el gris reducido; los desplazamientos se devuelven a píxeles de la cámara
+    start = time.perf_counter()
+    scale = ANALYSIS_SCALES[analysis_level] if use_adaptive_resolution else 1.0
+    if scale != 1.0:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    if prev_gray.shape != gray.shape:
+        prev_gray = cv2.resize(prev_gray, gray.shape[::-1], interpolation=cv2.INTER_AREA)
+    record_stage("gris", stage_start)
+    small_height, small_width = gray.shape
+    mean_flow = FLOW_ENGINES[flow_engine]
+    flow_x_rot = flow_x_trans = flow_y_trans = 0.0
+    stage_start = time.perf_counter()
+    rot = (slice(None, int(small_height * 0.3)), slice(None, int(small_width * 0.3)))
+    rot_moving = region_moving("rotacion", prev_gray[rot], gray[rot])
+    if rot_moving:
+        flow_x_rot, _ = mean_flow(prev_gray[rot], gray[rot])
+        flow_x_rot /= scale
+    record_stage("flujo_rotacion", stage_start)
+
+    stage_start = time.perf_counter()
+    trans = (slice(None, int(small_height * 0.3)), slice(int(small_width * 0.7), None))
+    trans_moving = region_moving("traslacion", prev_gray[trans], gray[trans])
+    if trans_moving:
+        flow_x_trans, flow_y_trans = mean_flow(prev_gray[trans], gray[trans])
+        flow_x_trans, flow_y_trans = flow_x_trans / scale, flow_y_trans / scale
+    record_stage("flujo_traslacion", stage_start)
+    if use_adaptive_resolution and (rot_moving or trans_moving):
+        adapt_analysis_scale((time.perf_counter() - start) * 1000)
+
+    # Con la zona quieta la mano sigue donde estaba: se reutiliza la última posición
+    stage_start = time.perf_counter()
+    scale_area = (slice(int(small_height * 0.7), None), slice(None, int(small_width * 0.3)))
+    if region_moving("escala", prev_gray[scale_area], gray[scale_area]):
+        normalized_position = HAND_LOCATORS[hand_locator](frame[int(height * 0.7):, :int(width * 0.3)])
+        last_hand_position = normalized_position
+    else:
+        normalized_position = last_hand_position
+    record_stage("contorno", stage_start)
+
+    # La punta del dedo sólo se busca si la zona cambió: con la mano quieta la selección se mantiene
+    stage_start = time.perf_counter()
+    pointer_area = (slice(int(small_height * 0.7), None), slice(int(small_width * 0.7), None))
+    if use_finger_selection and region_moving("seleccion", prev_gray[pointer_area], gray[pointer_area]):
+        pointer = fingertip_in(frame[int(height * 0.7):, int(width * 0.7):])
+        if pointer is not None:
+            deltas["pointer"] = pointer
+    record_stage("punta", stage_start)
+
+    if normalized_position is not None:
+        if normalized_position > 0.6:
+            deltas["scale"] = 0.01
+        elif normalized_position < 0.4:
+            deltas["scale"] = -0.01
+
+    if abs(flow_x_rot) > flow_threshold:
+        deltas["rotation"] = flow_x_rot * 5
+    if abs(flow_x_trans) > flow_threshold:
+        deltas["translation_x"] = flow_x_trans * 0.5  # Aumentar sensibilidad en X
+    if abs(flow_y_trans) > flow_threshold:
+        deltas["translation_y"] = -flow_y_trans * 0.5  # Aumentar sensibilidad en Y
+    return gray, deltas
+
+def camera_worker(cap):
+    """Lee y analiza frames hasta camera_stop; acumula los cambios y publica el último frame"""
+    global prev_gray, camera_frame
+    while not camera_stop.is_set():
+        start = time.perf_counter()
+        ret, frame = cap.read()
+        captured = time.perf_counter()
+        record_stage("captura", start)
+        if not ret:
+            print("Error: No se pudo leer un frame de la cámara.")
+            camera_stop.set()
+            break
+        gray, deltas = analyze_frame(frame, prev_gray)
+        prev_gray = gray
+        with camera_lock:
+            camera_updates.append((captured, deltas))
+            camera_frame = frame
+        camera_ready.set()
+    camera_ready.set()
+
+def add_transform_target(captured, deltas):
+    """Objetivo nuevo: el último más los cambios de un frame capturado en el instante captured"""
+    if transform_targets:
+        rotation, x, y, scale = transform_targets[-1][1]
+    else:
+        rotation, x, y, scale = rotation_angle, translation_x, translation_y, scale_factor
+    transform_targets.append((captured, (rotation + deltas["rotation"], x + deltas["translation_x"],
+                                         y + deltas["translation_y"], max(0.5, min(2.0, scale + deltas["scale"])))))
+
+def monotone_tangents(times, states):
+    """Tangentes de Hermite que no pasan de largo los objetivos (Fritsch-Carlson): cero en los extremos locales"""
+    secants = np.diff(states, axis=0) / np.diff(times)[:, None]
+    tangents = np.empty_like(states)
+    tangents[0], tangents[-1] = secants[0], secants[-1]
+    left, right = secants[:-1], secants[1:]
+    limit = 3 * np.minimum(np.abs(left), np.abs(right))
+    tangents[1:-1] = np.where(left * right > 0, np.clip((left + right) / 2, -limit, limit), 0.0)
+    return tangents
+
+def interpolated_transform(now):
+    """(estado, instante que muestra) en now - INTERPOLATION_DELAY.
+
+    Entre dos objetivos se usa un Hermite cúbico (velocidad continua, sin pasarse);
+    después del último se extrapola con su velocidad o se mantiene.
+    """
+    times = np.array([captured for captured, _ in transform_targets])
+    states = np.array([state for _, state in transform_targets])
+    when = now - INTERPOLATION_DELAY
+    if len(times) < 2 or when <= times[0]:
+        return tuple(states[0] if when <= times[0] else states[-1]), min(when, times[-1])
+    tangents = monotone_tangents(times, states)
+    if when >= times[-1]:
+        ahead = min(when - times[-1], EXTRAPOLATION_LIMIT) if use_extrapolation else 0.0
+        state, shown = states[-1] + tangents[-1] * ahead, times[-1] + ahead
+    else:
+        k = int(np.searchsorted(times, when, side="right"))
+        h = times[k] - times[k - 1]
+        u = (when - times[k - 1]) / h
+        state = ((2 * u ** 3 - 3 * u ** 2 + 1) * states[k - 1] + (u ** 3 - 2 * u ** 2 + u) * h * tangents[k - 1]
+                 + (3 * u ** 2 - 2 * u ** 3) * states[k] + (u ** 3 - u ** 2) * h * tangents[k])
+        shown = when
+    state[3] = max(0.5, min(2.0, state[3]))
+    return tuple(float(value) for value in state), shown
+
+def apply_camera_deltas():
+    """Aplica los cambios que llegaron del hilo de la cámara; devuelve el frame nuevo o None.
+
+    Sin interpolación las transformaciones saltan al último objetivo; con ella se muestran
+    suavizadas con INTERPOLATION_DELAY de retraso. En ambos casos se mide el retraso real
+    (ahora menos el instante de captura que se está mostrando).
+    """
+    global rotation_angle, translation_x, translation_y, scale_factor, camera_frame, transform_lag_ms
+    with camera_lock:
+        updates = camera_updates[:]
+        camera_updates.clear()
+        frame, camera_frame = camera_frame, None
+    pointer = None
+    for captured, deltas in updates:
+        add_transform_target(captured, deltas)
+        record_stage("latencia_analisis", captured)
+        pointer = deltas.get("pointer", pointer)
+    if pointer is not None and render_mode == "scene_graph" and not scene_loading:
+        select_normalized(*pointer)  # La zona de selección es la pantalla en pequeño
+    if not transform_targets:
+        return frame
+    now = time.perf_counter()
+    if use_transform_interpolation:
+        state, shown = interpolated_transform(now)
+    else:
+        shown, state = transform_targets[-1]
+    rotation_angle, translation_x, translation_y, scale_factor = state
+    transform_lag_ms = (now - shown) * 1000
+    if use_frame_stats:
+        record_sample("retraso_transformacion", transform_lag_ms)
+    return frame
+
+# Redibujado bajo demanda
+
+def transform_state():
+    """Todo lo que cambia la imagen del pueblo entre frames"""
+    return rotation_angle, translation_x, translation_y, scale_factor, camera_eye, camera_target
+
+def scene_needs_redraw():
+    """True si la escena cambió desde el último frame dibujado (o si use_render_on_demand está apagado)"""
+    global scene_dirty, drawn_state
+    state = transform_state()
+    if (not use_render_on_demand or scene_dirty or scene_loading or state != drawn_state
+            or (minimap_pending and minimap_credit_now() > 0)):
+        scene_dirty = False
+        drawn_state = state
+        return True
+    return False
+
+def framebuffer_size_callback(window, width, height):
+    """Ajusta el viewport y la escala de los niveles de detalle al nuevo tamaño"""
+    global viewport_height, scene_dirty
+    if width == 0 or height == 0:
+        return  # Ventana minimizada
+    glViewport(0, 0, width, height)
+    viewport_height = height
+    scene_dirty = True
+
+def window_refresh_callback(window):
+    """La ventana se expuso de nuevo: hay que volver a dibujar"""
+    global scene_dirty
+    scene_dirty = True
+
 def process_camera():
-    global rotation_angle, translation_x, translation_y, scale_factor, prev_gray
+    global prev_gray, show_hud, show_minimap, scene_dirty
 
     cap = cv2.VideoCapture(0)
     ret, frame = cap.read()
@@ -1766,64 +4018,65 @@ def process_camera():
         return
 
     prev_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-
-    while not glfw.window_should_close(window):
-        ret, frame = cap.read()
-        if not ret:
-            print("Error: No se pudo leer un frame de la cámara.")
-            break
-
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        height, width = gray.shape[:2]
-
-        # Dibujar los rectángulos
-        cv2.rectangle(frame, (0, 0), (int(width * 0.3), int(height * 0.3)), (0, 255, 0), 2)  # Rotación
-        cv2.rectangle(frame, (int(width * 0.7), 0), (width, int(height * 0.3)), (255, 0, 0), 2)  # Traslación
-        cv2.rectangle(frame, (0, int(height * 0.7)), (int(width * 0.3), height), (0, 0, 255), 2)  # Escalamiento
-
-        roi_rot = gray[:int(height * 0.3), :int(width * 0.3)]
-        flow_rot = cv2.calcOpticalFlowFarneback(prev_gray[:int(height * 0.3), :int(width * 0.3)], roi_rot, None, 0.5, 3, 15, 3, 5, 1.2, 0)
-        flow_x_rot = np.mean(flow_rot[..., 0])
-
-        roi_trans = gray[:int(height * 0.3), int(width * 0.7):]
-        flow_trans = cv2.calcOpticalFlowFarneback(prev_gray[:int(height * 0.3), int(width * 0.7):], roi_trans, None, 0.5, 3, 15, 3, 5, 1.2, 0)
-        flow_x_trans = np.mean(flow_trans[..., 0])
-        flow_y_trans = np.mean(flow_trans[..., 1])
-
-        roi_scale = frame[int(height * 0.7):, :int(width * 0.3)]
-        gray_scale = cv2.cvtColor(roi_scale, cv2.COLOR_BGR2GRAY)
-        blurred = cv2.GaussianBlur(gray_scale, (5, 5), 0)
-        _, thresh = cv2.threshold(blurred, 60, 255, cv2.THRESH_BINARY_INV)
-        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-        if contours:
-            largest_contour = max(contours, key=cv2.contourArea)
-            x, _, w, _ = cv2.boundingRect(largest_contour)
-            hand_position = x + w / 2
-            rec_width = roi_scale.shape[1]
-            normalized_position = hand_position / rec_width
-            if normalized_position > 0.6:
-                scale_factor += 0.01
-            elif normalized_position < 0.4:
-                scale_factor -= 0.01
-            scale_factor = max(0.5, min(2.0, scale_factor))
-
-        if abs(flow_x_rot) > flow_threshold:
-            rotation_angle += flow_x_rot * 5
-        if abs(flow_x_trans) > flow_threshold:
-            translation_x += flow_x_trans * 0.5  # Aumentar sensibilidad en X
-        if abs(flow_y_trans) > flow_threshold:
-            translation_y -= flow_y_trans * 0.5  # Aumentar sensibilidad en Y
-
-        prev_gray = gray
-        cv2.imshow("Cámara", frame)
-        draw_scene()
-        glfw.poll_events()
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
-
-    cap.release()
-    cv2.destroyAllWindows()
+    transform_targets.clear()  # El primer objetivo se interpola desde el estado actual
+    transform_targets.append((time.perf_counter(), (rotation_angle, translation_x, translation_y, scale_factor)))
+    camera_stop.clear()
+    worker = threading.Thread(target=camera_worker, args=(cap,), daemon=True)
+    worker.start()
+
+    try:
+        while not glfw.window_should_close(window) and not camera_stop.is_set():
+            camera_ready.clear()
+            frame = apply_camera_deltas()
+            if frame is not None and show_hud:
+                scene_dirty = True  # Cada frame de la cámara trae estadísticas nuevas para el HUD
+            if frame is not None:
+                if use_lod:
+                    cv2.putText(frame, f"LOD: -{lod_triangles_saved} triangulos", (10, frame.shape[0] - 10),
+                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
+                if use_motion_gate:
+                    skipped = " ".join(f"{name[:3]} {count}" for name, count in skipped_frames.items())
+                    cv2.putText(frame, f"Omitidos/{analyzed_frames}: {skipped}", (10, frame.shape[0] - 50),
+                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
+                if TARGET_FPS > 0:
+                    cv2.putText(frame, pacing_summary(), (10, frame.shape[0] - 70),
+                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
+                if transform_lag_ms is not None:
+                    mode = "interpolado" if use_transform_interpolation else "sin interpolar"
+                    cv2.putText(frame, f"Retraso {mode}: {transform_lag_ms:.0f} ms", (10, frame.shape[0] - 90),
+                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
+                if use_adaptive_resolution and analysis_ms is not None:
+                    cv2.putText(frame, f"Analisis: {ANALYSIS_SCALES[analysis_level]:.2f}x {analysis_ms:.1f} ms",
+                                (10, frame.shape[0] - 30), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
+                start = time.perf_counter()
+                cv2.imshow("Cámara", frame)
+                record_stage("imshow", start)
+            drawn = scene_needs_redraw()
+            if drawn:
+                draw_scene()
+            elif frame is None:
+                camera_ready.wait(IDLE_WAIT)  # Nada que dibujar: se duerme hasta el próximo frame
+            glfw.poll_events()
+            key = cv2.waitKey(1) & 0xFF
+            pace_frame(drawn)
+            if key == ord('q'):
+                break
+            if key == ord('h'):
+                show_hud = not show_hud
+                if show_hud:
+                    enable_frame_stats()  # Sigue activa al ocultarlo: el CSV se escribe al salir
+                scene_dirty = True
+            if key == ord('m'):
+                show_minimap = not show_minimap
+                scene_dirty = True
+    finally:
+        camera_stop.set()
+        worker.join()
+        cap.release()
+        cv2.destroyAllWindows()
+        if use_frame_stats:
+            remove_gl_counters()
+            export_frame_stats(STATS_CSV)
 
 # Función principal
 def main():
@@ -1837,7 +4090,13 @@ def main():
         sys.exit()
 
     glfw.make_context_current(window)
+    set_swap_interval()
+    glfw.set_framebuffer_size_callback(window, framebuffer_size_callback)
+    glfw.set_window_refresh_callback(window, window_refresh_callback)
+    glfw.set_mouse_button_callback(window, mouse_button_callback)
     glViewport(0, 0, 800, 600)
+    if use_frame_stats:
+        install_gl_counters()
     init()
     process_camera()
     glfw.terminate()
@@ -0,0 +1,33 @@
+"""Contexto OpenGL fuera de pantalla (EGL, como benchmark_render) para las pruebas de proyectofinal3"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmark_render as render  # Primero: configura EGL antes de que se importe OpenGL
+
+import pytest
+
+WIDTH, HEIGHT = 400, 300
+
+@pytest.fixture(scope="session")
+def town():
+    """Módulo del pueblo con un contexto OpenGL activo"""
+    try:
+        render.create_context(WIDTH, HEIGHT)
+    except SystemExit as error:
+        pytest.skip(f"sin contexto OpenGL: {error}")
+    render.town.window = None
+    return render.town
+
+@pytest.fixture
+def gl_state(town):
+    """Contexto recién reiniciado con la proyección del pueblo"""
+    from OpenGL.GL import glMatrixMode, GL_PROJECTION, GL_MODELVIEW
+    from OpenGL.GLU import gluPerspective
+    render.reset_gl_state(WIDTH, HEIGHT)
+    glMatrixMode(GL_PROJECTION)
+    gluPerspective(town.fov_y, WIDTH / HEIGHT, town.z_near, town.z_far)
+    glMatrixMode(GL_MODELVIEW)
+    town.viewport_height = HEIGHT
+    return render
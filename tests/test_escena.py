@@ -0,0 +1,25 @@
+"""Huella del archivo de escena de proyectofinal3: sólo cambia con lo que cambia las mallas"""
+import proyectofinal3 as town
+
+def fingerprint():
+    return town.scene_fingerprint(town.TOWN, town.MODELS)
+
+def test_fingerprint_ignores_gl_counters():
+    before = fingerprint()
+    town.install_gl_counters()
+    try:
+        assert fingerprint() == before
+    finally:
+        town.remove_gl_counters()
+    assert fingerprint() == before
+
+def test_fingerprint_ignores_draw_options(monkeypatch):
+    before = fingerprint()
+    monkeypatch.setattr(town, "use_lod", not town.use_lod)
+    monkeypatch.setattr(town, "use_mesh_cache", not town.use_mesh_cache)
+    assert fingerprint() == before
+
+def test_fingerprint_follows_baked_occlusion(monkeypatch):
+    before = fingerprint()
+    monkeypatch.setattr(town, "use_baked_ao", not town.use_baked_ao)
+    assert fingerprint() != before
@@ -0,0 +1,53 @@
+"""Grafo de escena de proyectofinal3: lotes de vertex arrays reutilizados entre frames"""
+import numpy as np
+from OpenGL.GL import (GL_COLOR_BUFFER_BIT, GL_DEPTH_BUFFER_BIT, GL_MODELVIEW, GL_PROJECTION, glClear,
+                       glLoadIdentity, glMatrixMode, glOrtho)
+
+from conftest import HEIGHT, WIDTH
+
+FOLIAGE = ("draw_foliage4", ())
+
+def draw(town, render, target):
+    glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+    town.draw_scene_graph(town.look_at_matrix((0, 10, 40), target, (0, 1, 0)))
+    return render.read_pixels(WIDTH, HEIGHT)
+
+def test_batch_cache_follows_visible_nodes(town, gl_state, monkeypatch):
+    """Dos conjuntos de nodos con los mismos modelos y niveles no comparten el lote guardado"""
+    monkeypatch.setattr(town, "instancing_supported", False)
+    monkeypatch.setattr(town, "use_instancing", True)
+    monkeypatch.setattr(town, "use_frustum_culling", True)
+    monkeypatch.setattr(town, "use_merged_parts", False)
+    town.clear_scene_graph()
+    town.load_model(FOLIAGE)
+    town.set_scene([FOLIAGE] * 2, np.array([town.translation_matrix(x, 0, 0) for x in (-30, 30)]))
+    left = draw(town, gl_state, (-30, 0, 0))  # Sólo se ve el nodo de la izquierda
+    cached = draw(town, gl_state, (30, 0, 0))  # Sólo el de la derecha: mismo modelo y nivel
+    town.batch_cache.clear()
+    fresh = draw(town, gl_state, (30, 0, 0))
+    town.clear_scene_graph()
+    assert np.any(left != fresh)
+    assert np.array_equal(cached, fresh)
+
+def test_minimap_cache_follows_center(town, gl_state, monkeypatch):
+    """Al mover el centro del minimapa se dibujan los nodos de la nueva zona, no los del lote anterior"""
+    monkeypatch.setattr(town, "instancing_supported", False)
+    monkeypatch.setattr(town, "render_mode", "scene_graph")
+    monkeypatch.setattr(town, "use_merged_parts", False)
+    town.clear_scene_graph()
+    town.load_model(FOLIAGE)
+    town.set_scene([FOLIAGE] * 2, np.array([town.translation_matrix(x, 0, 0) for x in (-100, 100)]))
+    glMatrixMode(GL_PROJECTION)
+    glLoadIdentity()
+    glOrtho(-town.MINIMAP_RANGE, town.MINIMAP_RANGE, -town.MINIMAP_RANGE, town.MINIMAP_RANGE, 1, 1000)
+    glMatrixMode(GL_MODELVIEW)
+    images = []
+    for clear in (False, False, True):  # Centro en el nodo izquierdo, luego en el derecho con y sin lote
+        if clear:
+            town.minimap_cache.clear()
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        town.draw_minimap_scene(np.array((-100.0, 0.0) if not images else (100.0, 0.0)), HEIGHT)
+        images.append(gl_state.read_pixels(WIDTH, HEIGHT))
+    town.clear_scene_graph()
+    assert np.any(images[2] != images[2][0, 0])  # El nodo derecho aparece
+    assert np.array_equal(images[1], images[2])